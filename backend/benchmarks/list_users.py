@@ -0,0 +1,119 @@
+"""
+List-users cost over a large table: JSON decode and response serialization.
+
+Seeds a temporary SQLite database, then times
+  - decoding the stored platform configs with the stdlib and orjson codecs,
+  - loading the users (and their platform accounts) through the ORM,
+  - serializing them the old way (UserOut per row, then FastAPI's
+    response_model round trip and json.dumps) and the new way (one
+    TypeAdapter validate + dump_json pass, as in routers/users.py).
+
+Run from the backend directory:
+    python benchmarks/list_users.py [--users 100000]
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pydantic import TypeAdapter
+from sqlalchemy import text
+from sqlalchemy.orm import sessionmaker
+
+from db import Base, create_db_engine
+from models.platform_account import PlatformAccount
+from models.user import User
+from schemas.user import UserOut
+from utils import json_codec
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+user_list = TypeAdapter(list[UserOut])
+
+
+def seed(engine, count: int):
+    now = datetime.utcnow()
+    users = [
+        {"id": i, "username": f"user{i}", "email": f"user{i}@example.com", "created_at": now}
+        for i in range(1, count + 1)
+    ]
+    accounts = []
+    for i in range(1, count + 1):
+        gitlab = {"platform": "gitlab", "user_id": i, "group_id": "42", "role": "developer", "repo_access": [1, 2, 3]}
+        mattermost = {"platform": "mattermost", "user_id": f"mm{i}", "team": "dev", "role": "member",
+                      "server_name": "chat.example.com"}
+        for config in (gitlab, mattermost):
+            accounts.append({
+                "user_id": i,
+                "platform": config["platform"],
+                "external_user_id": str(config["user_id"]),
+                "config": config,
+            })
+    with engine.begin() as conn:
+        conn.execute(User.__table__.insert(), users)
+        conn.execute(PlatformAccount.__table__.insert(), accounts)
+
+
+def timed(label: str, fn):
+    start = time.perf_counter()
+    result = fn()
+    print(f"{label:>44}: {time.perf_counter() - start:7.3f} s")
+    return result
+
+
+def serialize_before(users) -> bytes:
+    out = [
+        UserOut(
+            id=user.id,
+            username=user.username,
+            email=user.email,
+            created_at=user.created_at,
+            platforms=user.platforms if user.platforms else []
+        )
+        for user in users
+    ]
+    # What FastAPI does with a response_model: dump, re-validate, dump to JSON-able, json.dumps
+    validated = user_list.validate_python([item.model_dump() for item in out])
+    return json.dumps(user_list.dump_python(validated, mode="json")).encode("utf-8")
+
+
+def serialize_after(users) -> bytes:
+    return user_list.dump_json(user_list.validate_python(users, from_attributes=True))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=100_000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_db_engine(f"sqlite:///{tmp}/bench.db")
+        Base.metadata.create_all(bind=engine)
+        timed(f"seed {args.users} users", lambda: seed(engine, args.users))
+        print(f"JSONEncodedDict codec: {json_codec.BACKEND}")
+
+        with engine.connect() as conn:
+            raw = [row[0] for row in conn.execute(text("SELECT config FROM platform_accounts"))]
+        timed(f"decode {len(raw)} configs (json)", lambda: [json.loads(value) for value in raw])
+        if orjson is not None:
+            timed(f"decode {len(raw)} configs (orjson)", lambda: [orjson.loads(value) for value in raw])
+
+        db = sessionmaker(bind=engine)()
+        users = timed("load users + accounts (ORM)", lambda: db.query(User).order_by(User.id).all())
+        before = timed("serialize before (UserOut + response_model)", lambda: serialize_before(users))
+        after = timed("serialize after (TypeAdapter.dump_json)", lambda: serialize_after(users))
+        assert json.loads(before) == json.loads(after)
+        db.close()
+        engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
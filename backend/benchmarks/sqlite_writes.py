@@ -0,0 +1,71 @@
+"""
+Concurrent write throughput: default SQLite settings vs the tuned engine in db.py.
+
+Run from the backend directory:
+    python benchmarks/sqlite_writes.py [--threads 16] [--writes 200]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import sessionmaker
+
+from db import Base, create_db_engine
+from models.user import User
+
+
+def run(tuned: bool, threads: int, writes: int):
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_db_engine(f"sqlite:///{tmp}/bench.db", tuned=tuned)
+        Base.metadata.create_all(bind=engine)
+        Session = sessionmaker(bind=engine, autoflush=False, autocommit=False)
+
+        def worker(n):
+            locked = 0
+            for i in range(writes):
+                db = Session()
+                try:
+                    db.add(User(
+                        username=f"user-{n}-{i}",
+                        email=f"user-{n}-{i}@example.com",
+                        created_at=datetime.utcnow(),
+                        platforms=[{"platform": "gitlab", "user_id": i, "group_id": "1"}],
+                    ))
+                    db.commit()
+                except OperationalError:
+                    db.rollback()
+                    locked += 1
+                finally:
+                    db.close()
+            return locked
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=threads) as executor:
+            locked = sum(executor.map(worker, range(threads)))
+        elapsed = time.perf_counter() - start
+        engine.dispose()
+
+    committed = threads * writes - locked
+    return committed / elapsed, locked
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--threads", type=int, default=16)
+    parser.add_argument("--writes", type=int, default=200, help="commits per thread")
+    args = parser.parse_args()
+
+    for label, tuned in (("default", False), ("tuned (WAL)", True)):
+        rate, locked = run(tuned, args.threads, args.writes)
+        print(f"{label:>12}: {rate:8.1f} commits/s, {locked} 'database is locked' errors")
+
+
+if __name__ == "__main__":
+    main()
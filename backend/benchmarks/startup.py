@@ -0,0 +1,66 @@
+"""
+Startup cost: time to import `main:app` in a fresh interpreter.
+
+Each run imports main in a new process against a throwaway SQLite database
+and reports the median. With --drive, also times the first
+config.get_drive_service() call (needs a valid SERVICE_ACCOUNT_FILE).
+
+Run from the backend directory:
+    python benchmarks/startup.py [--runs 10] [--drive]
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+IMPORT_APP = """
+import time
+start = time.perf_counter()
+from main import app
+print(time.perf_counter() - start)
+"""
+
+BUILD_DRIVE = """
+import time
+import config
+start = time.perf_counter()
+config.get_drive_service()
+print(time.perf_counter() - start)
+"""
+
+
+def measure(code: str, runs: int) -> list:
+    timings = []
+    for _ in range(runs):
+        with tempfile.TemporaryDirectory() as tmp:
+            env = dict(os.environ, DATABASE_URL=f"sqlite:///{tmp}/startup.db")
+            out = subprocess.run(
+                [sys.executable, "-c", code], cwd=BACKEND_DIR, env=env,
+                capture_output=True, text=True, check=True,
+            )
+        timings.append(float(out.stdout.strip().splitlines()[-1]))
+    return timings
+
+
+def report(label: str, timings: list):
+    print(f"{label:>24}: median {statistics.median(timings) * 1000:8.1f} ms, "
+          f"min {min(timings) * 1000:8.1f} ms over {len(timings)} runs")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--drive", action="store_true", help="also time the first Drive client build")
+    args = parser.parse_args()
+
+    report("import main:app", measure(IMPORT_APP, args.runs))
+    if args.drive:
+        report("first get_drive_service", measure(BUILD_DRIVE, args.runs))
+
+
+if __name__ == "__main__":
+    main()
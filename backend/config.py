@@ -1,11 +1,59 @@
 import os
-from google.oauth2 import service_account
-from googleapiclient.discovery import build
+import threading
 
 from dotenv import load_dotenv
 
 load_dotenv()
 
+#-----HTTP clients------#
+
+# Applied per upstream: each platform gets its own pool with these limits.
+HTTP_CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT", "5"))
+HTTP_READ_TIMEOUT = float(os.getenv("HTTP_READ_TIMEOUT", "30"))
+HTTP_MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", "20"))
+HTTP_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("HTTP_MAX_KEEPALIVE_CONNECTIONS", "10"))
+HTTP_KEEPALIVE_EXPIRY = float(os.getenv("HTTP_KEEPALIVE_EXPIRY", "30"))
+
+# Client-side rate limiting. Requests/second per upstream until it advertises
+# its own budget in RateLimit-* headers (0 = unlimited until then).
+GITLAB_RATE_LIMIT = float(os.getenv("GITLAB_RATE_LIMIT", "0"))
+MATTERMOST_RATE_LIMIT = float(os.getenv("MATTERMOST_RATE_LIMIT", "0"))
+NEXTCLOUD_RATE_LIMIT = float(os.getenv("NEXTCLOUD_RATE_LIMIT", "0"))
+HTTP_RATE_LIMIT_BURST = int(os.getenv("HTTP_RATE_LIMIT_BURST", "10"))
+# Adaptive (AIMD) concurrency starts here and grows up to HTTP_MAX_CONNECTIONS
+HTTP_INITIAL_CONCURRENCY = int(os.getenv("HTTP_INITIAL_CONCURRENCY", "4"))
+# Times a 429 response is re-sent after waiting out the throttle
+HTTP_RATE_LIMIT_RETRIES = int(os.getenv("HTTP_RATE_LIMIT_RETRIES", "3"))
+
+# Retries of transient failures (connection errors, 502/503/504), with jittered exponential backoff (seconds)
+HTTP_RETRY_ATTEMPTS = int(os.getenv("HTTP_RETRY_ATTEMPTS", "3"))
+HTTP_RETRY_INITIAL_DELAY = float(os.getenv("HTTP_RETRY_INITIAL_DELAY", "0.2"))
+HTTP_RETRY_MAX_DELAY = float(os.getenv("HTTP_RETRY_MAX_DELAY", "5"))
+# Circuit breaker per upstream: consecutive failures before failing fast, and for how long (seconds)
+CIRCUIT_FAILURE_THRESHOLD = int(os.getenv("CIRCUIT_FAILURE_THRESHOLD", "5"))
+CIRCUIT_RESET_TIMEOUT = float(os.getenv("CIRCUIT_RESET_TIMEOUT", "30"))
+
+#-----Background jobs------#
+
+# Number of asyncio workers draining the provisioning job queue
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "4"))
+# Seconds a replica's claim on a job lasts without renewal; jobs of a replica
+# that stops renewing (crashed) are taken over by another after this long
+JOB_LEASE_SECONDS = float(os.getenv("JOB_LEASE_SECONDS", "60"))
+
+#-----Bulk import------#
+
+# Rows per duplicate check / DB commit, and max in-flight calls per platform
+IMPORT_BATCH_SIZE = int(os.getenv("IMPORT_BATCH_SIZE", "100"))
+IMPORT_PLATFORM_CONCURRENCY = int(os.getenv("IMPORT_PLATFORM_CONCURRENCY", "10"))
+# Upload bytes kept in memory while the body is received; larger uploads spill to a temp file
+IMPORT_SPOOL_MAX_MEMORY = int(os.getenv("IMPORT_SPOOL_MAX_MEMORY", str(8 * 1024 * 1024)))
+
+#-----Reconciliation------#
+
+# Max membership listings (group, team, folder...) fetched at once
+RECONCILE_FETCH_CONCURRENCY = int(os.getenv("RECONCILE_FETCH_CONCURRENCY", "8"))
+
 #-----NextCloud------#
 
 NEXTCLOUD_BASE_URL = os.getenv("NEXTCLOUD_BASE_URL")
@@ -18,6 +66,11 @@ OCS_HEADERS = {
     "Accept": "application/json"
 }
 
+# Readiness polling after user creation: exponential backoff within a total deadline (seconds)
+NEXTCLOUD_READY_TIMEOUT = float(os.getenv("NEXTCLOUD_READY_TIMEOUT", "10"))
+NEXTCLOUD_READY_INITIAL_INTERVAL = float(os.getenv("NEXTCLOUD_READY_INITIAL_INTERVAL", "0.05"))
+NEXTCLOUD_READY_MAX_INTERVAL = float(os.getenv("NEXTCLOUD_READY_MAX_INTERVAL", "1.0"))
+
 #-----GitLab------#
 
 GITLAB_TOKEN = os.getenv("GITLAB_TOKEN")
@@ -30,6 +83,14 @@ HEADERS_GITLAB = {
     "Private-Token": GITLAB_TOKEN
 }
 
+# User ID lookups by email/username (seconds / entries)
+GITLAB_CACHE_TTL = float(os.getenv("GITLAB_CACHE_TTL", "600"))
+GITLAB_CACHE_NEGATIVE_TTL = float(os.getenv("GITLAB_CACHE_NEGATIVE_TTL", "30"))
+GITLAB_CACHE_MAXSIZE = int(os.getenv("GITLAB_CACHE_MAXSIZE", "4096"))
+
+# Max concurrent project membership calls per batch
+GITLAB_MEMBERSHIP_CONCURRENCY = int(os.getenv("GITLAB_MEMBERSHIP_CONCURRENCY", "8"))
+
 #-----Mattermost------#
 
 MATTERMOST_URL = os.getenv("MATTERMOST_URL")
@@ -40,13 +101,42 @@ HEADERS_MATTERMOST = {
     "Content-Type": "application/json"
 }
 
+# Team/channel name -> ID lookups (seconds / entries)
+MATTERMOST_CACHE_TTL = float(os.getenv("MATTERMOST_CACHE_TTL", "300"))
+MATTERMOST_CACHE_NEGATIVE_TTL = float(os.getenv("MATTERMOST_CACHE_NEGATIVE_TTL", "30"))
+MATTERMOST_CACHE_MAXSIZE = int(os.getenv("MATTERMOST_CACHE_MAXSIZE", "1024"))
+
 #-----Google Drive------#
 
 SERVICE_ACCOUNT_FILE = os.getenv("SERVICE_ACCOUNT_FILE", "service_account.json")
 SCOPES = ["https://www.googleapis.com/auth/drive"]
 
-credentials = service_account.Credentials.from_service_account_file(
-    SERVICE_ACCOUNT_FILE, scopes=SCOPES
-)
-
-drive_service = build("drive", "v3", credentials=credentials)
+# permissions.list page size (Drive allows at most 100)
+DRIVE_PERMISSIONS_PAGE_SIZE = int(os.getenv("DRIVE_PERMISSIONS_PAGE_SIZE", "100"))
+
+_drive_service = None
+_drive_lock = threading.Lock()
+
+def get_drive_service():
+    """
+    Return the Drive v3 client, building it on first use.
+
+    The client is cached for the life of the process. It is built from the
+    discovery document bundled with google-api-python-client, so no network
+    fetch happens, and a missing service account file only fails the Drive
+    calls instead of app startup.
+    """
+    global _drive_service
+    if _drive_service is None:
+        with _drive_lock:
+            if _drive_service is None:
+                from google.oauth2 import service_account
+                from googleapiclient.discovery import build
+
+                credentials = service_account.Credentials.from_service_account_file(
+                    SERVICE_ACCOUNT_FILE, scopes=SCOPES
+                )
+                _drive_service = build(
+                    "drive", "v3", credentials=credentials, static_discovery=True, cache_discovery=False
+                )
+    return _drive_service
@@ -1,13 +1,32 @@
+import logging
+import time
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from routers import google_drive, gitlab, nextcloud, mattermost, users
-from db import Base, engine
+from routers import google_drive, gitlab, jobs, metrics, nextcloud, mattermost, reconcile, users
+from db import Base, engine, start_db_stats
+from services.job_service import start_workers, stop_workers
+from utils.http_client import aclose_clients, close_clients
+from utils.metrics import observe_request
+from utils.resilience import CircuitOpenError
+from utils.security import shutdown_hash_pool
+from utils.tracing import TRACING_SERVER_TIMING, server_timing, start_span
 from dotenv import load_dotenv
 
 load_dotenv()
-from models import user
+from models import job, platform_account, share, user
+from services.platform_accounts import migrate_legacy_platforms
 
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await start_workers()
+    yield
+    await stop_workers()
+    close_clients()
+    await aclose_clients()
+    shutdown_hash_pool()
+
+app = FastAPI(lifespan=lifespan)
 from fastapi.responses import JSONResponse
 from fastapi.requests import Request
 from fastapi.exceptions import RequestValidationError
@@ -29,6 +48,14 @@ async def validation_exception_handler(request: Request, exc: RequestValidationE
         headers={"Access-Control-Allow-Origin": "*"},
     )
 
+@app.exception_handler(CircuitOpenError)
+async def circuit_open_exception_handler(request: Request, exc: CircuitOpenError):
+    return JSONResponse(
+        status_code=503,
+        content={"detail": str(exc)},
+        headers={"Access-Control-Allow-Origin": "*"},
+    )
+
 @app.exception_handler(Exception)
 async def generic_exception_handler(request: Request, exc: Exception):
     return JSONResponse(
@@ -37,19 +64,62 @@ async def generic_exception_handler(request: Request, exc: Exception):
         headers={"Access-Control-Allow-Origin": "*"},
     )
 
+@app.middleware("http")
+async def record_request_stats(request: Request, call_next):
+    """
+    Record route latency in the metrics, trace the request as the root
+    span, and expose per-request query count and DB time (plus an optional
+    Server-Timing breakdown) as response headers.
+    """
+    stats = start_db_stats()
+    root = start_span(f"{request.method} {request.url.path}", **{"http.method": request.method})
+    start = time.perf_counter()
+    status = None
+    error = None
+    try:
+        response = await call_next(request)
+        status = response.status_code
+    except Exception as e:
+        error = e
+        raise
+    finally:
+        route = request.scope.get("route")
+        route_path = route.path if route else "unmatched"
+        observe_request(request.method, route_path, status, time.perf_counter() - start)
+        if root is not None:
+            root.name = f"{request.method} {route_path}"
+            root.set_attribute("http.route", route_path)
+            if status is not None:
+                root.set_attribute("http.status_code", status)
+            root.end(error)
+    if root is not None and TRACING_SERVER_TIMING:
+        response.headers["Server-Timing"] = server_timing(root)
+    response.headers["X-DB-Queries"] = str(stats["queries"])
+    response.headers["X-DB-Time"] = f"{stats['seconds'] * 1000:.1f}"
+    logging.debug(
+        f"[DB] {request.method} {request.url.path}: {stats['queries']} queries, "
+        f"{stats['seconds'] * 1000:.1f} ms"
+    )
+    return response
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "Location", "X-DB-Queries", "X-DB-Time", "Server-Timing"],
 )
 Base.metadata.create_all(bind=engine)
+migrate_legacy_platforms()
 
 app.include_router(gitlab.router, prefix="/gitlab")
 app.include_router(google_drive.router, prefix="/google-drive") 
 app.include_router(nextcloud.router, prefix="/nextcloud")
 app.include_router(mattermost.router, prefix="/mattermost") 
 app.include_router(users.router, prefix="/api")
+app.include_router(jobs.router, prefix="/api")
+app.include_router(reconcile.router, prefix="/api")
+app.include_router(metrics.router)
 
 # run: uvicorn main:app --reload
\ No newline at end of file
@@ -0,0 +1,27 @@
+from sqlalchemy import Column, DateTime, String, Text
+from db import Base
+from models.types import JSONEncodedDict
+
+# Background provisioning job (create/update/delete of a user across platforms)
+class Job(Base):
+    __tablename__ = "jobs"
+
+    id = Column(String, primary_key=True)
+    kind = Column(String, nullable=False)
+    username = Column(String, index=True)
+    status = Column(String, index=True, default="queued")
+
+    # Request body needed to (re)run the job, without secret fields (see
+    # job_service.SECRET_FIELDS); cleared once the job finishes
+    payload = Column(JSONEncodedDict)
+    progress = Column(JSONEncodedDict, default=dict)
+    result = Column(JSONEncodedDict)
+    error = Column(Text)
+
+    # Process that runs (or will run) the job, and until when its claim holds
+    # unless renewed; see job_service for the leasing rules
+    owner = Column(String)
+    lease_expires_at = Column(DateTime, index=True)
+
+    created_at = Column(DateTime)
+    updated_at = Column(DateTime)
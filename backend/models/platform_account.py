@@ -0,0 +1,47 @@
+from sqlalchemy import Column, ForeignKey, Index, Integer, String, UniqueConstraint
+from sqlalchemy.ext.mutable import MutableDict
+from sqlalchemy.orm import relationship
+from db import Base
+from models.types import JSONEncodedDict
+
+# One row per user per platform. The full platform config is kept in
+# `config` (what UserOut returns); the columns below are copies of the
+# fields we search by.
+class PlatformAccount(Base):
+    __tablename__ = "platform_accounts"
+    __table_args__ = (
+        UniqueConstraint("user_id", "platform", name="uq_platform_accounts_user_platform"),
+        Index("ix_platform_accounts_external_user_id", "platform", "external_user_id"),
+        Index("ix_platform_accounts_group_id", "platform", "group_id"),
+        Index("ix_platform_accounts_team", "platform", "team"),
+        Index("ix_platform_accounts_folder_id", "platform", "folder_id"),
+    )
+
+    id = Column(Integer, primary_key=True)
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False, index=True)
+    platform = Column(String, nullable=False)
+
+    external_user_id = Column(String)  # GitLab/Mattermost user id, Drive user email
+    group_id = Column(String)          # GitLab/Nextcloud group
+    team = Column(String)              # Mattermost team
+    folder_id = Column(String)         # Drive/Nextcloud shared folder
+    role = Column(String)              # role, or Nextcloud permission
+
+    config = Column(MutableDict.as_mutable(JSONEncodedDict), nullable=False, default=dict)
+
+    user = relationship("User", back_populates="accounts")
+
+    def apply(self, config: dict):
+        """Store a platform config and refresh the indexed columns from it."""
+        self.platform = config["platform"]
+        self.config = config
+
+        external_user_id = config.get("user_id") or config.get("user_email")
+        self.external_user_id = str(external_user_id) if external_user_id is not None else None
+        self.group_id = _str_or_none(config.get("group_id"))
+        self.team = config.get("team")
+        self.folder_id = _str_or_none(config.get("shared_folder_id"))
+        self.role = config.get("role") or config.get("permission")
+
+def _str_or_none(value):
+    return str(value) if value is not None else None
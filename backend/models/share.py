@@ -0,0 +1,11 @@
+from sqlalchemy import Column, Integer, String
+from db import Base
+
+# Local index of Nextcloud share IDs, so lookups by (folder, user) don't
+# need to list every share on the server.
+class NextcloudShare(Base):
+    __tablename__ = "nextcloud_shares"
+
+    folder_path = Column(String, primary_key=True)
+    userid = Column(String, primary_key=True)
+    share_id = Column(Integer, index=True, nullable=False)
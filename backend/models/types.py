@@ -0,0 +1,27 @@
+from sqlalchemy.types import TypeDecorator, TEXT
+from sqlalchemy.dialects.postgresql import JSONB
+from utils import json_codec
+
+# Custom JSON type: TEXT with JSON encoding on SQLite, native JSONB on PostgreSQL
+class JSONEncodedDict(TypeDecorator):
+    impl = TEXT
+    cache_ok = True
+
+    def load_dialect_impl(self, dialect):
+        if dialect.name == "postgresql":
+            return dialect.type_descriptor(JSONB(none_as_null=True))
+        return dialect.type_descriptor(TEXT())
+
+    def process_bind_param(self, value, dialect):
+        if value is None:
+            return None
+        if dialect.name == "postgresql":
+            return value
+        return json_codec.dumps(value)
+
+    def process_result_value(self, value, dialect):
+        if value is None:
+            return None
+        if dialect.name == "postgresql":
+            return value
+        return json_codec.loads(value)
@@ -1,23 +1,9 @@
 from sqlalchemy import Column, Integer, String, DateTime
-from sqlalchemy.types import TypeDecorator, TEXT
-from sqlalchemy.ext.mutable import MutableList
+from sqlalchemy.orm import relationship
 from db import Base
-from utils.security import hash_password
-import json
-
-# Custom JSON type that works with SQLite
-class JSONEncodedDict(TypeDecorator):
-    impl = TEXT
-
-    def process_bind_param(self, value, dialect):
-        if value is None:
-            return None
-        return json.dumps(value)
-
-    def process_result_value(self, value, dialect):
-        if value is None:
-            return None
-        return json.loads(value)
+from models.platform_account import PlatformAccount
+from models.types import JSONEncodedDict
+from utils.security import hash_password_pooled
 
 class User(Base):
     __tablename__ = "users"
@@ -28,7 +14,32 @@ class User(Base):
     password_hash = Column(String, default=None)
     created_at = Column(DateTime)
 
-    platforms = Column(MutableList.as_mutable(JSONEncodedDict), default=list)
+    # Pre-platform_accounts JSON blob; emptied by migrate_legacy_platforms()
+    legacy_platforms = Column("platforms", JSONEncodedDict, default=None)
+
+    accounts = relationship(
+        "PlatformAccount",
+        back_populates="user",
+        cascade="all, delete-orphan",
+        passive_deletes=True,
+        lazy="selectin",
+        order_by="PlatformAccount.id",
+    )
+
+    @property
+    def platforms(self) -> list:
+        """Platform configs, one dict per linked platform account."""
+        return [account.config for account in self.accounts]
+
+    @platforms.setter
+    def platforms(self, configs):
+        existing = {account.platform: account for account in self.accounts}
+        accounts = []
+        for config in configs or []:
+            account = existing.get(config["platform"]) or PlatformAccount()
+            account.apply(config)
+            accounts.append(account)
+        self.accounts = accounts
 
     def set_password(self, password: str):
-        self.password_hash = hash_password(password)
+        self.password_hash = hash_password_pooled(password)
@@ -1,55 +1,67 @@
+import asyncio
 from utils.roles import map_role_to_access_level
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy.orm import Session
 from schemas.user import GitLabRemoveAccess, GitLabUpdateRole, UpdateUserRequest, UserCreate, UserOut
 from models.user import User
-from db import SessionLocal
-from services import gitlab_service
-from utils.security import hash_password
+from db import get_db
+from services import gitlab_service_async
+from services.gitlab_service import membership_fields, raise_for_failed_memberships
+from utils.security import hash_password_async
 from datetime import datetime
 
 router = APIRouter(
     tags=["GitLab Management"]
 )
 
-@router.post("/users/add", response_model=UserOut)
-def add_user(user_data: UserCreate):
-    db = SessionLocal()
-    try:
-        if db.query(User).filter(User.username == user_data.username).first():
-            raise HTTPException(status_code=400, detail="User already exists")
+# Blocking session work, run with asyncio.to_thread so it stays off the event loop
+def _find_by_username(db: Session, username: str):
+    return db.query(User).filter(User.username == username).first()
 
-        hashed_pw = hash_password(user_data.password)
+def _find_by_id(db: Session, user_id: int):
+    return db.query(User).filter(User.id == user_id).first()
 
-        user = User(
-            username=user_data.username,
-            email=user_data.email,
-            password_hash=hashed_pw,
-            created_at=datetime.utcnow()
-        )
+def _save(db: Session, user: User):
+    db.add(user)
+    db.commit()
+    db.refresh(user)
 
-        if user_data.platforms:
-            user.platforms = {}
-            if "gitlab" in user_data.platforms:
-                gitlab_config = user_data.platforms["gitlab"]
-                gitlab_user_id = gitlab_service.find_gitlab_user_by_email(user_data.email)
-
-                if gitlab_user_id:
-                    gitlab_config["user_id"] = gitlab_user_id
-                    user.platforms["gitlab"] = gitlab_service.add_account(gitlab_config)
-                else:
-                    raise HTTPException(status_code=400, detail="GitLab user not found")
-
-        db.add(user)
-        db.commit()
-        db.refresh(user)
-        return user
-    finally:
-        db.close()
+def _delete(db: Session, user: User):
+    db.delete(user)
+    db.commit()
+
+@router.post("/users/add", response_model=UserOut)
+async def add_user(user_data: UserCreate, db: Session = Depends(get_db)):
+    if await asyncio.to_thread(_find_by_username, db, user_data.username):
+        raise HTTPException(status_code=400, detail="User already exists")
+
+    hashed_pw = await hash_password_async(user_data.password)
+
+    user = User(
+        username=user_data.username,
+        email=user_data.email,
+        password_hash=hashed_pw,
+        created_at=datetime.utcnow()
+    )
+
+    if user_data.platforms:
+        user.platforms = {}
+        if "gitlab" in user_data.platforms:
+            gitlab_config = user_data.platforms["gitlab"]
+            gitlab_user_id = await gitlab_service_async.find_gitlab_user_by_email(user_data.email)
+
+            if gitlab_user_id:
+                gitlab_config["user_id"] = gitlab_user_id
+                user.platforms["gitlab"] = await gitlab_service_async.add_account(gitlab_config)
+            else:
+                raise HTTPException(status_code=400, detail="GitLab user not found")
+
+    await asyncio.to_thread(_save, db, user)
+    return user
 
 @router.put("/users/{user_id}/role")
-def update_gitlab_role(user_id: int, body: GitLabUpdateRole):
-    db = SessionLocal()
-    user = db.query(User).filter(User.id == user_id).first()
+async def update_gitlab_role(user_id: int, body: GitLabUpdateRole, db: Session = Depends(get_db)):
+    user = await asyncio.to_thread(_find_by_id, db, user_id)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
 
@@ -58,18 +70,22 @@ def update_gitlab_role(user_id: int, body: GitLabUpdateRole):
 
     gitlab_id = user.platforms["gitlab"]["user_id"]
     access_level = map_role_to_access_level(body.role)
-    gitlab_service.update_user_role(gitlab_id, body.group_id, body.repo_access or [], access_level)
+    results = await gitlab_service_async.update_user_role(
+        gitlab_id, body.group_id, body.repo_access or [], access_level
+    )
+    if results and not any(r["ok"] for r in results.values()):
+        raise_for_failed_memberships(results, "Update project")
 
     # Update local DB
     user.platforms["gitlab"]["role"] = body.role
-    db.commit()
-    return {"detail": "Role updated"}
+    await asyncio.to_thread(db.commit)
+    failed = membership_fields(results).get("repo_failed")
+    return {"detail": "Role updated", "failed_projects": failed} if failed else {"detail": "Role updated"}
 
 
 @router.post("/users/{user_id}/remove")
-def remove_gitlab_access(user_id: int, body: GitLabRemoveAccess):
-    db = SessionLocal()
-    user = db.query(User).filter(User.id == user_id).first()
+async def remove_gitlab_access(user_id: int, body: GitLabRemoveAccess, db: Session = Depends(get_db)):
+    user = await asyncio.to_thread(_find_by_id, db, user_id)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
 
@@ -77,33 +93,31 @@ def remove_gitlab_access(user_id: int, body: GitLabRemoveAccess):
         raise HTTPException(status_code=400, detail="GitLab info not found")
 
     gitlab_id = user.platforms["gitlab"]["user_id"]
-    gitlab_service.remove_user_access(gitlab_id, body.group_id, body.repo_access or [])
+    await gitlab_service_async.remove_user_access(gitlab_id, body.group_id, body.repo_access or [])
 
     return {"detail": "Access removed"}
 
 
 @router.put("/users/{user_id}")
-def update_user(user_id: int, body: UpdateUserRequest):
-    db = SessionLocal()
-    user = db.query(User).filter(User.id == user_id).first()
+async def update_user(user_id: int, body: UpdateUserRequest, db: Session = Depends(get_db)):
+    user = await asyncio.to_thread(_find_by_id, db, user_id)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
 
     if body.email:
         user.email = body.email
     if body.password:
-        user.set_password(body.password)
+        user.password_hash = await hash_password_async(body.password)
     if body.platforms:
         user.platforms = body.platforms
 
-    db.commit()
+    await asyncio.to_thread(db.commit)
     return {"detail": "User updated"}
 
 
 @router.delete("/users/{user_id}")
-def delete_user(user_id: int):
-    db = SessionLocal()
-    user = db.query(User).filter(User.id == user_id).first()
+async def delete_user(user_id: int, db: Session = Depends(get_db)):
+    user = await asyncio.to_thread(_find_by_id, db, user_id)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
 
@@ -114,23 +128,21 @@ def delete_user(user_id: int):
         repos = gitlab_info.get("repo_access", [])
         
         if uid is not None: 
-            gitlab_service.remove_user_access(uid, gid, repos)
+            await gitlab_service_async.remove_user_access(uid, gid, repos)
 
-    db.delete(user)
-    db.commit()
+    await asyncio.to_thread(_delete, db, user)
     return {"detail": "User deleted"}
 
 @router.post("/users/create", response_model=UserOut)
-def create_gitlab_user_and_local(user_data: UserCreate):
-    db = SessionLocal()
+async def create_gitlab_user_and_local(user_data: UserCreate, db: Session = Depends(get_db)):
     try:
-        if db.query(User).filter(User.username == user_data.username).first():
+        if await asyncio.to_thread(_find_by_username, db, user_data.username):
             raise HTTPException(status_code=400, detail="User already exists")
 
-        hashed_pw = hash_password(user_data.password)
+        hashed_pw = await hash_password_async(user_data.password)
 
         # Create new user on GitLab
-        gitlab_user = gitlab_service.create_gitlab_user(
+        gitlab_user = await gitlab_service_async.create_gitlab_user(
             username=user_data.username,
             email=user_data.email,
             password=user_data.password
@@ -151,23 +163,13 @@ def create_gitlab_user_and_local(user_data: UserCreate):
                 }
             }
         )
-        db.add(user)
-        db.commit()
-        db.refresh(user)
+        await asyncio.to_thread(_save, db, user)
         return user
 
     except Exception as e:
-        db.rollback()
+        await asyncio.to_thread(db.rollback)
         raise HTTPException(status_code=500, detail=str(e))
-
-    finally:
-        db.close()
         
 @router.get("/users", response_model=list[UserOut])
-def get_all_users():
-    db = SessionLocal()
-    try:
-        users = db.query(User).all()
-        return users
-    finally:
-        db.close()
+def get_all_users(db: Session = Depends(get_db)):
+    return db.query(User).all()
@@ -1,6 +1,13 @@
-from fastapi import APIRouter, HTTPException,Body
+import json
+import logging
+from fastapi import APIRouter, HTTPException,Body, Query
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
-from services.google_drive import grant_folder_access, revoke_folder_access, update_permission, list_permissions
+from typing import Dict, List
+from services.google_drive import (
+    grant_folder_access, revoke_folder_access, update_permission, iter_permissions,
+    grant_folder_access_batch, revoke_folder_access_batch, update_permissions_batch,
+)
 
 router = APIRouter(
     tags=["Google Drive Integration"]
@@ -10,6 +17,19 @@ class RevokeAccessRequest(BaseModel):
     folder_id: str
     permission_id: str
 
+class BatchGrantRequest(BaseModel):
+    folder_id: str
+    user_emails: List[str]
+    role: str  # "reader", "writer", "commenter"
+
+class BatchRevokeRequest(BaseModel):
+    folder_id: str
+    permission_ids: List[str]
+
+class BatchUpdateRequest(BaseModel):
+    folder_id: str
+    roles: Dict[str, str]  # permission ID -> new role
+
 @router.post("/grant-access")
 def api_grant_access(
     folder_id: str,
@@ -41,9 +61,62 @@ def api_update_access(folder_id: str, permission_id: str, new_role: str):
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.post("/grant-access/batch")
+def api_grant_access_batch(data: BatchGrantRequest):
+    """
+    Grant a folder to many users in batched Drive requests; results are per email.
+    """
+    try:
+        return grant_folder_access_batch(data.folder_id, data.user_emails, data.role)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.delete("/revoke-access/batch")
+def api_revoke_access_batch(data: BatchRevokeRequest = Body(...)):
+    """
+    Revoke many permissions in batched Drive requests; results are per permission ID.
+    """
+    try:
+        return revoke_folder_access_batch(data.folder_id, data.permission_ids)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.put("/update-access/batch")
+def api_update_access_batch(data: BatchUpdateRequest):
+    """
+    Change many permission roles in batched Drive requests; results are per permission ID.
+    """
+    try:
+        return update_permissions_batch(data.folder_id, data.roles)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
 @router.get("/permissions")
-def api_list_permissions(folder_id: str):
+def api_list_permissions(folder_id: str, page_size: int = Query(None, ge=1, le=100)):
+    """
+    Stream every permission of a folder as {"permissions": [...]}, page by page.
+
+    If a later page fails, the status is already sent: the body then ends
+    with an "error" field next to the permissions listed so far.
+    """
+    permissions = iter_permissions(folder_id, page_size)
     try:
-        return list_permissions(folder_id)
+        # Fetch the first page up front so errors still come back as a 500
+        first = next(permissions, None)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+
+    def body():
+        yield '{"permissions":['
+        error = None
+        if first is not None:
+            yield json.dumps(first)
+            try:
+                for permission in permissions:
+                    yield "," + json.dumps(permission)
+            except Exception as e:
+                logging.error(f"[Drive] Listing permissions of {folder_id} failed part-way: {e}")
+                error = str(e)
+        yield "]" + (f',"error":{json.dumps(error)}' if error is not None else "") + "}"
+
+    return StreamingResponse(body(), media_type="application/json")
@@ -0,0 +1,12 @@
+from fastapi import APIRouter, HTTPException
+from schemas.job import JobOut
+from services.job_service import get_job
+
+router = APIRouter(tags=["Jobs"])
+
+@router.get("/jobs/{job_id}", response_model=JobOut)
+def get_job_status(job_id: str):
+    job = get_job(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
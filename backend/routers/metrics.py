@@ -0,0 +1,10 @@
+from fastapi import APIRouter, Response
+from utils.metrics import render
+
+router = APIRouter(tags=["Metrics"])
+
+@router.get("/metrics", include_in_schema=False)
+def get_metrics():
+    """Upstream, database and route metrics in Prometheus text format."""
+    body, content_type = render()
+    return Response(content=body, media_type=content_type)
@@ -1,6 +1,6 @@
 from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel
-from services import nextcloud_service
+from services import nextcloud_service_async
 from schemas.user import (
     FolderAccessRequest,
     GroupCreateRequest,
@@ -16,73 +16,73 @@ router = APIRouter(tags=["NextCloud"])
 
 # ----- USER ENDPOINTS -----
 @router.post("/users/create")
-def create_user(data: UserCreateRequest):
+async def create_user(data: UserCreateRequest):
     try:
-        return nextcloud_service.create_user(data.userid, data.password, data.email)
+        return await nextcloud_service_async.create_user(data.userid, data.password, data.email)
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
 @router.put("/users/update")
-def update_user(data: UpdateUserRequest):
+async def update_user(data: UpdateUserRequest):
     try:
-        return nextcloud_service.update_user(data.userid, data.key, data.value)
+        return await nextcloud_service_async.update_user(data.userid, data.key, data.value)
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
 @router.delete("/users/delete")
-def delete_user(data: UserDeleteRequest):
+async def delete_user(data: UserDeleteRequest):
     try:
-        return nextcloud_service.delete_user(data.userid)
+        return await nextcloud_service_async.delete_user(data.userid)
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
 # ----- SYSTEM GROUP ENDPOINTS -----
 @router.post("/groups/create")
-def create_group(data: GroupCreateRequest):
+async def create_group(data: GroupCreateRequest):
     try:
-        return nextcloud_service.create_group(data.groupid)
+        return await nextcloud_service_async.create_group(data.groupid)
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
 @router.post("/groups/add_member")
-def add_member(data: GroupMemberRequest):
+async def add_member(data: GroupMemberRequest):
     try:
-        return nextcloud_service.add_member_to_group(data.userid, data.groupid)
+        return await nextcloud_service_async.add_member_to_group(data.userid, data.groupid)
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
 @router.delete("/groups/remove_member")
-def remove_member(data: GroupMemberRequest):
+async def remove_member(data: GroupMemberRequest):
     try:
-        return nextcloud_service.remove_member_from_group(data.userid, data.groupid)
+        return await nextcloud_service_async.remove_member_from_group(data.userid, data.groupid)
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
 # ----- FOLDER SHARING ENDPOINTS -----
 @router.post("/folders/share")
-def share_folder(data: FolderAccessRequest):
+async def share_folder(data: FolderAccessRequest):
     try:
-        return nextcloud_service.share_folder(data.folder_path, data.userid, data.permission)
+        return await nextcloud_service_async.share_folder(data.folder_path, data.userid, data.permission)
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
 @router.put("/folders/update_permission")
-def update_folder_permission(data: UpdatePermissionRequest):
+async def update_folder_permission(data: UpdatePermissionRequest):
     try:
-        return nextcloud_service.update_folder_permission_all_user(data.share_id, data.new_permission)
+        return await nextcloud_service_async.update_folder_permission_all_user(data.share_id, data.new_permission)
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
 @router.delete("/folders/unshare/{share_id}")
-def unshare_folder(share_id: int):
+async def unshare_folder(share_id: int):
     try:
-        return nextcloud_service.unshare_folder_by_share_id(share_id)
+        return await nextcloud_service_async.unshare_folder_by_share_id(share_id)
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
 @router.post("/folders/unshare_by_user")
-def unshare_folder_by_user(data: UnshareByUserRequest):
+async def unshare_folder_by_user(data: UnshareByUserRequest):
     try:
-        return nextcloud_service.unshare_folder_by_user(data.folder_path, data.userid)
+        return await nextcloud_service_async.unshare_folder_by_user(data.folder_path, data.userid)
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
@@ -0,0 +1,23 @@
+from typing import List, Optional
+from fastapi import APIRouter, Query
+from services.reconcile_service import reconcile
+
+router = APIRouter(tags=["Reconciliation"])
+
+PLATFORM_PATTERN = "^(gitlab|mattermost|nextcloud|drive)$"
+
+@router.get("/reconcile")
+def get_drift(platform: Optional[List[str]] = Query(None)):
+    """
+    Report drift between local platform accounts and the platforms
+    (missing, extra and role_mismatch memberships) without changing anything.
+    """
+    return reconcile(platforms=platform)
+
+@router.post("/reconcile")
+def fix_drift(platform: Optional[List[str]] = Query(None), remove_extra: bool = Query(False)):
+    """
+    Report drift and fix it: add missing memberships and correct roles.
+    Members no local account expects are only removed with `remove_extra`.
+    """
+    return reconcile(fix=True, remove_extra=remove_extra, platforms=platform)
@@ -1,66 +1,127 @@
+import asyncio
+import json
 import logging
+from datetime import datetime
+from typing import Optional
+from services.import_service import import_users, iter_spooled, spool_body
 from services.user_service import create_user_with_platforms, delete_user_and_cleanup, update_user_with_platforms
-from fastapi import APIRouter, HTTPException
+from services.job_service import enqueue_job
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from fastapi.responses import JSONResponse, StreamingResponse
+from starlette.background import BackgroundTask
+from pydantic import TypeAdapter
 from sqlalchemy.orm import Session
-from db import SessionLocal
+from db import get_db
+from models.platform_account import PlatformAccount
 from models.user import User
+from schemas.job import JobAccepted
 from schemas.user import UserCreate, UserOut, UserUpdate
 
 router = APIRouter()
 
-@router.post("/users", response_model=UserOut)
-def create_user(user_data: UserCreate):
-    db: Session = SessionLocal()
+_user_list = TypeAdapter(list[UserOut])
+
+async def _accepted(kind: str, username: str, payload: dict) -> JSONResponse:
+    """Enqueue a provisioning job and answer 202 with its ID."""
+    job = await enqueue_job(kind, username, payload)
+    return JSONResponse(
+        status_code=202,
+        content=JobAccepted(job_id=job.id, status=job.status).model_dump(),
+        headers={"Location": f"/api/jobs/{job.id}"},
+    )
+
+@router.post("/users", response_model=UserOut, responses={202: {"model": JobAccepted}})
+async def create_user(user_data: UserCreate, background: bool = Query(False), db: Session = Depends(get_db)):
+    if background:
+        return await _accepted("create", user_data.username, user_data.model_dump(mode="json"))
+
     try:
-        return create_user_with_platforms(db, user_data)
+        return await create_user_with_platforms(db, user_data)
     except Exception as e:
         import traceback
         traceback.print_exc()
         logging.error(f"User creation failed: {e}")
-        db.rollback()
         raise
 
-    finally:
-        db.close()
+@router.post("/users/import")
+async def import_users_stream(request: Request, format: str = Query(None, pattern="^(csv|ndjson)$")):
+    """
+    Bulk-create users from a streamed CSV or NDJSON body.
+
+    The format comes from `?format=` or the Content-Type header. The body
+    is spooled (to disk when large) before the response starts, which then
+    streams one NDJSON result line per input row.
+    """
+    fmt = format or ("csv" if "csv" in request.headers.get("content-type", "") else "ndjson")
+    body = await spool_body(request.stream())
+
+    async def results():
+        async for result in import_users(iter_spooled(body), fmt):
+            yield json.dumps(result, default=str) + "\n"
+
+    return StreamingResponse(results(), media_type="application/x-ndjson", background=BackgroundTask(body.close))
 
 @router.get("/all_users", response_model=list[UserOut])
-def get_all_users():
-    db = SessionLocal()
-    try:
-        users = db.query(User).all()
-        return [
-            UserOut(
-                id=user.id,
-                username=user.username,
-                email=user.email,
-                created_at=user.created_at,
-                platforms=user.platforms if user.platforms else []
-            )
-            for user in users
-        ]
-    finally:
-        db.close()
-
-@router.patch("/users/{username}", response_model=UserOut)
-def update_user(username: str, user_update: UserUpdate):
-    db: Session = SessionLocal()
+def get_all_users(
+    limit: int = Query(100, ge=1, le=1000),
+    cursor: Optional[int] = Query(None, description="Return users with id greater than this"),
+    platform: Optional[str] = Query(None, pattern="^(gitlab|mattermost|nextcloud|drive)$"),
+    username_prefix: Optional[str] = None,
+    created_after: Optional[datetime] = None,
+    created_before: Optional[datetime] = None,
+    db: Session = Depends(get_db),
+):
+    """
+    List users ordered by id, one page at a time (keyset pagination).
+
+    When more users match, the id to pass as `cursor` for the next page is
+    returned in the X-Next-Cursor header. Rows are validated and encoded to
+    JSON in one pass instead of going through FastAPI's response_model
+    round trip.
+    """
+    query = db.query(User).order_by(User.id)
+    if cursor is not None:
+        query = query.filter(User.id > cursor)
+    if platform:
+        query = query.filter(User.accounts.any(PlatformAccount.platform == platform))
+    if username_prefix:
+        query = query.filter(User.username.startswith(username_prefix, autoescape=True))
+    if created_after:
+        query = query.filter(User.created_at >= created_after)
+    if created_before:
+        query = query.filter(User.created_at < created_before)
+
+    users = query.limit(limit + 1).all()
+    headers = {}
+    if len(users) > limit:
+        users = users[:limit]
+        headers["X-Next-Cursor"] = str(users[-1].id)
+
+    content = _user_list.dump_json(_user_list.validate_python(users, from_attributes=True))
+    return Response(content=content, media_type="application/json", headers=headers)
+
+@router.patch("/users/{username}", response_model=UserOut, responses={202: {"model": JobAccepted}})
+async def update_user(
+    username: str, user_update: UserUpdate, background: bool = Query(False), db: Session = Depends(get_db)
+):
+    if background:
+        return await _accepted("update", username, user_update.model_dump(mode="json"))
+
     try:
-        return update_user_with_platforms(db, username, user_update)
+        return await update_user_with_platforms(db, username, user_update)
     except Exception as e:
-        db.rollback()
+        await asyncio.to_thread(db.rollback)
         raise HTTPException(status_code=500, detail=str(e))
-    finally:
-        db.close()
 
-@router.delete("/users/{username}", response_model=dict)
-def delete_user(username: str):
-    db: Session = SessionLocal()
+@router.delete("/users/{username}", response_model=dict, responses={202: {"model": JobAccepted}})
+async def delete_user(username: str, background: bool = Query(False), db: Session = Depends(get_db)):
+    if background:
+        return await _accepted("delete", username, {})
+
     try:
-        delete_user_and_cleanup(db, username)
+        await delete_user_and_cleanup(db, username)
         return {"message": f"User '{username}' deleted successfully."}
     except HTTPException as e:
         raise e
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
-    finally:
-        db.close()
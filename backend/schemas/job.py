@@ -0,0 +1,23 @@
+from datetime import datetime
+
+from pydantic import BaseModel
+from typing import Any, Dict, Optional
+
+class JobAccepted(BaseModel):
+    job_id: str
+    status: str
+
+class JobOut(BaseModel):
+    id: str
+    kind: str
+    username: Optional[str] = None
+    status: str
+    progress: Dict[str, Dict[str, Any]] = {}
+    result: Optional[Any] = None
+    error: Optional[str] = None
+    created_at: Optional[datetime] = None
+    updated_at: Optional[datetime] = None
+
+    model_config = {
+        "from_attributes": True
+    }
@@ -52,6 +52,7 @@ class GitLabOutConfig(BaseModel):
     group_id: str
     role: Optional[str] = None
     repo_access: Optional[List[int]] = []
+    repo_failed: Optional[Dict[str, str]] = None
 
 class MattermostOutConfig(BaseModel):
     platform: Literal["mattermost"] = "mattermost"
@@ -1,51 +1,139 @@
-from typing import List, Optional
-import requests
-
-from config import GITLAB_API_BASE, HEADERS_GITLAB
+import logging
+from typing import Dict, List, Optional
+
+from config import (
+    GITLAB_CACHE_MAXSIZE, GITLAB_CACHE_NEGATIVE_TTL, GITLAB_CACHE_TTL, GITLAB_MEMBERSHIP_CONCURRENCY
+)
+from utils.cache import LookupCache
+from utils.http_client import get_client
+from utils.resilience import IDEMPOTENT
 from utils.roles import map_role_to_access_level
+from utils.steps import gather, http, lookup, run
 
-def add_account(config):
+# GitLab user ID indexes, shared with gitlab_service_async
+user_id_by_email = LookupCache(
+    GITLAB_CACHE_MAXSIZE, GITLAB_CACHE_TTL, GITLAB_CACHE_NEGATIVE_TTL
+)
+user_id_by_username = LookupCache(
+    GITLAB_CACHE_MAXSIZE, GITLAB_CACHE_TTL, GITLAB_CACHE_NEGATIVE_TTL
+)
+
+def _gitlab():
+    return get_client("gitlab")
+
+# Each operation is written once, as a generator of steps (see utils.steps);
+# gitlab_service_async drives the same generators with the async client.
+def _run(operation):
+    return run("gitlab", operation)
+
+def remember_gitlab_user(user: dict, email: Optional[str] = None):
     """
-    Add an existing GitLab user to a group and/or projects.
+    Index a GitLab user object by username and email.
 
     Args:
-        config (dict): Configuration dictionary containing:
-            - username (str): GitLab username.
-            - email (str): GitLab user email.
-            - group_id (int): GitLab group ID to add the user to.
-            - role (str): Role to assign (e.g., "Developer").
-            - repo_access (list): List of project IDs to grant access to.
+        user (dict): GitLab user object (needs "id", usually "username").
+        email (str, optional): Email the user was looked up or created with.
+    """
+    if user.get("username"):
+        user_id_by_username.set(user["username"], user["id"])
+    email = email or user.get("email")
+    if email:
+        user_id_by_email.set(email, user["id"])
+
+def forget_gitlab_user(user_id: int):
+    """Drop every cached index entry pointing at `user_id`."""
+    user_id_by_email.discard_value(user_id)
+    user_id_by_username.discard_value(user_id)
+
+def user_lookup_result(res):
+    """
+    Turn a /users search response into a cache entry: (user_id, cacheable).
 
-    Returns:
-        dict: Summary of user setup and access information.
+    Found users are also indexed by username.
     """
+    if res.status_code != 200:
+        return None, False
+    users = res.json()
+    if not users:
+        return None, True
+    remember_gitlab_user(users[0])
+    return users[0]["id"], True
+
+def _add_account(config):
     username = config.get("username")
     email = config.get("email")
     group_id = config.get("group_id")
     role = config.get("role", "Developer")
     repo_access = config.get("repo_access", [])
 
-    # Lookup user ID via email or username
-    user_id = find_gitlab_user_by_email(email) or find_gitlab_user_by_username(username)
+    # Prefer a known user ID, then lookup via email or username
+    user_id = config.get("user_id")
+    if not user_id:
+        user_id = yield from _find_gitlab_user_by_email(email)
+    if not user_id:
+        user_id = yield from _find_gitlab_user_by_username(username)
     if not user_id:
         raise Exception("GitLab user not found")
 
     # Add to group
     if group_id:
-        add_user_to_group(user_id, group_id, map_role_to_access_level(role))
+        yield from _add_user_to_group(user_id, group_id, map_role_to_access_level(role))
 
     # Add to repos/projects
-    for project_id in repo_access:
-        add_user_to_project(user_id, project_id, map_role_to_access_level(role))
+    results = yield from _batch_project_membership(user_id, repo_access, map_role_to_access_level(role))
+    if not group_id and results and not any(r["ok"] for r in results.values()):
+        # Nothing was granted, so there is no account to record
+        raise_for_failed_memberships(results, "Add to project")
 
     return {
         "platform": "gitlab",
         "user_id": user_id,
         "group_id": group_id,
         "role": role,
-        "repo_access": repo_access
+        **membership_fields(results),
     }
 
+def add_account(config):
+    """
+    Add an existing GitLab user to a group and/or projects.
+
+    Args:
+        config (dict): Configuration dictionary containing:
+            - username (str): GitLab username.
+            - email (str): GitLab user email.
+            - group_id (int): GitLab group ID to add the user to.
+            - role (str): Role to assign (e.g., "Developer").
+            - repo_access (list): List of project IDs to grant access to.
+            - user_id (int, optional): Known GitLab user ID; skips the lookup.
+
+    Returns:
+        dict: Summary of user setup and access information. "repo_access"
+        lists the projects actually granted; projects that failed are listed
+        under "repo_failed" (see `membership_fields`) instead of failing the
+        whole call. Raises only when no group was given and every project failed.
+    """
+    return _run(_add_account(config))
+
+def added_member(res, user_id: int, kind: str, scope_id):
+    """Check a POST /{kind}s/{id}/members response; 409 (already a member) is fine."""
+    if res.status_code == 409:
+        logging.info(f"[GitLab] User {user_id} already in {kind} {scope_id}")
+    elif res.status_code != 201:
+        raise Exception(f"[Error] Failed to add user to {kind}: {res.status_code} - {res.text}")
+
+def removed_member(res, user_id: int, kind: str, scope_id):
+    """Log the outcome of a DELETE /{kind}s/{id}/members/{user_id} call."""
+    if res.status_code >= 300:
+        logging.warning(f"[GitLab] Removing user {user_id} from {kind} {scope_id} failed: "
+                        f"{res.status_code} {res.text}")
+    else:
+        logging.info(f"[GitLab] Removed user {user_id} from {kind} {scope_id}")
+
+def _add_user_to_group(user_id: int, group_id: int, access_level: int):
+    payload = {"user_id": user_id, "access_level": access_level}
+    res = yield http("POST", f"/groups/{group_id}/members", data=payload, extensions=IDEMPOTENT)
+    added_member(res, user_id, "group", group_id)
+
 def add_user_to_group(user_id: int, group_id: int, access_level: int):
     """
     Add a user to a GitLab group.
@@ -55,14 +143,12 @@ def add_user_to_group(user_id: int, group_id: int, access_level: int):
         group_id (int): ID of the GitLab group.
         access_level (int): Access level to assign (e.g., 30 for Developer).
     """
-    url = f"{GITLAB_API_BASE}/groups/{group_id}/members"
-    payload = {"user_id": user_id, "access_level": access_level}
-    res = requests.post(url, headers=HEADERS_GITLAB, data=payload)
+    return _run(_add_user_to_group(user_id, group_id, access_level))
 
-    if res.status_code == 409:
-        print(f"[Info] User {user_id} already in group {group_id}")
-    elif res.status_code != 201:
-        raise Exception(f"[Error] Failed to add user to group: {res.status_code} - {res.text}")
+def _add_user_to_project(user_id: int, project_id: int, access_level: int):
+    payload = {"user_id": user_id, "access_level": access_level}
+    res = yield http("POST", f"/projects/{project_id}/members", data=payload, extensions=IDEMPOTENT)
+    added_member(res, user_id, "project", project_id)
 
 def add_user_to_project(user_id: int, project_id: int, access_level: int):
     """
@@ -73,18 +159,92 @@ def add_user_to_project(user_id: int, project_id: int, access_level: int):
         project_id (int): ID of the GitLab project.
         access_level (int): Access level to assign.
     """
-    url = f"{GITLAB_API_BASE}/projects/{project_id}/members"
-    payload = {"user_id": user_id, "access_level": access_level}
-    res = requests.post(url, headers=HEADERS_GITLAB, data=payload)
+    return _run(_add_user_to_project(user_id, project_id, access_level))
 
+def membership_result(res, success_statuses) -> dict:
+    """
+    Classify a membership API response. 409 (already a member) counts as success.
+    """
+    if res.status_code in success_statuses:
+        return {"ok": True, "status": res.status_code}
     if res.status_code == 409:
-        print(f"[Info] User {user_id} already in project {project_id}")
-    elif res.status_code != 201:
-        raise Exception(f"[Error] Failed to add user to project: {res.status_code} - {res.text}")
+        return {"ok": True, "status": 409, "detail": "already a member"}
+    return {"ok": False, "status": res.status_code, "error": res.text}
+
+def membership_request(user_id: int, project_id: int, access_level: int, update: bool):
+    """Return (method, path, form data, success statuses) for one membership call."""
+    if update:
+        return "PUT", f"/projects/{project_id}/members/{user_id}", {"access_level": access_level}, (200, 201)
+    payload = {"user_id": user_id, "access_level": access_level}
+    return "POST", f"/projects/{project_id}/members", payload, (201,)
+
+def _membership_call(user_id: int, project_id: int, access_level: int, update: bool):
+    method, path, data, success_statuses = membership_request(user_id, project_id, access_level, update)
+    try:
+        res = yield http(method, path, data=data, extensions=IDEMPOTENT)
+    except Exception as e:
+        return {"ok": False, "error": str(e)}
+    return membership_result(res, success_statuses)
+
+def _batch_project_membership(user_id: int, project_ids: List[int], access_level: int, update: bool = False):
+    calls = (_membership_call(user_id, pid, access_level, update) for pid in project_ids)
+    outcomes = yield gather(calls, GITLAB_MEMBERSHIP_CONCURRENCY)
+    return dict(zip(project_ids, outcomes))
+
+def batch_project_membership(user_id: int, project_ids: List[int], access_level: int,
+                             update: bool = False) -> Dict[int, dict]:
+    """
+    Add (or, with `update=True`, change) a user's access on many projects concurrently.
+
+    At most GITLAB_MEMBERSHIP_CONCURRENCY calls run at once. A failing
+    project does not stop the others.
+
+    Args:
+        user_id (int): ID of the GitLab user.
+        project_ids (List[int]): Project IDs to grant/update.
+        access_level (int): Access level to assign.
+        update (bool): PUT an existing membership instead of POSTing a new one.
+
+    Returns:
+        dict: {project_id: {"ok": bool, "status": int, "error"/"detail": str}}
+    """
+    return _run(_batch_project_membership(user_id, project_ids, access_level, update))
+
+def membership_fields(results: Dict[int, dict]) -> dict:
+    """
+    Config fields recording per-project results: the granted project IDs
+    under "repo_access" and, if any failed, project ID -> error under
+    "repo_failed". Projects missing from "repo_access" are added (not
+    updated) by the next update, so only the failures are sent again.
+    """
+    fields = {"repo_access": [pid for pid, r in results.items() if r["ok"]]}
+    failed = {
+        str(pid): f"{r.get('status', '')} {r['error']}".strip()
+        for pid, r in results.items() if not r["ok"]
+    }
+    if failed:
+        fields["repo_failed"] = failed
+    return fields
+
+def raise_for_failed_memberships(results: Dict[int, dict], action: str):
+    """Raise one exception naming only the projects that failed."""
+    failed = {pid: r for pid, r in results.items() if not r["ok"]}
+    if failed:
+        details = "; ".join(f"{pid}: {r.get('status', '')} {r['error']}".strip() for pid, r in failed.items())
+        raise Exception(f"{action} failed for {len(failed)}/{len(results)} projects: {details}")
+
+def _load_user_id(params: dict):
+    res = yield http("GET", "/users", params=params)
+    return user_lookup_result(res)
+
+def _find_gitlab_user_by_email(email: str):
+    if not email:
+        return None
+    return (yield lookup(user_id_by_email, email, lambda: _load_user_id({"search": email})))
 
 def find_gitlab_user_by_email(email: str):
     """
-    Search for a GitLab user by email.
+    Search for a GitLab user by email (cached).
 
     Args:
         email (str): Email address.
@@ -92,17 +252,16 @@ def find_gitlab_user_by_email(email: str):
     Returns:
         int or None: User ID if found, otherwise None.
     """
-    if not email:
+    return _run(_find_gitlab_user_by_email(email))
+
+def _find_gitlab_user_by_username(username: str):
+    if not username:
         return None
-    url = f"{GITLAB_API_BASE}/users?search={email}"
-    res = requests.get(url, headers=HEADERS_GITLAB)
-    if res.status_code == 200 and res.json():
-        return res.json()[0]["id"]
-    return None
+    return (yield lookup(user_id_by_username, username, lambda: _load_user_id({"username": username})))
 
 def find_gitlab_user_by_username(username: str):
     """
-    Search for a GitLab user by username.
+    Search for a GitLab user by username (cached).
 
     Args:
         username (str): GitLab username.
@@ -110,13 +269,15 @@ def find_gitlab_user_by_username(username: str):
     Returns:
         int or None: User ID if found, otherwise None.
     """
-    if not username:
-        return None
-    url = f"{GITLAB_API_BASE}/users?username={username}"
-    res = requests.get(url, headers=HEADERS_GITLAB)
-    if res.status_code == 200 and res.json():
-        return res.json()[0]["id"]
-    return None
+    return _run(_find_gitlab_user_by_username(username))
+
+def _update_user_role(user_id: int, group_id: Optional[int], repo_ids: List[int], access_level: int):
+    if group_id:
+        res = yield http("PUT", f"/groups/{group_id}/members/{user_id}", data={"access_level": access_level})
+        if res.status_code not in [200, 201]:
+            raise Exception(f"Update group failed: {res.text}")
+
+    return (yield from _batch_project_membership(user_id, repo_ids, access_level, update=True))
 
 def update_user_role(user_id: int, group_id: Optional[int], repo_ids: List[int], access_level: int):
     """
@@ -127,19 +288,21 @@ def update_user_role(user_id: int, group_id: Optional[int], repo_ids: List[int],
         group_id (int or None): GitLab group ID.
         repo_ids (List[int]): List of project IDs.
         access_level (int): New access level.
+
+    Returns:
+        dict: Per-project results from `batch_project_membership`; a failed
+        project does not raise, the caller decides what to do with it.
     """
+    return _run(_update_user_role(user_id, group_id, repo_ids, access_level))
+
+def _remove_user_access(user_id: int, group_id: Optional[str], repo_ids: List[int]):
     if group_id:
-        url = f"{GITLAB_API_BASE}/groups/{group_id}/members/{user_id}"
-        res = requests.put(url, headers=HEADERS_GITLAB, data={"access_level": access_level})
-        if res.status_code not in [200, 201]:
-            raise Exception(f"Update group failed: {res.text}")
-    
+        response = yield http("DELETE", f"/groups/{group_id}/members/{user_id}")
+        removed_member(response, user_id, "group", group_id)
+
     for repo_id in repo_ids:
-        url = f"{GITLAB_API_BASE}/projects/{repo_id}/members/{user_id}"
-        res = requests.put(url, headers=HEADERS_GITLAB, data={"access_level": access_level})
-        if res.status_code not in [200, 201]:
-            print(f"[Error] Response: {res.status_code} - {res.text}")
-            raise Exception(f"Update project failed: {res.text}")
+        response = yield http("DELETE", f"/projects/{repo_id}/members/{user_id}")
+        removed_member(response, user_id, "project", repo_id)
 
 def remove_user_access(user_id: int, group_id: Optional[str], repo_ids: List[int]):
     """
@@ -150,15 +313,25 @@ def remove_user_access(user_id: int, group_id: Optional[str], repo_ids: List[int
         group_id (str or None): GitLab group ID.
         repo_ids (List[int]): List of project IDs.
     """
-    if group_id:
-        group_url = f"{GITLAB_API_BASE}/groups/{group_id}/members/{user_id}"
-        response = requests.delete(group_url, headers=HEADERS_GITLAB)
-        print(f"Remove from group {group_id}: {response.status_code}")
+    return _run(_remove_user_access(user_id, group_id, repo_ids))
 
-    for repo_id in repo_ids:
-        repo_url = f"{GITLAB_API_BASE}/projects/{repo_id}/members/{user_id}"
-        response = requests.delete(repo_url, headers=HEADERS_GITLAB)
-        print(f"Remove from repo {repo_id}: {response.status_code}")
+def _create_gitlab_user(username, email, password):
+    payload = {
+        "username": username,
+        "email": email,
+        "name": username,
+        "password": password,
+        "skip_confirmation": True
+    }
+
+    response = yield http("POST", "/users", json=payload)
+    
+    if response.status_code == 201:
+        created = response.json()
+        remember_gitlab_user(created, email)
+        return created
+    else:
+        raise Exception(f"Failed to create GitLab user: {response.status_code} {response.text}")
 
 def create_gitlab_user(username, email, password):
     """
@@ -175,21 +348,18 @@ def create_gitlab_user(username, email, password):
     Raises:
         Exception: If user creation fails.
     """
-    url = f"{GITLAB_API_BASE}/users"
-    payload = {
-        "username": username,
-        "email": email,
-        "name": username,
-        "password": password,
-        "skip_confirmation": True
-    }
+    return _run(_create_gitlab_user(username, email, password))
 
-    response = requests.post(url, json=payload, headers=HEADERS_GITLAB)
-    
-    if response.status_code == 201:
-        return response.json()
+def _delete_gitlab_user(user_id: int):
+    response = yield http("DELETE", f"/users/{user_id}")
+
+    if response.status_code == 204:
+        forget_gitlab_user(user_id)
+        return {"status": "deleted"}
+    elif response.status_code == 404:
+        raise Exception("User not found.")
     else:
-        raise Exception(f"Failed to create GitLab user: {response.status_code} {response.text}")
+        raise Exception(f"Failed to delete GitLab user: {response.status_code} {response.text}")
 
 def delete_gitlab_user(user_id: int):
     """
@@ -204,15 +374,7 @@ def delete_gitlab_user(user_id: int):
     Raises:
         Exception: If deletion fails or user not found.
     """
-    url = f"{GITLAB_API_BASE}/users/{user_id}"
-    response = requests.delete(url, headers=HEADERS_GITLAB)
-
-    if response.status_code == 204:
-        return {"status": "deleted"}
-    elif response.status_code == 404:
-        raise Exception("User not found.")
-    else:
-        raise Exception(f"Failed to delete GitLab user: {response.status_code} {response.text}")
+    return _run(_delete_gitlab_user(user_id))
 
 def get_gitlab_user_id(username: str) -> Optional[int]:
     """
@@ -224,11 +386,29 @@ def get_gitlab_user_id(username: str) -> Optional[int]:
     Returns:
         int or None: User ID if found, else None.
     """
-    url = f"{GITLAB_API_BASE}/users?username={username}"
-    
-    response = requests.get(url, headers=HEADERS_GITLAB)
-    if response.status_code == 200:
-        users = response.json()
-        if users:
-            return users[0]["id"]
-    return None
+    return find_gitlab_user_by_username(username)
+
+def list_members(kind: str, scope_id) -> Dict[int, int]:
+    """
+    List all direct members of a group or project, following pagination.
+
+    Args:
+        kind (str): "groups" or "projects".
+        scope_id (int or str): Group or project ID.
+
+    Returns:
+        dict: GitLab user ID -> access level.
+
+    Raises:
+        Exception: If a page cannot be fetched.
+    """
+    members = {}
+    page = "1"
+    while page:
+        res = _gitlab().get(f"/{kind}/{scope_id}/members", params={"per_page": 100, "page": page})
+        if res.status_code != 200:
+            raise Exception(f"Failed to list members of {kind} {scope_id}: {res.status_code} {res.text}")
+        for member in res.json():
+            members[member["id"]] = member["access_level"]
+        page = res.headers.get("X-Next-Page")
+    return members
@@ -0,0 +1,55 @@
+from typing import Dict, List, Optional
+
+from services import gitlab_service
+from utils.steps import arun
+
+# Async variants of `gitlab_service`: the same operations, driven with the
+# async client.
+
+async def _run(operation):
+    return await arun("gitlab", operation)
+
+async def add_account(config):
+    """Async variant of `gitlab_service.add_account`."""
+    return await _run(gitlab_service._add_account(config))
+
+async def add_user_to_group(user_id: int, group_id: int, access_level: int):
+    """Async variant of `gitlab_service.add_user_to_group`."""
+    return await _run(gitlab_service._add_user_to_group(user_id, group_id, access_level))
+
+async def add_user_to_project(user_id: int, project_id: int, access_level: int):
+    """Async variant of `gitlab_service.add_user_to_project`."""
+    return await _run(gitlab_service._add_user_to_project(user_id, project_id, access_level))
+
+async def batch_project_membership(user_id: int, project_ids: List[int], access_level: int,
+                                   update: bool = False) -> Dict[int, dict]:
+    """Async variant of `gitlab_service.batch_project_membership`."""
+    return await _run(gitlab_service._batch_project_membership(user_id, project_ids, access_level, update))
+
+async def find_gitlab_user_by_email(email: str):
+    """Async variant of `gitlab_service.find_gitlab_user_by_email`."""
+    return await _run(gitlab_service._find_gitlab_user_by_email(email))
+
+async def find_gitlab_user_by_username(username: str):
+    """Async variant of `gitlab_service.find_gitlab_user_by_username`."""
+    return await _run(gitlab_service._find_gitlab_user_by_username(username))
+
+async def update_user_role(user_id: int, group_id: Optional[int], repo_ids: List[int], access_level: int):
+    """Async variant of `gitlab_service.update_user_role`."""
+    return await _run(gitlab_service._update_user_role(user_id, group_id, repo_ids, access_level))
+
+async def remove_user_access(user_id: int, group_id: Optional[str], repo_ids: List[int]):
+    """Async variant of `gitlab_service.remove_user_access`."""
+    return await _run(gitlab_service._remove_user_access(user_id, group_id, repo_ids))
+
+async def create_gitlab_user(username, email, password):
+    """Async variant of `gitlab_service.create_gitlab_user`."""
+    return await _run(gitlab_service._create_gitlab_user(username, email, password))
+
+async def delete_gitlab_user(user_id: int):
+    """Async variant of `gitlab_service.delete_gitlab_user`."""
+    return await _run(gitlab_service._delete_gitlab_user(user_id))
+
+async def get_gitlab_user_id(username: str) -> Optional[int]:
+    """Async variant of `gitlab_service.get_gitlab_user_id`."""
+    return await find_gitlab_user_by_username(username)
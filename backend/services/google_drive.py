@@ -1,6 +1,44 @@
 import os
+import time
+from typing import Dict, Iterator, List, Optional
 
 import config
+from utils.http_client import get_breaker
+from utils.metrics import observe_upstream
+from utils.tracing import span
+
+# Max calls per Drive batch HTTP request
+DRIVE_BATCH_LIMIT = 100
+
+# Permission fields returned by list calls
+PERMISSION_FIELDS = "id,type,role,emailAddress"
+
+def _execute(request, operation: str):
+    """
+    Execute a Drive API request (or batch) through the Drive circuit breaker,
+    recording it in the upstream metrics. Single requests are retried by the
+    client library on 5xx/429 and connection errors, with jittered backoff.
+    """
+    breaker = get_breaker("drive")
+    breaker.before_call()
+    start = time.perf_counter()
+    status = None
+    try:
+        with span("http.drive", operation=operation):
+            if operation == "batch":
+                result = request.execute()
+            else:
+                result = request.execute(num_retries=config.HTTP_RETRY_ATTEMPTS)
+        status = 200
+        breaker.record(True)
+        return result
+    except Exception as e:
+        status = getattr(getattr(e, "resp", None), "status", None)
+        breaker.record(bool(status) and int(status) < 500)
+        raise
+    finally:
+        observe_upstream("drive", operation, int(status) if status else None, time.perf_counter() - start)
+
 
 def grant_folder_access(shared_folder_id: str, user_email: str, role: str):
     """
@@ -20,12 +58,12 @@ def grant_folder_access(shared_folder_id: str, user_email: str, role: str):
         "emailAddress": user_email,
     }
 
-    result = config.drive_service.permissions().create(
+    result = _execute(config.get_drive_service().permissions().create(
         fileId=shared_folder_id,
         body=permission,
         fields="id",
         sendNotificationEmail=False,
-    ).execute()
+    ), "permissions.create")
 
     return {"permission_id": result["id"]}
 
@@ -41,9 +79,39 @@ def revoke_folder_access(shared_folder_id: str, permission_id: str):
     Returns:
         dict: API response.
     """
-    return config.drive_service.permissions().delete(
+    return _execute(config.get_drive_service().permissions().delete(
         fileId=shared_folder_id, permissionId=permission_id
-    ).execute()
+    ), "permissions.delete")
+
+
+def iter_permissions(
+    shared_folder_id: str, page_size: Optional[int] = None, fields: str = PERMISSION_FIELDS
+) -> Iterator[dict]:
+    """
+    Yield every permission of a folder, following page tokens.
+
+    Args:
+        shared_folder_id (str): The ID of the folder (shared drives included).
+        page_size (int): Permissions per page; defaults to DRIVE_PERMISSIONS_PAGE_SIZE.
+        fields (str): Permission fields to return.
+
+    Yields:
+        dict: One permission with the requested fields.
+    """
+    permissions = config.get_drive_service().permissions()
+    page_token = None
+    while True:
+        response = _execute(permissions.list(
+            fileId=shared_folder_id,
+            pageSize=page_size or config.DRIVE_PERMISSIONS_PAGE_SIZE,
+            pageToken=page_token,
+            fields=f"nextPageToken,permissions({fields})",
+            supportsAllDrives=True,
+        ), "permissions.list")
+        yield from response.get("permissions", [])
+        page_token = response.get("nextPageToken")
+        if not page_token:
+            return
 
 
 def list_permissions(shared_folder_id: str):
@@ -56,7 +124,7 @@ def list_permissions(shared_folder_id: str):
     Returns:
         dict: A dictionary containing the list of permissions.
     """
-    return config.drive_service.permissions().list(fileId=shared_folder_id).execute()
+    return {"permissions": list(iter_permissions(shared_folder_id))}
 
 
 def update_permission(shared_folder_id: str, permission_id: str, new_role: str):
@@ -71,8 +139,117 @@ def update_permission(shared_folder_id: str, permission_id: str, new_role: str):
     Returns:
         dict: API response.
     """
-    return config.drive_service.permissions().update(
+    return _execute(config.get_drive_service().permissions().update(
         fileId=shared_folder_id,
         permissionId=permission_id,
         body={"role": new_role}
-    ).execute()
+    ), "permissions.update")
+
+
+def _execute_batch(requests: Dict[str, object]) -> Dict[str, dict]:
+    """
+    Send Drive API requests in batches of at most DRIVE_BATCH_LIMIT calls.
+
+    Args:
+        requests (dict): Key (e.g. user email) -> unexecuted API request.
+
+    Returns:
+        dict: Key -> {"result": response} or {"error": message}.
+    """
+    service = config.get_drive_service()
+    keys = list(requests)
+    results = {}
+
+    def callback(request_id, response, exception):
+        key = keys[int(request_id)]
+        if exception is not None:
+            results[key] = {"error": str(exception)}
+        else:
+            results[key] = {"result": response}
+
+    for start in range(0, len(keys), DRIVE_BATCH_LIMIT):
+        batch = service.new_batch_http_request(callback=callback)
+        for index in range(start, min(start + DRIVE_BATCH_LIMIT, len(keys))):
+            batch.add(requests[keys[index]], request_id=str(index))
+        try:
+            _execute(batch, "batch")
+        except Exception as e:
+            # The whole multipart request failed; mark its calls that got no answer
+            for key in keys[start:start + DRIVE_BATCH_LIMIT]:
+                results.setdefault(key, {"error": str(e)})
+
+    return {key: results.get(key, {"error": "No response in batch"}) for key in keys}
+
+
+def grant_folder_access_batch(shared_folder_id: str, user_emails: List[str], role: str) -> Dict[str, dict]:
+    """
+    Grant the same role on a folder to many users in batched requests.
+
+    Args:
+        shared_folder_id (str): The ID of the Google Drive folder.
+        user_emails (list): Emails of the users to grant access to.
+        role (str): The access role ("reader", "writer", "commenter").
+
+    Returns:
+        dict: Email -> {"permission_id": ...} or {"error": ...}.
+    """
+    permissions = config.get_drive_service().permissions()
+    requests = {
+        email: permissions.create(
+            fileId=shared_folder_id,
+            body={"type": "user", "role": role, "emailAddress": email},
+            fields="id",
+            sendNotificationEmail=False,
+        )
+        for email in dict.fromkeys(user_emails)
+    }
+    return {
+        email: {"permission_id": outcome["result"]["id"]} if "result" in outcome else outcome
+        for email, outcome in _execute_batch(requests).items()
+    }
+
+
+def revoke_folder_access_batch(shared_folder_id: str, permission_ids: List[str]) -> Dict[str, dict]:
+    """
+    Revoke many permissions on a folder in batched requests.
+
+    Args:
+        shared_folder_id (str): The ID of the folder.
+        permission_ids (list): Permission IDs to revoke.
+
+    Returns:
+        dict: Permission ID -> {"status": "revoked"} or {"error": ...}.
+    """
+    permissions = config.get_drive_service().permissions()
+    requests = {
+        permission_id: permissions.delete(fileId=shared_folder_id, permissionId=permission_id)
+        for permission_id in dict.fromkeys(permission_ids)
+    }
+    return {
+        permission_id: {"status": "revoked"} if "result" in outcome else outcome
+        for permission_id, outcome in _execute_batch(requests).items()
+    }
+
+
+def update_permissions_batch(shared_folder_id: str, roles: Dict[str, str]) -> Dict[str, dict]:
+    """
+    Update the roles of many permissions on a folder in batched requests.
+
+    Args:
+        shared_folder_id (str): The ID of the folder.
+        roles (dict): Permission ID -> new role.
+
+    Returns:
+        dict: Permission ID -> {"status": "updated"} or {"error": ...}.
+    """
+    permissions = config.get_drive_service().permissions()
+    requests = {
+        permission_id: permissions.update(
+            fileId=shared_folder_id, permissionId=permission_id, body={"role": role}
+        )
+        for permission_id, role in roles.items()
+    }
+    return {
+        permission_id: {"status": "updated"} if "result" in outcome else outcome
+        for permission_id, outcome in _execute_batch(requests).items()
+    }
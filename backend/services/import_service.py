@@ -0,0 +1,220 @@
+import asyncio
+import csv
+import json
+import tempfile
+from datetime import datetime
+from typing import IO, AsyncIterator, Dict, List
+
+from fastapi import HTTPException
+from pydantic import ValidationError
+from sqlalchemy import func, or_
+from sqlalchemy.exc import IntegrityError
+
+from config import IMPORT_BATCH_SIZE, IMPORT_PLATFORM_CONCURRENCY, IMPORT_SPOOL_MAX_MEMORY
+from db import SessionLocal
+from models.user import User
+from schemas.user import UserCreate
+from services.user_service import PLATFORM_ORDER, provision_platforms
+from utils.security import hash_passwords
+
+SPOOL_READ_SIZE = 64 * 1024
+
+async def spool_body(chunks: AsyncIterator[bytes]) -> IO[bytes]:
+    """
+    Receive a request body completely, in memory up to IMPORT_SPOOL_MAX_MEMORY
+    bytes and in a temporary file beyond that.
+
+    The body has to be read before the handler returns: once a streaming
+    response has started, the request stream can no longer be received.
+    """
+    body = tempfile.SpooledTemporaryFile(max_size=IMPORT_SPOOL_MAX_MEMORY)
+    try:
+        async for chunk in chunks:
+            await asyncio.to_thread(body.write, chunk)
+    except BaseException:
+        body.close()
+        raise
+    body.seek(0)
+    return body
+
+async def iter_spooled(body: IO[bytes]) -> AsyncIterator[bytes]:
+    """Read a spooled body back in chunks, closing it when done."""
+    try:
+        while chunk := await asyncio.to_thread(body.read, SPOOL_READ_SIZE):
+            yield chunk
+    finally:
+        body.close()
+
+async def iter_lines(chunks: AsyncIterator[bytes]) -> AsyncIterator[str]:
+    """Split a byte stream into text lines without buffering the whole body."""
+    pending = b""
+    async for chunk in chunks:
+        pending += chunk
+        *lines, pending = pending.split(b"\n")
+        for line in lines:
+            yield line.decode("utf-8").rstrip("\r")
+    if pending:
+        yield pending.decode("utf-8").rstrip("\r")
+
+async def iter_records(chunks: AsyncIterator[bytes], fmt: str) -> AsyncIterator[dict]:
+    """
+    Parse a streamed CSV or NDJSON body into one dict per row.
+
+    CSV needs a header row (username,email,password[,platforms]); the
+    optional `platforms` column holds a JSON list of platform configs.
+    Quoted fields spanning several lines are not supported.
+    """
+    header = None
+    async for line in iter_lines(chunks):
+        if not line.strip():
+            continue
+        if fmt == "ndjson":
+            yield json.loads(line)
+            continue
+
+        values = next(csv.reader([line]))
+        if header is None:
+            header = [name.strip() for name in values]
+            continue
+        record = dict(zip(header, values))
+        if record.get("platforms"):
+            record["platforms"] = json.loads(record["platforms"])
+        else:
+            record.pop("platforms", None)
+        yield record
+
+async def import_users(chunks: AsyncIterator[bytes], fmt: str) -> AsyncIterator[dict]:
+    """
+    Create users from a streamed CSV/NDJSON body, yielding one result per row.
+
+    Rows are handled in batches of IMPORT_BATCH_SIZE: one duplicate query
+    per batch, platforms provisioned concurrently across rows (at most
+    IMPORT_PLATFORM_CONCURRENCY calls in flight per platform), and one
+    commit per batch. Passwords of a batch are hashed in parallel on the
+    password-hashing process pool.
+    """
+    limits = {name: asyncio.Semaphore(IMPORT_PLATFORM_CONCURRENCY) for name in PLATFORM_ORDER}
+    seen = set()
+    batch = []
+    row_number = 0
+
+    try:
+        async for record in iter_records(chunks, fmt):
+            row_number += 1
+            batch.append((row_number, record))
+            if len(batch) >= IMPORT_BATCH_SIZE:
+                for result in await _import_batch(batch, seen, limits):
+                    yield result
+                batch = []
+    except (ValueError, csv.Error) as e:
+        # Malformed input stops the stream; rows already imported are kept
+        for result in await _import_batch(batch, seen, limits):
+            yield result
+        yield {"row": row_number + 1, "status": "failed", "error": f"Unreadable input: {e}"}
+        return
+
+    for result in await _import_batch(batch, seen, limits):
+        yield result
+
+async def _import_batch(batch, seen: set, limits: Dict[str, asyncio.Semaphore]) -> List[dict]:
+    if not batch:
+        return []
+
+    results = {}
+    candidates = []
+    for row, record in batch:
+        try:
+            user_data = UserCreate.model_validate(record)
+        except ValidationError as e:
+            results[row] = {"row": row, "status": "failed", "error": json.loads(e.json(include_url=False))}
+            continue
+        key_username, key_email = user_data.username, user_data.email.lower()
+        if key_username in seen or key_email in seen:
+            results[row] = {"row": row, "username": user_data.username, "status": "skipped",
+                            "error": "Duplicate row in import"}
+            continue
+        seen.update((key_username, key_email))
+        candidates.append((row, user_data))
+
+    # Keep attributes loaded after commit so result rows don't re-query each user
+    db = SessionLocal(expire_on_commit=False)
+    try:
+        existing = await asyncio.to_thread(_existing_users, db, [u for _, u in candidates])
+        pending = []
+        for row, user_data in candidates:
+            if user_data.username in existing or user_data.email.lower() in existing:
+                results[row] = {"row": row, "username": user_data.username, "status": "skipped",
+                                "error": "User already exists"}
+            else:
+                pending.append((row, user_data))
+
+        hashes, provisioned = await asyncio.gather(
+            hash_passwords([u.password for _, u in pending]),
+            asyncio.gather(*(_provision_user(u, limits) for _, u in pending)),
+        )
+
+        users = []
+        for (row, user_data), hashed_pw, (platforms, error) in zip(pending, hashes, provisioned):
+            if error is not None:
+                results[row] = {"row": row, "username": user_data.username, "status": "failed", "error": error}
+            else:
+                users.append((row, User(
+                    username=user_data.username,
+                    email=user_data.email,
+                    password_hash=hashed_pw,
+                    created_at=datetime.utcnow(),
+                    platforms=platforms,
+                )))
+
+        for row, user in await asyncio.to_thread(_insert_users, db, users):
+            results[row] = user
+    finally:
+        db.close()
+
+    return [results[row] for row, _ in batch]
+
+def _existing_users(db, users: List[UserCreate]) -> set:
+    """Usernames and (lowercased) emails of a batch that already exist, in one query."""
+    if not users:
+        return set()
+    usernames = [u.username for u in users]
+    emails = [u.email.lower() for u in users]
+    rows = db.query(User.username, User.email).filter(
+        or_(User.username.in_(usernames), func.lower(User.email).in_(emails))
+    ).all()
+    return {name for name, _ in rows} | {email.lower() for _, email in rows if email}
+
+async def _provision_user(user_data: UserCreate, limits: Dict[str, asyncio.Semaphore]):
+    """Provision platforms for one row; returns (platforms, None) or (None, error)."""
+    try:
+        return await provision_platforms(user_data, user_data.platforms or [], limits=limits), None
+    except HTTPException as e:
+        return None, e.detail
+    except Exception as e:
+        return None, str(e)
+
+def _insert_users(db, users):
+    """Commit the batch at once; if that fails, fall back to row-by-row commits."""
+    if not users:
+        return []
+    try:
+        db.add_all([user for _, user in users])
+        db.commit()
+        return [(row, _created(row, user)) for row, user in users]
+    except IntegrityError:
+        db.rollback()
+
+    results = []
+    for row, user in users:
+        try:
+            db.add(user)
+            db.commit()
+            results.append((row, _created(row, user)))
+        except IntegrityError as e:
+            db.rollback()
+            results.append((row, {"row": row, "username": user.username, "status": "failed",
+                                  "error": str(e.orig)}))
+    return results
+
+def _created(row: int, user: User) -> dict:
+    return {"row": row, "username": user.username, "status": "created", "id": user.id}
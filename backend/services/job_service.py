@@ -0,0 +1,310 @@
+import asyncio
+import json
+import logging
+import os
+import socket
+import uuid
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+from fastapi import HTTPException
+from sqlalchemy import or_
+
+from config import JOB_LEASE_SECONDS, JOB_WORKERS
+from db import SessionLocal
+from models.job import Job
+from schemas.user import UserCreate, UserOut, UserUpdate
+from services import user_service
+from utils.tracing import span
+
+ACTIVE_STATUSES = ("queued", "running")
+
+# Identifies this process as the owner of the jobs it claims. Owners renew
+# their leases every JOB_LEASE_SECONDS / 3; a job whose lease ran out belongs
+# to a process that died and may be taken over by any replica.
+WORKER_ID = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+# Request fields never written to jobs.payload. They are kept in this
+# process's memory until the job finishes; the payload only lists their names.
+SECRET_FIELDS = ("password",)
+
+_queue: Optional[asyncio.Queue] = None
+_workers = []
+_maintainer: Optional[asyncio.Task] = None
+_secrets: Dict[str, dict] = {}
+
+def _insert_job(job: Job) -> Job:
+    db = SessionLocal()
+    try:
+        db.add(job)
+        db.commit()
+        db.refresh(job)
+        db.expunge(job)
+        return job
+    finally:
+        db.close()
+
+async def enqueue_job(kind: str, username: str, payload: dict) -> Job:
+    """
+    Persist a provisioning job and hand it to the worker pool.
+
+    Secret fields (the password) are held in memory only, so they never
+    reach the database.
+
+    Args:
+        kind (str): "create", "update" or "delete".
+        username (str): Local username the job acts on.
+        payload (dict): JSON-serializable request body for the job.
+
+    Returns:
+        Job: The stored job (status "queued").
+    """
+    if _queue is None:
+        raise HTTPException(status_code=503, detail="Job workers are not running")
+
+    payload = dict(payload)
+    secrets = {name: payload.pop(name) for name in SECRET_FIELDS if payload.get(name) is not None}
+    if secrets:
+        payload["withheld"] = sorted(secrets)
+
+    now = datetime.utcnow()
+    job = Job(
+        id=uuid.uuid4().hex,
+        kind=kind,
+        username=username,
+        status="queued",
+        payload=payload,
+        progress={},
+        owner=WORKER_ID,
+        lease_expires_at=_lease_end(now),
+        created_at=now,
+        updated_at=now,
+    )
+    job = await asyncio.to_thread(_insert_job, job)
+
+    if secrets:
+        _secrets[job.id] = secrets
+    _queue.put_nowait(job.id)
+    return job
+
+def get_job(job_id: str) -> Optional[Job]:
+    db = SessionLocal()
+    try:
+        job = db.get(Job, job_id)
+        if job:
+            db.expunge(job)
+        return job
+    finally:
+        db.close()
+
+def _lease_end(now: datetime) -> datetime:
+    return now + timedelta(seconds=JOB_LEASE_SECONDS)
+
+def _lease_expired(now: datetime):
+    return or_(Job.lease_expires_at.is_(None), Job.lease_expires_at < now)
+
+def _claim(job_id: str) -> bool:
+    """
+    Atomically move a queued job to "running" for this process.
+
+    The conditional UPDATE only matches while the job is still queued and
+    either ours or unleased, so exactly one replica wins it.
+    """
+    now = datetime.utcnow()
+    db = SessionLocal()
+    try:
+        claimed = (
+            db.query(Job)
+            .filter(
+                Job.id == job_id,
+                Job.status == "queued",
+                or_(Job.owner == WORKER_ID, _lease_expired(now)),
+            )
+            .update(
+                {"status": "running", "owner": WORKER_ID, "lease_expires_at": _lease_end(now), "updated_at": now},
+                synchronize_session=False,
+            )
+        )
+        db.commit()
+        return claimed == 1
+    finally:
+        db.close()
+
+def _renew_leases() -> int:
+    """Extend the leases of every active job this process owns."""
+    now = datetime.utcnow()
+    db = SessionLocal()
+    try:
+        renewed = (
+            db.query(Job)
+            .filter(Job.owner == WORKER_ID, Job.status.in_(ACTIVE_STATUSES))
+            .update({"lease_expires_at": _lease_end(now)}, synchronize_session=False)
+        )
+        db.commit()
+        return renewed
+    finally:
+        db.close()
+
+def _recover_expired_jobs() -> List[str]:
+    """
+    Take over queued or running jobs whose lease expired (their process
+    died), oldest first. Each one is re-queued for this process with a
+    conditional UPDATE, so a job is recovered by one replica only.
+    """
+    now = datetime.utcnow()
+    db = SessionLocal()
+    try:
+        candidates = (
+            db.query(Job.id)
+            .filter(Job.status.in_(ACTIVE_STATUSES), _lease_expired(now))
+            .order_by(Job.created_at)
+            .all()
+        )
+        recovered = []
+        for (job_id,) in candidates:
+            taken = (
+                db.query(Job)
+                .filter(Job.id == job_id, Job.status.in_(ACTIVE_STATUSES), _lease_expired(now))
+                .update(
+                    {"status": "queued", "owner": WORKER_ID, "lease_expires_at": _lease_end(now),
+                     "updated_at": now},
+                    synchronize_session=False,
+                )
+            )
+            db.commit()
+            if taken:
+                recovered.append(job_id)
+        return recovered
+    finally:
+        db.close()
+
+def _update_job(job_id: str, **fields):
+    db = SessionLocal()
+    try:
+        job = db.get(Job, job_id)
+        if not job:
+            return
+        for key, value in fields.items():
+            setattr(job, key, value)
+        job.updated_at = datetime.utcnow()
+        db.commit()
+    finally:
+        db.close()
+
+def _progress_recorder(job_id: str):
+    """
+    Build an async on_progress callback that persists per-platform state on
+    the job. Writes run in a worker thread, one at a time, so the last write
+    always holds every platform's latest state.
+    """
+    progress = {}
+    lock = asyncio.Lock()
+
+    async def record(platform: str, state: str, detail=None):
+        progress[platform] = {"state": state, "detail": detail} if detail else {"state": state}
+        async with lock:
+            await asyncio.to_thread(_update_job, job_id, progress=dict(progress))
+
+    return record
+
+def _restore_secrets(job_id: str, payload: dict) -> dict:
+    """The job's request body with its withheld secret fields put back."""
+    payload = dict(payload or {})
+    withheld = payload.pop("withheld", [])
+    secrets = _secrets.pop(job_id, {})
+    missing = [name for name in withheld if name not in secrets]
+    if missing:
+        raise Exception(
+            f"Job was interrupted before it ran and its {', '.join(missing)} was not persisted; "
+            "submit the request again."
+        )
+    return {**payload, **secrets}
+
+async def run_job(job_id: str):
+    """Execute one job through user_service and store its outcome, traced as one span."""
+    with span("job", **{"job.id": job_id}):
+        await _run_job(job_id)
+
+async def _run_job(job_id: str):
+    job = await asyncio.to_thread(get_job, job_id)
+    if not job or job.status not in ACTIVE_STATUSES:
+        _secrets.pop(job_id, None)
+        return
+
+    if not await asyncio.to_thread(_claim, job_id):
+        # Another replica took it over after our lease lapsed
+        _secrets.pop(job_id, None)
+        return
+
+    on_progress = _progress_recorder(job_id)
+    db = SessionLocal()
+    try:
+        payload = _restore_secrets(job_id, job.payload)
+        if job.kind == "create":
+            user = await user_service.create_user_with_platforms(db, UserCreate(**payload), on_progress)
+            result = user.model_dump(mode="json")
+        elif job.kind == "update":
+            user = await user_service.update_user_with_platforms(
+                db, job.username, UserUpdate(**payload), on_progress
+            )
+            result = UserOut.model_validate(user).model_dump(mode="json")
+        elif job.kind == "delete":
+            await user_service.delete_user_and_cleanup(db, job.username, on_progress)
+            result = {"message": f"User '{job.username}' deleted successfully."}
+        else:
+            raise Exception(f"Unknown job kind: {job.kind}")
+    except Exception as e:
+        await asyncio.to_thread(db.rollback)
+        error = e.detail if isinstance(e, HTTPException) else str(e)
+        if not isinstance(error, str):
+            error = json.dumps(error)
+        logging.error(f"[Jobs] {job.kind} job {job_id} failed: {error}")
+        await asyncio.to_thread(_update_job, job_id, status="failed", error=error, payload=None)
+        return
+    finally:
+        db.close()
+
+    await asyncio.to_thread(_update_job, job_id, status="succeeded", result=result, payload=None)
+
+async def _worker():
+    while True:
+        job_id = await _queue.get()
+        try:
+            await run_job(job_id)
+        except Exception as e:
+            logging.error(f"[Jobs] Worker crashed on job {job_id}: {e}")
+        finally:
+            _queue.task_done()
+
+async def _recover():
+    for job_id in await asyncio.to_thread(_recover_expired_jobs):
+        logging.warning(f"[Jobs] Recovered job {job_id} after its owner's lease expired")
+        _queue.put_nowait(job_id)
+
+async def _maintain():
+    """Renew this process's leases and pick up jobs abandoned by dead replicas."""
+    while True:
+        await asyncio.sleep(JOB_LEASE_SECONDS / 3)
+        try:
+            await asyncio.to_thread(_renew_leases)
+            await _recover()
+        except Exception as e:
+            logging.error(f"[Jobs] Lease maintenance failed: {e}")
+
+async def start_workers(count: int = JOB_WORKERS):
+    """Start the worker pool and take over jobs whose owner's lease has expired."""
+    global _queue, _maintainer
+    _queue = asyncio.Queue()
+    await _recover()
+    _workers.extend(asyncio.create_task(_worker()) for _ in range(count))
+    _maintainer = asyncio.create_task(_maintain())
+
+async def stop_workers():
+    global _queue, _maintainer
+    tasks = _workers + ([_maintainer] if _maintainer else [])
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    _workers.clear()
+    _maintainer = None
+    _queue = None
@@ -1,10 +1,59 @@
-import requests
+import config
+from utils.cache import LookupCache
+from utils.http_client import get_client
+from utils.resilience import IDEMPOTENT
+from utils.steps import http, lookup, run
+
+# Shared with mattermost_service_async
+team_cache = LookupCache(
+    config.MATTERMOST_CACHE_MAXSIZE, config.MATTERMOST_CACHE_TTL, config.MATTERMOST_CACHE_NEGATIVE_TTL
+)
+channel_cache = LookupCache(
+    config.MATTERMOST_CACHE_MAXSIZE, config.MATTERMOST_CACHE_TTL, config.MATTERMOST_CACHE_NEGATIVE_TTL
+)
+
+def _mattermost():
+    return get_client("mattermost")
+
+# Each operation is written once, as a generator of steps (see utils.steps);
+# mattermost_service_async drives the same generators with the async client.
+def _run(operation):
+    return run("mattermost", operation)
+
+def lookup_result(res):
+    """
+    Turn a lookup response into a cache entry: (value, cacheable).
+
+    200 and 404 are cached; any other status is passed through as a miss
+    without being remembered.
+    """
+    if res.status_code == 200:
+        return res.json(), True
+    return None, res.status_code == 404
+
+def invalidate_team(name):
+    """Forget a cached team lookup (e.g. after the team is renamed or deleted)."""
+    team_cache.invalidate(name)
+
+def invalidate_channel(team_id, channel_name):
+    """Forget a cached channel lookup."""
+    channel_cache.invalidate((team_id, channel_name))
+
+def clear_lookup_cache():
+    """Forget every cached team and channel lookup."""
+    team_cache.clear()
+    channel_cache.clear()
 
-from config import HEADERS_MATTERMOST, MATTERMOST_URL
+def _load(url: str):
+    res = yield http("GET", url)
+    return lookup_result(res)
+
+def _get_team_by_name(name):
+    return (yield lookup(team_cache, name, lambda: _load(f"/teams/name/{name}")))
 
 def get_team_by_name(name):
     """
-    Retrieve team information by name.
+    Retrieve team information by name (cached).
 
     Args:
         name (str): Team name.
@@ -12,12 +61,16 @@ def get_team_by_name(name):
     Returns:
         dict or None: Team information if found, otherwise None.
     """
-    res = requests.get(f"{MATTERMOST_URL}/api/v4/teams/name/{name}", headers=HEADERS_MATTERMOST)
-    return res.json() if res.status_code == 200 else None
+    return _run(_get_team_by_name(name))
+
+def _get_channel_by_name(team_id, channel_name):
+    return (yield lookup(
+        channel_cache, (team_id, channel_name), lambda: _load(f"/teams/{team_id}/channels/name/{channel_name}")
+    ))
 
 def get_channel_by_name(team_id, channel_name):
     """
-    Retrieve channel information by name within a team.
+    Retrieve channel information by name within a team (cached).
 
     Args:
         team_id (str): ID of the team.
@@ -26,25 +79,9 @@ def get_channel_by_name(team_id, channel_name):
     Returns:
         dict or None: Channel information if found, otherwise None.
     """
-    res = requests.get(f"{MATTERMOST_URL}/api/v4/teams/{team_id}/channels/name/{channel_name}", headers=HEADERS_MATTERMOST)
-    return res.json() if res.status_code == 200 else None
-
-def create_mattermost_user(username, email, password, config):
-    """
-    Create a new Mattermost user, and optionally add them to a team and channels based on the config.
+    return _run(_get_channel_by_name(team_id, channel_name))
 
-    Args:
-        username (str): Username.
-        email (str): User email.
-        password (str): User password.
-        config (dict): Configuration containing:
-            - team (str): Team name to add the user to.
-            - role (str): User role in the team ("Admin" or "Member").
-            - default_channels (list): List of default channel names.
-
-    Returns:
-        dict: Created user information or detailed error message.
-    """
+def _create_mattermost_user(username, email, password, config):
     # config expects: servername, team, role, default_channels
     team_name = config.get("team")
     role = config.get("role")
@@ -52,7 +89,7 @@ def create_mattermost_user(username, email, password, config):
 
     # 1. Create user
     payload = {"email": email, "username": username, "password": password}
-    res = requests.post(f"{MATTERMOST_URL}/api/v4/users", headers=HEADERS_MATTERMOST, json=payload)
+    res = yield http("POST", "/users", json=payload)
     if res.status_code != 201:
         return {"error": res.json(), "status": res.status_code}
 
@@ -61,34 +98,36 @@ def create_mattermost_user(username, email, password, config):
 
     # 2. Add to team
     if team_name:
-        team = get_team_by_name(team_name)
+        team = yield from _get_team_by_name(team_name)
         if not team:
             return {"error": f"Team '{team_name}' not found"}
         team_id = team["id"]
 
         # Add user to team
-        requests.post(
-            f"{MATTERMOST_URL}/api/v4/teams/{team_id}/members",
-            headers=HEADERS_MATTERMOST,
-            json={"team_id": team_id, "user_id": user_id}
+        yield http(
+            "POST",
+            f"/teams/{team_id}/members",
+            json={"team_id": team_id, "user_id": user_id},
+            extensions=IDEMPOTENT,
         )
 
         # 3. Assign role
         if role:
-            requests.put(
-                f"{MATTERMOST_URL}/api/v4/teams/{team_id}/members/{user_id}/roles",
-                headers=HEADERS_MATTERMOST,
-                json={"roles": f"{role}"}
+            yield http(
+                "PUT",
+                f"/teams/{team_id}/members/{user_id}/roles",
+                json={"roles": f"{role}"},
             )
 
         # 4. Add to default channels
         for ch_name in default_channels:
-            ch = get_channel_by_name(team_id, ch_name)
+            ch = yield from _get_channel_by_name(team_id, ch_name)
             if ch:
-                requests.post(
-                    f"{MATTERMOST_URL}/api/v4/channels/{ch['id']}/members",
-                    headers=HEADERS_MATTERMOST,
-                    json={"user_id": user_id}
+                yield http(
+                    "POST",
+                    f"/channels/{ch['id']}/members",
+                    json={"user_id": user_id},
+                    extensions=IDEMPOTENT,
                 )
 
     return {
@@ -97,6 +136,28 @@ def create_mattermost_user(username, email, password, config):
         "email": email
     }
 
+def create_mattermost_user(username, email, password, config):
+    """
+    Create a new Mattermost user, and optionally add them to a team and channels based on the config.
+
+    Args:
+        username (str): Username.
+        email (str): User email.
+        password (str): User password.
+        config (dict): Configuration containing:
+            - team (str): Team name to add the user to.
+            - role (str): User role in the team ("Admin" or "Member").
+            - default_channels (list): List of default channel names.
+
+    Returns:
+        dict: Created user information or detailed error message.
+    """
+    return _run(_create_mattermost_user(username, email, password, config))
+
+def _update_mattermost_user(user_id, update_data):
+    res = yield http("PUT", f"/users/{user_id}", json=update_data)
+    return res.json()
+
 def update_mattermost_user(user_id, update_data):
     """
     Update Mattermost user information.
@@ -108,9 +169,12 @@ def update_mattermost_user(user_id, update_data):
     Returns:
         dict: Updated user information.
     """
-    url = f"{MATTERMOST_URL}/api/v4/users/{user_id}"
-    res = requests.put(url, headers=HEADERS_MATTERMOST, json=update_data)
-    return res.json()
+    return _run(_update_mattermost_user(user_id, update_data))
+
+def _delete_mattermost_user(user_id, permanent=False):
+    params = {"permanent": "true"} if permanent else None
+    res = yield http("DELETE", f"/users/{user_id}", params=params)
+    return {"status": res.status_code, "detail": res.text}
 
 def delete_mattermost_user(user_id, permanent=False):
     """
@@ -123,12 +187,20 @@ def delete_mattermost_user(user_id, permanent=False):
     Returns:
         dict: Deletion status response.
     """
-    url = f"{MATTERMOST_URL}/api/v4/users/{user_id}"
-    if permanent:
-        url += "?permanent=true"
+    return _run(_delete_mattermost_user(user_id, permanent))
 
-    res = requests.delete(url, headers=HEADERS_MATTERMOST)
-    return {"status": res.status_code, "detail": res.text}
+def _add_user_to_team(user_id: str, team_name: str):
+    team = yield from _get_team_by_name(team_name)
+    if not team:
+        return {"error": f"Team '{team_name}' not found"}
+    team_id = team["id"]
+    res = yield http(
+        "POST",
+        f"/teams/{team_id}/members",
+        json={"team_id": team_id, "user_id": user_id},
+        extensions=IDEMPOTENT,
+    )
+    return res.json()
 
 def add_user_to_team(user_id: str, team_name: str):
     """
@@ -141,14 +213,26 @@ def add_user_to_team(user_id: str, team_name: str):
     Returns:
         dict: API response.
     """
-    team = get_team_by_name(team_name)
+    return _run(_add_user_to_team(user_id, team_name))
+
+def _update_user_team_role(user_id: str, team_name: str, role: str):
+    role_mapping = {
+        "Admin": "team_admin",
+        "Member": "team_user"
+    }
+    mattermost_roles = role_mapping.get(role)
+    if not mattermost_roles:
+        return {"error": f"Invalid role: {role}"}
+
+    team = yield from _get_team_by_name(team_name)
     if not team:
         return {"error": f"Team '{team_name}' not found"}
+    
     team_id = team["id"]
-    res = requests.post(
-        f"{MATTERMOST_URL}/api/v4/teams/{team_id}/members",
-        headers=HEADERS_MATTERMOST,
-        json={"team_id": team_id, "user_id": user_id}
+    res = yield http(
+        "PUT",
+        f"/teams/{team_id}/members/{user_id}/roles",
+        json={"roles": mattermost_roles},
     )
     return res.json()
 
@@ -164,25 +248,15 @@ def update_user_team_role(user_id: str, team_name: str, role: str):
     Returns:
         dict: API response or error message.
     """
-    role_mapping = {
-        "Admin": "team_admin",
-        "Member": "team_user"
-    }
-    mattermost_roles = role_mapping.get(role)
-    if not mattermost_roles:
-        return {"error": f"Invalid role: {role}"}
+    return _run(_update_user_team_role(user_id, team_name, role))
 
-    team = get_team_by_name(team_name)
+def _remove_user_from_team(user_id: str, team_name: str):
+    team = yield from _get_team_by_name(team_name)
     if not team:
         return {"error": f"Team '{team_name}' not found"}
-    
     team_id = team["id"]
-    res = requests.put(
-        f"{MATTERMOST_URL}/api/v4/teams/{team_id}/members/{user_id}/roles",
-        headers=HEADERS_MATTERMOST,
-        json={"roles": mattermost_roles}
-    )
-    return res.json()
+    res = yield http("DELETE", f"/teams/{team_id}/members/{user_id}")
+    return {"status": res.status_code}
 
 def remove_user_from_team(user_id: str, team_name: str):
     """
@@ -195,12 +269,51 @@ def remove_user_from_team(user_id: str, team_name: str):
     Returns:
         dict: Status of removal.
     """
+    return _run(_remove_user_from_team(user_id, team_name))
+
+def list_team_members(team_name: str):
+    """
+    List all members of a team by name, following pagination.
+
+    Args:
+        team_name (str): Name of the team.
+
+    Returns:
+        dict or None: User ID -> space-separated team roles, or None if the team does not exist.
+    """
     team = get_team_by_name(team_name)
     if not team:
-        return {"error": f"Team '{team_name}' not found"}
-    team_id = team["id"]
-    res = requests.delete(
-        f"{MATTERMOST_URL}/api/v4/teams/{team_id}/members/{user_id}",
-        headers=HEADERS_MATTERMOST
-    )
-    return {"status": res.status_code}
+        return None
+
+    members = {}
+    page = 0
+    while True:
+        res = _mattermost().get(f"/teams/{team['id']}/members", params={"page": page, "per_page": 200})
+        if res.status_code != 200:
+            raise Exception(f"Failed to list members of team '{team_name}': {res.status_code} {res.text}")
+        batch = res.json()
+        for member in batch:
+            if not member.get("delete_at"):
+                members[member["user_id"]] = member.get("roles", "")
+        if len(batch) < 200:
+            return members
+        page += 1
+
+def get_users_by_ids(user_ids):
+    """
+    Fetch user accounts by ID, 200 per request.
+
+    Args:
+        user_ids (list): Mattermost user IDs.
+
+    Returns:
+        dict: User ID -> user object (includes "roles" and "is_bot").
+    """
+    users = {}
+    user_ids = list(user_ids)
+    for start in range(0, len(user_ids), 200):
+        res = _mattermost().post("/users/ids", json=user_ids[start:start + 200], extensions=IDEMPOTENT)
+        if res.status_code != 200:
+            raise Exception(f"Failed to look up users: {res.status_code} {res.text}")
+        users.update({user["id"]: user for user in res.json()})
+    return users
@@ -0,0 +1,40 @@
+from services import mattermost_service
+from utils.steps import arun
+
+# Async variants of `mattermost_service`: the same operations, driven with
+# the async client.
+
+async def _run(operation):
+    return await arun("mattermost", operation)
+
+async def get_team_by_name(name):
+    """Async variant of `mattermost_service.get_team_by_name`."""
+    return await _run(mattermost_service._get_team_by_name(name))
+
+async def get_channel_by_name(team_id, channel_name):
+    """Async variant of `mattermost_service.get_channel_by_name`."""
+    return await _run(mattermost_service._get_channel_by_name(team_id, channel_name))
+
+async def create_mattermost_user(username, email, password, config):
+    """Async variant of `mattermost_service.create_mattermost_user`."""
+    return await _run(mattermost_service._create_mattermost_user(username, email, password, config))
+
+async def update_mattermost_user(user_id, update_data):
+    """Async variant of `mattermost_service.update_mattermost_user`."""
+    return await _run(mattermost_service._update_mattermost_user(user_id, update_data))
+
+async def delete_mattermost_user(user_id, permanent=False):
+    """Async variant of `mattermost_service.delete_mattermost_user`."""
+    return await _run(mattermost_service._delete_mattermost_user(user_id, permanent))
+
+async def add_user_to_team(user_id: str, team_name: str):
+    """Async variant of `mattermost_service.add_user_to_team`."""
+    return await _run(mattermost_service._add_user_to_team(user_id, team_name))
+
+async def update_user_team_role(user_id: str, team_name: str, role: str):
+    """Async variant of `mattermost_service.update_user_team_role`."""
+    return await _run(mattermost_service._update_user_team_role(user_id, team_name, role))
+
+async def remove_user_from_team(user_id: str, team_name: str):
+    """Async variant of `mattermost_service.remove_user_from_team`."""
+    return await _run(mattermost_service._remove_user_from_team(user_id, team_name))
@@ -1,12 +1,29 @@
-import requests
+import logging
+import time
 
-from config import ADMIN_PASSWORD, ADMIN_USERNAME, NEXTCLOUD_BASE_URL, OCS_HEADERS
+import config
+from services import share_index
+from utils.backoff import exponential_delays
+from utils.http_client import get_client
+from utils.metrics import observe_user_ready
+from utils.resilience import IDEMPOTENT
+from utils.steps import call, http, pause, run
 
-# User Services
-import time
+SHARES_URL = "/ocs/v2.php/apps/files_sharing/api/v1/shares"
 
-def create_user(userid: str, password: str, email: str):
-    url = f"{NEXTCLOUD_BASE_URL}/ocs/v1.php/cloud/users"
+def _nextcloud():
+    return get_client("nextcloud")
+
+
+# Each operation is written once, as a generator of steps (see utils.steps);
+# nextcloud_service_async drives the same generators with the async client.
+def _run(operation):
+    return run("nextcloud", operation)
+
+
+# User Services
+def _create_user(userid: str, password: str, email: str):
+    url = "/ocs/v1.php/cloud/users"
     payload = {
         "userid": userid,
         "password": password,
@@ -14,10 +31,10 @@ def create_user(userid: str, password: str, email: str):
     if email:
         payload["email"] = email
 
-    response = requests.post(url, auth=(ADMIN_USERNAME, ADMIN_PASSWORD), headers=OCS_HEADERS, data=payload)
+    response = yield http("POST", url, data=payload)
     if response.status_code == 200:
-        return {"message": "User created successfully."}
-    
+        return {"message": "User created successfully.", "confirmed": create_confirms_user(response, userid)}
+
     try:
         return response.json()
     except Exception:
@@ -25,35 +42,44 @@ def create_user(userid: str, password: str, email: str):
 
     raise Exception(response.text or "Failed to create user.")
 
-def update_user(userid: str, key: str, value: str):
-    url = f"{NEXTCLOUD_BASE_URL}/ocs/v1.php/cloud/users/{userid}"
+def _update_user(userid: str, key: str, value: str):
+    url = f"/ocs/v1.php/cloud/users/{userid}"
     payload = {"key": key, "value": value}
-    response = requests.put(url, auth=(ADMIN_USERNAME, ADMIN_PASSWORD), headers=OCS_HEADERS, data=payload)
+    response = yield http("PUT", url, data=payload)
     if response.status_code == 200:
         return {"message": "User updated successfully."}
     raise Exception(response.text or "Failed to update user.")
 
-def delete_user(userid: str):
-    url = f"{NEXTCLOUD_BASE_URL}/ocs/v1.php/cloud/users/{userid}"
-    response = requests.delete(url, auth=(ADMIN_USERNAME, ADMIN_PASSWORD), headers=OCS_HEADERS)
+def _delete_user(userid: str):
+    url = f"/ocs/v1.php/cloud/users/{userid}"
+    response = yield http("DELETE", url)
     if response.status_code == 200:
         return {"message": "User deleted successfully."}
     raise Exception(response.text or "Failed to delete user.")
 
+def create_user(userid: str, password: str, email: str):
+    return _run(_create_user(userid, password, email))
+
+def update_user(userid: str, key: str, value: str):
+    return _run(_update_user(userid, key, value))
+
+def delete_user(userid: str):
+    return _run(_delete_user(userid))
+
 
 # Group (System group) Services
-def create_group(groupid: str):
-    url = f"{NEXTCLOUD_BASE_URL}/ocs/v1.php/cloud/groups"
+def _create_group(groupid: str):
+    url = "/ocs/v1.php/cloud/groups"
     payload = {"groupid": groupid}
-    response = requests.post(url, auth=(ADMIN_USERNAME, ADMIN_PASSWORD), headers=OCS_HEADERS, data=payload)
+    response = yield http("POST", url, data=payload)
     if response.status_code == 200:
         return {"message": f"Group '{groupid}' created successfully."}
     raise Exception(response.text or "Failed to create group.")
 
-def add_member_to_group(userid: str, groupid: str):
-    url = f"{NEXTCLOUD_BASE_URL}/ocs/v1.php/cloud/users/{userid}/groups"
+def _add_member_to_group(userid: str, groupid: str):
+    url = f"/ocs/v1.php/cloud/users/{userid}/groups"
     payload = {"groupid": groupid}
-    response = requests.post(url, auth=(ADMIN_USERNAME, ADMIN_PASSWORD), headers=OCS_HEADERS, data=payload)
+    response = yield http("POST", url, data=payload, extensions=IDEMPOTENT)
     try:
         res = response.json()
         if res["ocs"]["meta"]["status"] != "ok":
@@ -63,79 +89,141 @@ def add_member_to_group(userid: str, groupid: str):
 
     return {"message": f"User '{userid}' added to group '{groupid}'."}
 
-def remove_member_from_group(userid: str, groupid: str):
+def _remove_member_from_group(userid: str, groupid: str):
     # Endpoint: /ocs/v1.php/cloud/groups/{groupid}/users/{userid}
-    url = f"{NEXTCLOUD_BASE_URL}/ocs/v1.php/cloud/groups/{groupid}/users/{userid}"
-    response = requests.delete(url, auth=(ADMIN_USERNAME, ADMIN_PASSWORD), headers=OCS_HEADERS)
+    url = f"/ocs/v1.php/cloud/groups/{groupid}/users/{userid}"
+    response = yield http("DELETE", url)
     if response.status_code == 200:
         return {"message": f"User '{userid}' removed from group '{groupid}'."}
     raise Exception(response.text or "Failed to remove user from group.")
 
+def create_group(groupid: str):
+    return _run(_create_group(groupid))
+
+def add_member_to_group(userid: str, groupid: str):
+    return _run(_add_member_to_group(userid, groupid))
+
+def remove_member_from_group(userid: str, groupid: str):
+    return _run(_remove_member_from_group(userid, groupid))
+
 
 # Folder Sharing Services
-def share_folder(folder_path: str, userid: str, permission: int):
-    url = f"{NEXTCLOUD_BASE_URL}/ocs/v2.php/apps/files_sharing/api/v1/shares"
+def _share_folder(folder_path: str, userid: str, permission: int):
+    url = SHARES_URL
     payload = {
         "path": folder_path,
         "shareType": 0,  # 0 = share with user (1 = group)
         "shareWith": userid,
         "permissions": permission
     }
-    response = requests.post(url, auth=(ADMIN_USERNAME, ADMIN_PASSWORD), headers=OCS_HEADERS, data=payload)
+    # Retried like an idempotent call: a share created by an earlier attempt is picked up below
+    response = yield http("POST", url, data=payload, extensions=IDEMPOTENT)
     try:
         res_data = response.json()
     except Exception:
         res_data = {}
     if response.status_code == 200 and res_data.get("ocs", {}).get("meta", {}).get("status") == "ok":
         share_id = res_data.get("ocs", {}).get("data", {}).get("id")
+        yield call(share_index.record_share, folder_path, userid, share_id)
         return {"message": f"Folder '{folder_path}' shared with '{userid}'.", "share_id": share_id}
+    if response.status_code >= 500 or "already shared" in response.text:
+        # A 5xx may or may not have created the share: only a listing that
+        # shows it counts as success, and its permissions must match too
+        try:
+            share = yield from _lookup_share(folder_path, userid)
+        except Exception:
+            share = None
+        if share is not None:
+            if int(share["permissions"]) != int(permission):
+                yield from _update_folder_permission_all_user(share["id"], permission)
+                return {"message": f"Folder '{folder_path}' already shared with '{userid}'; permission updated.",
+                        "share_id": share["id"]}
+            return {"message": f"Folder '{folder_path}' already shared with '{userid}'.", "share_id": share["id"]}
     raise Exception(response.text or "Failed to share folder.")
 
-def update_folder_permission_all_user(share_id: int, new_permission: int):
-    url = f"{NEXTCLOUD_BASE_URL}/ocs/v2.php/apps/files_sharing/api/v1/shares/{share_id}"
+def _update_folder_permission_all_user(share_id: int, new_permission: int):
+    url = f"{SHARES_URL}/{share_id}"
     payload = {"permissions": new_permission}
-    response = requests.put(url, auth=(ADMIN_USERNAME, ADMIN_PASSWORD), headers=OCS_HEADERS, data=payload)
+    response = yield http("PUT", url, data=payload)
     if response.status_code == 200:
         return {"message": "Folder permission updated successfully."}
     raise Exception(response.text or "Failed to update permission.")
 
-def unshare_folder_by_share_id(share_id: int):
-    url = f"{NEXTCLOUD_BASE_URL}/ocs/v2.php/apps/files_sharing/api/v1/shares/{share_id}"
-    response = requests.delete(url, auth=(ADMIN_USERNAME, ADMIN_PASSWORD), headers=OCS_HEADERS)
+def _unshare_folder_by_share_id(share_id: int):
+    url = f"{SHARES_URL}/{share_id}"
+    response = yield http("DELETE", url)
     if response.status_code == 200:
+        yield call(share_index.forget_share, share_id)
         return {"message": "Folder unshared successfully."}
     raise Exception(response.text or "Failed to unshare folder.")
 
+def _unshare_folder_by_user(folder_path: str, userid: str):
+    share_id = yield call(share_index.get_share_id, folder_path, userid)
+    if share_id is not None:
+        try:
+            return (yield from _unshare_folder_by_share_id(share_id))
+        except Exception:
+            # Stale index entry (share removed outside this app); resolve it again
+            yield call(share_index.forget_share, share_id)
+
+    share_id = yield from _lookup_share_id(folder_path, userid)
+    if share_id is None:
+        raise Exception("Matching share not found.")
+    return (yield from _unshare_folder_by_share_id(share_id))
+
+def share_folder(folder_path: str, userid: str, permission: int):
+    return _run(_share_folder(folder_path, userid, permission))
+
+def update_folder_permission_all_user(share_id: int, new_permission: int):
+    return _run(_update_folder_permission_all_user(share_id, new_permission))
+
+def unshare_folder_by_share_id(share_id: int):
+    return _run(_unshare_folder_by_share_id(share_id))
+
 def unshare_folder_by_user(folder_path: str, userid: str):
-    list_url = f"{NEXTCLOUD_BASE_URL}/ocs/v2.php/apps/files_sharing/api/v1/shares"
-    response = requests.get(list_url, auth=(ADMIN_USERNAME, ADMIN_PASSWORD), headers=OCS_HEADERS)
+    return _run(_unshare_folder_by_user(folder_path, userid))
+
+def match_share(response, userid: str):
+    """
+    Pick the share with `userid` out of a path-filtered share listing.
+
+    Returns:
+        dict or None: The share ("id", "permissions", ...) if listed.
+    """
+    if response.status_code == 404:
+        return None
     if response.status_code != 200:
         raise Exception("Failed to list shares.")
 
-    shares = response.json().get("ocs", {}).get("data", [])
-    for share in shares:
-        if share["path"] == folder_path and share["share_with"] == userid:
-            share_id = share["id"]
-            return unshare_folder_by_share_id(share_id)
-    raise Exception("Matching share not found.")
+    for share in response.json().get("ocs", {}).get("data", []):
+        if share.get("share_with") == userid:
+            return share
+    return None
 
-def set_user_quota(userid: str, quota: str):
+def _lookup_share(folder_path: str, userid: str):
+    response = yield http("GET", SHARES_URL, params={"path": folder_path})
+    share = match_share(response, userid)
+    yield call(share_index.record_share, folder_path, userid, share["id"] if share else None)
+    return share
+
+def _lookup_share_id(folder_path: str, userid: str):
+    share = yield from _lookup_share(folder_path, userid)
+    return share["id"] if share else None
+
+def lookup_share_id(folder_path: str, userid: str):
     """
-    Set quota for a NextCloud user.
-    :param userid: Username of the user
-    :param quota: Quota value (e.g., "10 GB", "500 MB", "102400000" in bytes, or "unlimited")
+    Resolve a share ID with a single listing filtered by `path`, and
+    record the result in the local share index.
     """
-    url = f"{NEXTCLOUD_BASE_URL}/ocs/v1.php/cloud/users/{userid}"
+    return _run(_lookup_share_id(folder_path, userid))
+
+def _set_user_quota(userid: str, quota: str):
+    url = f"/ocs/v1.php/cloud/users/{userid}"
     payload = {
         "key": "quota",
         "value": quota
     }
-    headers = {
-        **OCS_HEADERS,
-        "Content-Type": "application/x-www-form-urlencoded"
-    }
-
-    response = requests.put(url, auth=(ADMIN_USERNAME, ADMIN_PASSWORD), headers=headers, data=payload)
+    response = yield http("PUT", url, data=payload)
     try:
         res_data = response.json()
         if res_data["ocs"]["meta"]["status"] != "ok":
@@ -145,24 +233,72 @@ def set_user_quota(userid: str, quota: str):
 
     return {"message": f"Quota for user '{userid}' set to {quota}."}
 
-def wait_for_user_ready(username: str, timeout: int = 10, interval: float = 1.0):
+def set_user_quota(userid: str, quota: str):
     """
-    Wait until the user appears in the Nextcloud API (max `timeout` seconds).
+    Set quota for a NextCloud user.
+    :param userid: Username of the user
+    :param quota: Quota value (e.g., "10 GB", "500 MB", "102400000" in bytes, or "unlimited")
+    """
+    return _run(_set_user_quota(userid, quota))
+
+def create_confirms_user(response, userid: str) -> bool:
     """
-    url = f"{NEXTCLOUD_BASE_URL}/ocs/v1.php/cloud/users/{username}"
-    auth = (ADMIN_USERNAME, ADMIN_PASSWORD)
+    True when an OCS create-user response already reports the user as created,
+    in which case there is no need to poll for readiness.
+    """
+    try:
+        ocs = response.json()["ocs"]
+        return ocs["meta"]["status"] == "ok" and ocs["data"]["id"] == userid
+    except Exception:
+        return False
+
+def _wait_for_user_ready(username: str, timeout: float = None, initial_interval: float = None,
+                         max_interval: float = None):
+    timeout = config.NEXTCLOUD_READY_TIMEOUT if timeout is None else timeout
+    delays = exponential_delays(
+        config.NEXTCLOUD_READY_INITIAL_INTERVAL if initial_interval is None else initial_interval,
+        config.NEXTCLOUD_READY_MAX_INTERVAL if max_interval is None else max_interval,
+    )
+    url = f"/ocs/v1.php/cloud/users/{username}"
 
-    for _ in range(int(timeout / interval)):
-        response = requests.get(url, headers=OCS_HEADERS, auth=auth)
+    start = time.monotonic()
+    deadline = start + timeout
+    attempts = 0
+    while True:
+        attempts += 1
+        response = yield http("GET", url)
         if response.status_code == 200:
-            return True
-        time.sleep(interval)
+            elapsed = time.monotonic() - start
+            logging.info(f"[NextCloud] User {username} ready after {elapsed:.3f}s ({attempts} checks)")
+            observe_user_ready("ready", elapsed)
+            return {"ready": True, "elapsed": elapsed, "attempts": attempts}
 
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            break
+        yield pause(min(next(delays), remaining))
+
+    observe_user_ready("timeout", time.monotonic() - start)
     raise Exception(f"User created but not recognized by Nextcloud after waiting {timeout}s.")
 
-def get_user(userid: str):
-    url = f"{NEXTCLOUD_BASE_URL}/ocs/v1.php/cloud/users/{userid}"
-    response = requests.get(url, auth=(ADMIN_USERNAME, ADMIN_PASSWORD), headers=OCS_HEADERS)
+def wait_for_user_ready(username: str, timeout: float = None, initial_interval: float = None,
+                        max_interval: float = None):
+    """
+    Wait until the user appears in the Nextcloud API.
+
+    Polls with exponential backoff (starting at `initial_interval`, capped at
+    `max_interval`) until `timeout` seconds have passed. Defaults come from
+    the NEXTCLOUD_READY_* settings. The wait is recorded in the
+    nextcloud_user_ready_seconds histogram.
+
+    Returns:
+        dict: {"ready": True, "elapsed": seconds waited, "attempts": checks made}
+    """
+    return _run(_wait_for_user_ready(username, timeout, initial_interval, max_interval))
+
+def _get_user(userid: str):
+    url = f"/ocs/v1.php/cloud/users/{userid}"
+    response = yield http("GET", url)
 
     try:
         data = response.json()
@@ -175,15 +311,52 @@ def get_user(userid: str):
 
     return False
 
+def get_user(userid: str):
+    return _run(_get_user(userid))
+
+def _get_share_id_by_user(folder_path: str, userid: str):
+    share_id = yield call(share_index.get_share_id, folder_path, userid)
+    if share_id is None:
+        share_id = yield from _lookup_share_id(folder_path, userid)
+    if share_id is None:
+        raise Exception("Matching share not found.")
+    return share_id
+
 def get_share_id_by_user(folder_path: str, userid: str) -> int:
-    list_url = f"{NEXTCLOUD_BASE_URL}/ocs/v2.php/apps/files_sharing/api/v1/shares"
-    response = requests.get(list_url, auth=(ADMIN_USERNAME, ADMIN_PASSWORD), headers=OCS_HEADERS)
-    
-    shares = response.json().get("ocs", {}).get("data", [])
-    
-    for share in shares:
-        if share["path"] == folder_path and share["share_with"] == userid:
-            return share["id"]
-    
-    raise Exception("Matching share not found.")
+    return _run(_get_share_id_by_user(folder_path, userid))
 
+def list_group_users(groupid: str):
+    """
+    List the user IDs in a group.
+
+    Returns:
+        set: User IDs in the group.
+    """
+    url = f"/ocs/v1.php/cloud/groups/{groupid}/users"
+    response = _nextcloud().get(url)
+    try:
+        ocs = response.json()["ocs"]
+    except Exception:
+        raise Exception(response.text or "Failed to list group users.")
+    if ocs["meta"]["status"] != "ok":
+        raise Exception(ocs["meta"].get("message") or f"Failed to list users of group '{groupid}'.")
+    return set(ocs["data"]["users"])
+
+def list_folder_shares(folder_path: str):
+    """
+    List the user shares of a folder with a single path-filtered listing.
+
+    Returns:
+        dict: User ID -> {"share_id": ..., "permissions": ...}.
+    """
+    response = _nextcloud().get(SHARES_URL, params={"path": folder_path})
+    if response.status_code == 404:
+        return {}
+    if response.status_code != 200:
+        raise Exception("Failed to list shares.")
+
+    return {
+        share["share_with"]: {"share_id": share["id"], "permissions": int(share["permissions"])}
+        for share in response.json().get("ocs", {}).get("data", [])
+        if share.get("share_type") == 0
+    }
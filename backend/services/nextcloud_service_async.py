@@ -0,0 +1,64 @@
+from services import nextcloud_service
+from utils.steps import arun
+
+# Async variants of `nextcloud_service`: the same operations, driven with the
+# async client. Share index reads/writes run in a worker thread so a slow or
+# locked database never blocks the event loop.
+
+async def _run(operation):
+    return await arun("nextcloud", operation)
+
+
+# User Services
+async def create_user(userid: str, password: str, email: str):
+    return await _run(nextcloud_service._create_user(userid, password, email))
+
+async def update_user(userid: str, key: str, value: str):
+    return await _run(nextcloud_service._update_user(userid, key, value))
+
+async def delete_user(userid: str):
+    return await _run(nextcloud_service._delete_user(userid))
+
+
+# Group (System group) Services
+async def create_group(groupid: str):
+    return await _run(nextcloud_service._create_group(groupid))
+
+async def add_member_to_group(userid: str, groupid: str):
+    return await _run(nextcloud_service._add_member_to_group(userid, groupid))
+
+async def remove_member_from_group(userid: str, groupid: str):
+    return await _run(nextcloud_service._remove_member_from_group(userid, groupid))
+
+
+# Folder Sharing Services
+async def share_folder(folder_path: str, userid: str, permission: int):
+    return await _run(nextcloud_service._share_folder(folder_path, userid, permission))
+
+async def update_folder_permission_all_user(share_id: int, new_permission: int):
+    return await _run(nextcloud_service._update_folder_permission_all_user(share_id, new_permission))
+
+async def unshare_folder_by_share_id(share_id: int):
+    return await _run(nextcloud_service._unshare_folder_by_share_id(share_id))
+
+async def unshare_folder_by_user(folder_path: str, userid: str):
+    return await _run(nextcloud_service._unshare_folder_by_user(folder_path, userid))
+
+async def lookup_share_id(folder_path: str, userid: str):
+    """Async variant of `nextcloud_service.lookup_share_id`."""
+    return await _run(nextcloud_service._lookup_share_id(folder_path, userid))
+
+async def set_user_quota(userid: str, quota: str):
+    """Async variant of `nextcloud_service.set_user_quota`."""
+    return await _run(nextcloud_service._set_user_quota(userid, quota))
+
+async def wait_for_user_ready(username: str, timeout: float = None, initial_interval: float = None,
+                              max_interval: float = None):
+    """Async variant of `nextcloud_service.wait_for_user_ready`."""
+    return await _run(nextcloud_service._wait_for_user_ready(username, timeout, initial_interval, max_interval))
+
+async def get_user(userid: str):
+    return await _run(nextcloud_service._get_user(userid))
+
+async def get_share_id_by_user(folder_path: str, userid: str) -> int:
+    return await _run(nextcloud_service._get_share_id_by_user(folder_path, userid))
@@ -0,0 +1,82 @@
+import logging
+from typing import List, Optional
+
+from sqlalchemy.orm import joinedload
+
+from db import SessionLocal
+from models.platform_account import PlatformAccount
+from models.user import User
+
+MIGRATION_BATCH_SIZE = 1000
+
+def find_accounts(platform: str, external_user_id: Optional[str] = None, group_id: Optional[str] = None,
+                  team: Optional[str] = None, folder_id: Optional[str] = None) -> List[PlatformAccount]:
+    """
+    Find platform accounts by their indexed fields.
+
+    Example: every GitLab account in group "42":
+        find_accounts("gitlab", group_id="42")
+
+    Returns:
+        list: Matching PlatformAccount rows (with `user` loaded).
+    """
+    db = SessionLocal()
+    try:
+        query = (
+            db.query(PlatformAccount)
+            .options(joinedload(PlatformAccount.user))
+            .filter(PlatformAccount.platform == platform)
+        )
+        if external_user_id is not None:
+            query = query.filter(PlatformAccount.external_user_id == str(external_user_id))
+        if group_id is not None:
+            query = query.filter(PlatformAccount.group_id == str(group_id))
+        if team is not None:
+            query = query.filter(PlatformAccount.team == team)
+        if folder_id is not None:
+            query = query.filter(PlatformAccount.folder_id == folder_id)
+        return query.all()
+    finally:
+        db.close()
+
+def find_owner(platform: str, external_user_id) -> Optional[User]:
+    """Return the local user linked to an external platform user ID, if any."""
+    accounts = find_accounts(platform, external_user_id=external_user_id)
+    return accounts[0].user if accounts else None
+
+def migrate_legacy_platforms(batch_size: int = MIGRATION_BATCH_SIZE) -> int:
+    """
+    Move platform configs from the old users.platforms JSON blob into
+    platform_accounts. Idempotent: migrated rows have the blob cleared.
+
+    Returns:
+        int: Number of users migrated.
+    """
+    migrated = 0
+    last_id = 0
+    db = SessionLocal()
+    try:
+        while True:
+            users = (
+                db.query(User)
+                .filter(User.id > last_id, User.legacy_platforms.isnot(None))
+                .order_by(User.id)
+                .limit(batch_size)
+                .all()
+            )
+            if not users:
+                break
+            for user in users:
+                configs = [c for c in user.legacy_platforms or [] if isinstance(c, dict) and c.get("platform")]
+                if not user.accounts:
+                    user.platforms = configs
+                user.legacy_platforms = None
+            db.commit()
+            migrated += len(users)
+            last_id = users[-1].id
+    finally:
+        db.close()
+
+    if migrated:
+        logging.info(f"[Migration] Moved platforms of {migrated} users into platform_accounts")
+    return migrated
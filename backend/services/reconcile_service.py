@@ -0,0 +1,327 @@
+import logging
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy.orm import joinedload
+
+from config import RECONCILE_FETCH_CONCURRENCY
+from db import SessionLocal
+from models.platform_account import PlatformAccount
+from services import google_drive, gitlab_service, mattermost_service, nextcloud_service
+from services.user_service import PLATFORM_ORDER
+from utils.roles import map_role_to_access_level
+
+# Nextcloud share permissions per configured permission name
+NEXTCLOUD_PERMISSIONS = {"viewer": 1, "editor": 15}
+
+# GitLab members at this level or above (owners) are never reported as extra
+GITLAB_OWNER_LEVEL = 50
+
+# Mattermost system roles never reported as extra (bots and integration
+# accounts are protected through their is_bot flag)
+MATTERMOST_PROTECTED_ROLES = {"system_admin"}
+
+# A membership scope: (platform, scope type, scope ID), e.g. ("gitlab", "group", "42")
+Scope = Tuple[str, str, str]
+
+def reconcile(fix: bool = False, remove_extra: bool = False, platforms: Optional[List[str]] = None) -> dict:
+    """
+    Compare platform_accounts with the memberships that actually exist on
+    each platform.
+
+    Memberships are listed once per group, project, team or folder in use
+    (paginated), indexed in memory and diffed against the local accounts in
+    one pass, instead of looking each user up individually.
+
+    Args:
+        fix (bool): Add missing memberships and correct mismatched roles.
+        remove_extra (bool): With `fix`, also remove members that no local
+            account expects.
+        platforms (list, optional): Platforms to check; all by default.
+
+    Returns:
+        dict: {"summary": counts, "drift": [...], "errors": [...]}
+    """
+    platforms = platforms or PLATFORM_ORDER
+    db = SessionLocal()
+    try:
+        accounts = (
+            db.query(PlatformAccount)
+            .options(joinedload(PlatformAccount.user))
+            .filter(PlatformAccount.platform.in_(platforms))
+            .all()
+        )
+        expected = expected_memberships(accounts)
+        actual, errors = fetch_memberships(list(expected))
+        drift = diff_memberships(expected, actual)
+
+        if fix:
+            fix_drift(drift, expected, remove_extra)
+            db.commit()
+    finally:
+        db.close()
+
+    summary = {"accounts": len(accounts), "scopes": len(expected), "fixed": 0, "failed": 0,
+               "missing": 0, "extra": 0, "role_mismatch": 0}
+    for item in drift:
+        summary[item["kind"]] += 1
+        if item.get("fixed"):
+            summary["fixed"] += 1
+        elif "error" in item:
+            summary["failed"] += 1
+    logging.info(f"[Reconcile] {summary}")
+    return {"summary": summary, "drift": drift, "errors": errors}
+
+def expected_memberships(accounts: List[PlatformAccount]) -> Dict[Scope, Dict[str, dict]]:
+    """
+    Index local accounts by the memberships they imply.
+
+    Returns:
+        dict: Scope -> member key -> {"role", "username", "account"}. The
+        member key is what the platform lists: GitLab/Mattermost user ID,
+        Nextcloud username or lowercased Drive email.
+    """
+    expected = defaultdict(dict)
+
+    def expect(scope: Scope, member, role, account: PlatformAccount):
+        expected[scope][str(member)] = {"role": role, "username": account.user.username, "account": account}
+
+    for account in accounts:
+        config = account.config or {}
+        if account.platform == "gitlab" and config.get("user_id"):
+            level = map_role_to_access_level(config["role"]) if config.get("role") else None
+            if config.get("group_id"):
+                expect(("gitlab", "group", str(config["group_id"])), config["user_id"], level, account)
+            for project_id in config.get("repo_access") or []:
+                expect(("gitlab", "project", str(project_id)), config["user_id"], level, account)
+
+        elif account.platform == "mattermost" and config.get("user_id") and config.get("team"):
+            role = config["role"].lower() if config.get("role") else None
+            expect(("mattermost", "team", config["team"]), config["user_id"], role, account)
+
+        elif account.platform == "nextcloud":
+            if config.get("group_id"):
+                expect(("nextcloud", "group", config["group_id"]), account.user.username, None, account)
+            if config.get("shared_folder_id"):
+                permission = NEXTCLOUD_PERMISSIONS.get((config.get("permission") or "viewer").lower(), 1)
+                expect(("nextcloud", "share", config["shared_folder_id"]), account.user.username, permission,
+                       account)
+
+        elif account.platform == "drive" and config.get("shared_folder_id"):
+            email = config.get("user_email") or account.user.email
+            if email:
+                expect(("drive", "folder", config["shared_folder_id"]), email.lower(), config.get("role"), account)
+
+    return dict(expected)
+
+def _list_scope(scope: Scope) -> Dict[str, dict]:
+    """List the members of one scope as member key -> {"role", ...}."""
+    platform, kind, scope_id = scope
+    if platform == "gitlab":
+        members = gitlab_service.list_members(f"{kind}s", scope_id)
+        return {
+            str(user_id): {"role": level, "protected": level >= GITLAB_OWNER_LEVEL}
+            for user_id, level in members.items()
+        }
+
+    if platform == "mattermost":
+        members = mattermost_service.list_team_members(scope_id)
+        if members is None:
+            raise Exception(f"Team '{scope_id}' not found")
+        users = mattermost_service.get_users_by_ids(members)
+        return {
+            user_id: {"role": "admin" if "team_admin" in roles.split() else "member",
+                      "protected": _mattermost_protected(users.get(user_id))}
+            for user_id, roles in members.items()
+        }
+
+    if platform == "nextcloud" and kind == "group":
+        return {userid: {"role": None} for userid in nextcloud_service.list_group_users(scope_id)}
+
+    if platform == "nextcloud" and kind == "share":
+        return {
+            userid: {"role": share["permissions"], "share_id": share["share_id"]}
+            for userid, share in nextcloud_service.list_folder_shares(scope_id).items()
+        }
+
+    if platform == "drive":
+        return {
+            permission["emailAddress"].lower(): {"role": permission["role"], "permission_id": permission["id"]}
+            for permission in google_drive.iter_permissions(scope_id)
+            if permission.get("type") == "user" and permission.get("emailAddress")
+            and permission.get("role") != "owner"
+        }
+
+    raise Exception(f"Unknown scope {scope}")
+
+def _mattermost_protected(user: Optional[dict]) -> bool:
+    """System admins, bots and accounts the lookup did not return are left alone."""
+    if user is None:
+        return True
+    return bool(user.get("is_bot")) or bool(MATTERMOST_PROTECTED_ROLES & set(user.get("roles", "").split()))
+
+def fetch_memberships(scopes: List[Scope]):
+    """
+    List every scope concurrently (at most RECONCILE_FETCH_CONCURRENCY at once).
+
+    Returns:
+        tuple: (scope -> members, list of {"platform", "scope", "scope_id", "error"})
+    """
+    actual, errors = {}, []
+    with ThreadPoolExecutor(max_workers=RECONCILE_FETCH_CONCURRENCY) as executor:
+        futures = {scope: executor.submit(_list_scope, scope) for scope in scopes}
+        for scope, future in futures.items():
+            try:
+                actual[scope] = future.result()
+            except Exception as e:
+                platform, kind, scope_id = scope
+                errors.append({"platform": platform, "scope": kind, "scope_id": scope_id, "error": str(e)})
+    return actual, errors
+
+def diff_memberships(expected: Dict[Scope, Dict[str, dict]], actual: Dict[Scope, Dict[str, dict]]) -> List[dict]:
+    """
+    Report drift per scope: "missing" (expected but not listed), "extra"
+    (listed but no local account expects it) and "role_mismatch".
+
+    Scopes that could not be listed are skipped.
+    """
+    drift = []
+    for scope, wanted in expected.items():
+        listed = actual.get(scope)
+        if listed is None:
+            continue
+        platform, kind, scope_id = scope
+
+        def report(drift_kind, member, username, want, have):
+            drift.append({"platform": platform, "scope": kind, "scope_id": scope_id, "kind": drift_kind,
+                          "member": member, "username": username, "expected": want, "actual": have})
+
+        for member, want in wanted.items():
+            have = listed.get(member)
+            if have is None:
+                report("missing", member, want["username"], want["role"], None)
+            elif want["role"] is not None and have["role"] != want["role"]:
+                report("role_mismatch", member, want["username"], want["role"], have["role"])
+
+        for member, have in listed.items():
+            if member not in wanted and not have.get("protected"):
+                report("extra", member, None, None, have["role"])
+    return drift
+
+def fix_drift(drift: List[dict], expected: Dict[Scope, Dict[str, dict]], remove_extra: bool = False):
+    """
+    Apply fixes for reported drift in place: each handled item gets
+    "fixed": True or an "error". Drive changes are sent as batch requests
+    per folder; new Drive permission IDs are written back to the accounts.
+    """
+    drive_items = defaultdict(list)
+    for item in drift:
+        if item["kind"] == "extra" and not remove_extra:
+            continue
+        if item["platform"] == "drive":
+            drive_items[item["scope_id"]].append(item)
+            continue
+        try:
+            _fix_item(item)
+            item["fixed"] = True
+        except Exception as e:
+            item["error"] = str(e)
+
+    for folder_id, items in drive_items.items():
+        _fix_drive_folder(folder_id, items, expected.get(("drive", "folder", folder_id), {}))
+
+def _fix_item(item: dict):
+    platform, kind, scope_id, member = item["platform"], item["scope"], item["scope_id"], item["member"]
+
+    if platform == "gitlab":
+        if item["kind"] == "extra":
+            if kind == "group":
+                gitlab_service.remove_user_access(int(member), scope_id, [])
+            else:
+                gitlab_service.remove_user_access(int(member), None, [int(scope_id)])
+        elif kind == "group" and item["kind"] == "missing":
+            gitlab_service.add_user_to_group(int(member), scope_id, item["expected"] or 30)
+        elif kind == "group":
+            gitlab_service.update_user_role(int(member), scope_id, [], item["expected"])
+        else:
+            results = gitlab_service.batch_project_membership(
+                int(member), [int(scope_id)], item["expected"] or 30, update=item["kind"] == "role_mismatch"
+            )
+            gitlab_service.raise_for_failed_memberships(results, "Fix project")
+
+    elif platform == "mattermost":
+        if item["kind"] == "extra":
+            result = mattermost_service.remove_user_from_team(member, scope_id)
+        else:
+            if item["kind"] == "missing":
+                result = mattermost_service.add_user_to_team(member, scope_id)
+                if "error" in result or not item["expected"]:
+                    _raise_for_mattermost(result)
+                    return
+            result = mattermost_service.update_user_team_role(member, scope_id, item["expected"].capitalize())
+        _raise_for_mattermost(result)
+
+    elif platform == "nextcloud" and kind == "group":
+        if item["kind"] == "extra":
+            nextcloud_service.remove_member_from_group(member, scope_id)
+        else:
+            nextcloud_service.add_member_to_group(member, scope_id)
+
+    elif platform == "nextcloud":
+        if item["kind"] == "missing":
+            nextcloud_service.share_folder(scope_id, member, item["expected"])
+        else:
+            share_id = nextcloud_service.get_share_id_by_user(scope_id, member)
+            if item["kind"] == "extra":
+                nextcloud_service.unshare_folder_by_share_id(share_id)
+            else:
+                nextcloud_service.update_folder_permission_all_user(share_id, item["expected"])
+
+def _raise_for_mattermost(result: dict):
+    if "error" in result:
+        raise Exception(result["error"])
+    status = result.get("status") or result.get("status_code")
+    if isinstance(status, int) and status >= 400:
+        raise Exception(result.get("message") or f"Mattermost returned {status}")
+
+def _fix_drive_folder(folder_id: str, items: List[dict], wanted: Dict[str, dict]):
+    """Grant, update and revoke one folder's drifted permissions in batch requests."""
+    listed = {}
+    if any(item["kind"] != "missing" for item in items):
+        listed = {
+            permission["emailAddress"].lower(): permission["id"]
+            for permission in google_drive.iter_permissions(folder_id)
+            if permission.get("emailAddress")
+        }
+
+    outcomes = {}
+    missing = [item for item in items if item["kind"] == "missing"]
+    for item in missing:
+        if not item["expected"]:
+            # Never guess an access level for an account without a stored role
+            outcomes[item["member"]] = {"error": "No Drive role stored for this account; access not granted"}
+    for role in {item["expected"] for item in missing if item["expected"]}:
+        emails = [item["member"] for item in missing if item["expected"] == role]
+        outcomes.update(google_drive.grant_folder_access_batch(folder_id, emails, role))
+
+    roles = {listed[item["member"]]: item["expected"] for item in items
+             if item["kind"] == "role_mismatch" and item["member"] in listed}
+    if roles:
+        updated = google_drive.update_permissions_batch(folder_id, roles)
+        outcomes.update({email: updated[pid] for email, pid in listed.items() if pid in updated})
+
+    extra = [listed[item["member"]] for item in items if item["kind"] == "extra" and item["member"] in listed]
+    if extra:
+        revoked = google_drive.revoke_folder_access_batch(folder_id, extra)
+        outcomes.update({email: revoked[pid] for email, pid in listed.items() if pid in revoked})
+
+    for item in items:
+        outcome = outcomes.get(item["member"], {"error": "Permission not found"})
+        if "error" in outcome:
+            item["error"] = outcome["error"]
+            continue
+        item["fixed"] = True
+        account = wanted.get(item["member"], {}).get("account")
+        if account is not None and outcome.get("permission_id"):
+            account.config["permission_id"] = outcome["permission_id"]
@@ -0,0 +1,38 @@
+from typing import Optional
+
+from db import SessionLocal
+from models.share import NextcloudShare
+
+def get_share_id(folder_path: str, userid: str) -> Optional[int]:
+    """
+    Look up a known share ID for a folder shared with a user.
+
+    Returns:
+        int or None: Share ID if it was recorded locally, otherwise None.
+    """
+    db = SessionLocal()
+    try:
+        share = db.get(NextcloudShare, (folder_path, userid))
+        return share.share_id if share else None
+    finally:
+        db.close()
+
+def record_share(folder_path: str, userid: str, share_id: int):
+    """Store (or replace) the share ID for a folder shared with a user."""
+    if share_id is None:
+        return
+    db = SessionLocal()
+    try:
+        db.merge(NextcloudShare(folder_path=folder_path, userid=userid, share_id=int(share_id)))
+        db.commit()
+    finally:
+        db.close()
+
+def forget_share(share_id: int):
+    """Drop a share ID from the index once the share is gone."""
+    db = SessionLocal()
+    try:
+        db.query(NextcloudShare).filter(NextcloudShare.share_id == int(share_id)).delete()
+        db.commit()
+    finally:
+        db.close()
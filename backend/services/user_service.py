@@ -1,6 +1,6 @@
+import asyncio
 import logging
 from fastapi import HTTPException
-from sqlalchemy.orm.attributes import flag_modified
 from sqlalchemy.orm import Session
 from datetime import datetime
 import os
@@ -9,15 +9,36 @@ from schemas.user import (
     DriveConfig, DriveOutConfig, NextCloudConfig, MattermostConfig,
     GitLabConfig, UserCreate, UserOut, UserUpdate, platform_model_map
 )
-from utils.security import hash_password
+from utils.security import hash_password_async
 from utils.roles import map_role_to_access_level
-from services import gitlab_service, mattermost_service, nextcloud_service, google_drive
+from utils.metrics import observe_user_ready
+from utils.tracing import current_span, span
+from services import (
+    gitlab_service, gitlab_service_async, mattermost_service_async, nextcloud_service_async, google_drive
+)
+
+# Order in which platform results are merged into user.platforms
+PLATFORM_ORDER = ["gitlab", "mattermost", "nextcloud", "drive"]
+
+# Session work is blocking; these helpers run in a worker thread (asyncio.to_thread)
+# so a slow or locked database never stalls the event loop.
+def _find_user(db: Session, username: str):
+    return db.query(User).filter(User.username == username).first()
+
+def _save(db: Session, user: User):
+    db.add(user)
+    db.commit()
+    db.refresh(user)
 
-def create_user_with_platforms(db: Session, user_data: UserCreate) -> UserOut:
-    if db.query(User).filter(User.username == user_data.username).first():
+def _delete(db: Session, user: User):
+    db.delete(user)
+    db.commit()
+
+async def create_user_with_platforms(db: Session, user_data: UserCreate, on_progress=None) -> UserOut:
+    if await asyncio.to_thread(_find_user, db, user_data.username):
         raise HTTPException(status_code=400, detail="User already exists")
 
-    hashed_pw = hash_password(user_data.password)
+    hashed_pw = await hash_password_async(user_data.password)
 
     user = User(
         username=user_data.username,
@@ -28,20 +49,9 @@ def create_user_with_platforms(db: Session, user_data: UserCreate) -> UserOut:
     )
 
     platforms = user_data.platforms or []
+    user.platforms = await provision_platforms(user_data, platforms, on_progress)
 
-    for platform_config in platforms:
-        if platform_config.platform == "gitlab":
-            _add_gitlab_user(user, user_data, platform_config)
-        elif platform_config.platform == "mattermost":
-            _add_mattermost_user(user, user_data, platform_config)
-        elif platform_config.platform == "nextcloud":
-            _add_nextcloud_user(user, user_data, platform_config)
-        elif platform_config.platform == "drive":
-            _add_drive_user(user, user_data, platform_config)
-
-    db.add(user)
-    db.commit()
-    db.refresh(user)
+    await asyncio.to_thread(_save, db, user)
     logging.warning("User platforms data: %s", user.platforms)
 
     return UserOut(
@@ -53,12 +63,86 @@ def create_user_with_platforms(db: Session, user_data: UserCreate) -> UserOut:
     )
 
 # ---- Helper functions ----
-def _add_gitlab_user(user, user_data, gitlab_config: GitLabConfig):
+async def _report(on_progress, platform: str, state: str, detail=None):
+    """Forward a per-platform progress update ("running", "done", "failed") to an async listener, if any."""
+    if on_progress:
+        await on_progress(platform, state, detail)
+
+async def _tracked(on_progress, platform: str, step):
+    """Await one platform step in its own tracing span, reporting running/done/failed around it."""
+    await _report(on_progress, platform, "running")
+    try:
+        with span(f"platform.{platform}"):
+            result = await step
+    except HTTPException as e:
+        await _report(on_progress, platform, "failed", e.detail)
+        raise
+    except Exception as e:
+        await _report(on_progress, platform, "failed", str(e))
+        raise
+    await _report(on_progress, platform, "done")
+    return result
+
+async def _limited(semaphore, step):
+    """Await `step`, holding `semaphore` while it runs (if one is given)."""
+    if semaphore is None:
+        return await step
+    async with semaphore:
+        return await step
+
+async def provision_platforms(user_data, platform_configs, on_progress=None, limits=None) -> list:
+    """
+    Run the `_add_*_user` helpers concurrently on the event loop, one per platform.
+
+    Results are merged in PLATFORM_ORDER regardless of completion order.
+    Every platform runs to completion; failures are collected and reported
+    together so one broken upstream does not hide the others. `limits` maps
+    platform names to semaphores shared across concurrent callers (bulk import).
+    """
+    add_helpers = {
+        "gitlab": _add_gitlab_user,
+        "mattermost": _add_mattermost_user,
+        "nextcloud": _add_nextcloud_user,
+        "drive": _add_drive_user,
+    }
+    steps = {p.platform: p for p in platform_configs if p.platform in add_helpers}
+    if not steps:
+        return []
+
+    names = list(steps)
+    outcomes = await asyncio.gather(
+        *(
+            _limited(
+                (limits or {}).get(name),
+                _tracked(on_progress, name, add_helpers[name](user_data, steps[name])),
+            )
+            for name in names
+        ),
+        return_exceptions=True,
+    )
+
+    results, errors = {}, {}
+    for name, outcome in zip(names, outcomes):
+        if isinstance(outcome, HTTPException):
+            errors[name] = outcome.detail
+        elif isinstance(outcome, Exception):
+            errors[name] = str(outcome)
+        else:
+            results[name] = outcome
+
+    if errors:
+        for name, error in errors.items():
+            logging.error(f"[{name}] Provisioning failed: {error}")
+        raise HTTPException(status_code=500, detail={"errors": errors})
+
+    return [results[name] for name in PLATFORM_ORDER if name in results]
+
+async def _add_gitlab_user(user_data, gitlab_config: GitLabConfig):
     gitlab_config_dict = gitlab_config.model_dump()
 
-    gitlab_user_id = gitlab_service.find_gitlab_user_by_email(user_data.email)
+    gitlab_user_id = await gitlab_service_async.find_gitlab_user_by_email(user_data.email)
     if not gitlab_user_id:
-        created = gitlab_service.create_gitlab_user(
+        created = await gitlab_service_async.create_gitlab_user(
             username=user_data.username,
             email=user_data.email,
             password=user_data.password
@@ -68,15 +152,18 @@ def _add_gitlab_user(user, user_data, gitlab_config: GitLabConfig):
         gitlab_user_id = created["id"]
 
     gitlab_config_dict.update({
+        "user_id": gitlab_user_id,
         "username": user_data.username,
         "email": user_data.email,
         "platform": "gitlab"
     })
 
-    result = gitlab_service.add_account(gitlab_config_dict)
-    user.platforms.append(result)
+    account = await gitlab_service_async.add_account(gitlab_config_dict)
+    if account.get("repo_failed"):
+        logging.warning(f"[GitLab] {user_data.username}: project access not granted: {account['repo_failed']}")
+    return account
 
-def _add_mattermost_user(user, user_data, mm_config: MattermostConfig):
+async def _add_mattermost_user(user_data, mm_config: MattermostConfig):
     mm_config_dict = mm_config.model_dump()
     mm_config_dict["server_url"] = os.getenv("MATTERMOST_SERVER_URL")
     mm_config_dict["admin_token"] = os.getenv("MATTERMOST_ADMIN_TOKEN")
@@ -84,7 +171,7 @@ def _add_mattermost_user(user, user_data, mm_config: MattermostConfig):
     if mm_config.server_name:
         mm_config_dict["server_url"] = f"https://{mm_config.server_name}"
 
-    mm_user = mattermost_service.create_mattermost_user(
+    mm_user = await mattermost_service_async.create_mattermost_user(
         username=user_data.username,
         email=user_data.email,
         password=user_data.password,
@@ -95,35 +182,44 @@ def _add_mattermost_user(user, user_data, mm_config: MattermostConfig):
         raise HTTPException(status_code=500, detail=f"Invalid Mattermost response: {mm_user}")
 
     mm_config_dict["user_id"] = mm_user["id"]
-    user.platforms.append(mm_config_dict)
+    return mm_config_dict
 
-def _add_nextcloud_user(user, user_data, nc_config: NextCloudConfig):
-    nextcloud_service.create_user(
+async def _add_nextcloud_user(user_data, nc_config: NextCloudConfig):
+    created = await nextcloud_service_async.create_user(
         userid=user_data.username,
         password=user_data.password,
         email=user_data.email,
     )
 
-    nextcloud_service.wait_for_user_ready(user_data.username)
+    # Skip readiness polling when the create response already confirms the user
+    if created.get("confirmed"):
+        observe_user_ready("confirmed", 0.0)
+    else:
+        ready = await nextcloud_service_async.wait_for_user_ready(user_data.username)
+        current = current_span()
+        if current is not None:
+            current.set_attribute("nextcloud.ready_seconds", round(ready["elapsed"], 3))
+            current.set_attribute("nextcloud.ready_checks", ready["attempts"])
 
     if nc_config.group_id:
-        nextcloud_service.add_member_to_group(user_data.username, nc_config.group_id)
+        await nextcloud_service_async.add_member_to_group(user_data.username, nc_config.group_id)
 
     if nc_config.storage_limit:
-        nextcloud_service.set_user_quota(user_data.username, f"{nc_config.storage_limit} MB")
+        await nextcloud_service_async.set_user_quota(user_data.username, f"{nc_config.storage_limit} MB")
 
     if nc_config.shared_folder_id:
         permission_map = {"viewer": 1, "editor": 15}
-        nextcloud_service.share_folder(
+        await nextcloud_service_async.share_folder(
             folder_path=nc_config.shared_folder_id,
             userid=user_data.username,
             permission=permission_map.get(nc_config.permission or "viewer", 1)
         )
 
-    user.platforms.append(nc_config.model_dump()) 
+    return nc_config.model_dump()
 
-def _add_drive_user(user, user_data, drive_config: DriveConfig):
-    result = google_drive.grant_folder_access(
+async def _add_drive_user(user_data, drive_config: DriveConfig):
+    result = await asyncio.to_thread(
+        google_drive.grant_folder_access,
         shared_folder_id=drive_config.shared_folder_id,
         user_email=user_data.email,
         role=drive_config.role
@@ -131,16 +227,16 @@ def _add_drive_user(user, user_data, drive_config: DriveConfig):
 
     permission_id = result["permission_id"]
 
-    user.platforms.append(DriveOutConfig(
+    return DriveOutConfig(
         platform="drive",
         shared_folder_id=drive_config.shared_folder_id,
         user_email=user_data.email,
         role=drive_config.role,
         permission_id=permission_id
-    ).dict())
+    ).dict()
 
-def update_user_with_platforms(db, username: str, user_update: UserUpdate):
-    user = db.query(User).filter(User.username == username).first()
+async def update_user_with_platforms(db, username: str, user_update: UserUpdate, on_progress=None):
+    user = await asyncio.to_thread(_find_user, db, username)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
 
@@ -151,7 +247,7 @@ def update_user_with_platforms(db, username: str, user_update: UserUpdate):
     if user_update.email:
         user.email = user_update.email
     if user_update.password:
-        user.password_hash = hash_password(user_update.password)
+        user.password_hash = await hash_password_async(user_update.password)
 
     # Normalize payload into dict {platform: model}
     typed_platforms = []
@@ -164,60 +260,64 @@ def update_user_with_platforms(db, username: str, user_update: UserUpdate):
             typed_platforms.append(item)
     platform_map = {p.platform: p for p in typed_platforms}
 
-    all_platforms = ["gitlab", "mattermost", "nextcloud", "drive"]
-
-    for p_name in all_platforms:
-        in_db = p_name in platforms
-        in_payload = p_name in platform_map
-
-        if in_db and in_payload:
-            # Case 1: In DB and still on => update
-            if p_name == "gitlab":
-                _update_gitlab(platforms, platform_map, user_update)
-            elif p_name == "mattermost":
-                _update_mattermost(platforms, platform_map, user_update)
-            elif p_name == "nextcloud":
-                _update_nextcloud(platforms, platform_map, user)
-            elif p_name == "drive":
-                _update_drive(platforms, platform_map, user)
-
-        elif in_db and not in_payload:
-            # Case 2: In DB but toggle off => remove
-            _remove_platform_account(p_name, platforms[p_name], user)
-            del platforms[p_name]
-
-        elif not in_db and in_payload:
-            # Case 3: Not yet but toggle on => add
-            if p_name == "gitlab":
-                _add_gitlab_user(user, user_update, platform_map["gitlab"])
-            elif p_name == "mattermost":
-                _add_mattermost_user(user, user_update, platform_map["mattermost"])
-            elif p_name == "nextcloud":
-                _add_nextcloud_user(user, user_update, platform_map["nextcloud"])
-            elif p_name == "drive":
-                _add_drive_user(user, user_update, platform_map["drive"])
-            platforms[p_name] = user.platforms[-1]
+    for p_name in PLATFORM_ORDER:
+        if p_name in platforms or p_name in platform_map:
+            await _tracked(
+                on_progress, p_name, _sync_platform(p_name, platforms, platform_map, user, user_update)
+            )
 
     user.platforms = list(platforms.values())
-    flag_modified(user, "platforms")
-    db.commit()
-    db.refresh(user)
+    await asyncio.to_thread(_save, db, user)
     return user
 
-def _remove_platform_account(platform_name: str, config: dict, user: User):
+async def _sync_platform(p_name, platforms, platform_map, user, user_update):
+    """Bring one platform in line with the update payload (update, remove or add)."""
+    in_db = p_name in platforms
+    in_payload = p_name in platform_map
+
+    if in_db and in_payload:
+        # Case 1: In DB and still on => update
+        if p_name == "gitlab":
+            await _update_gitlab(platforms, platform_map, user_update)
+        elif p_name == "mattermost":
+            await _update_mattermost(platforms, platform_map, user_update)
+        elif p_name == "nextcloud":
+            await _update_nextcloud(platforms, platform_map, user)
+        elif p_name == "drive":
+            await _update_drive(platforms, platform_map, user)
+
+    elif in_db and not in_payload:
+        # Case 2: In DB but toggle off => remove
+        await _remove_platform_account(p_name, platforms[p_name], user)
+        del platforms[p_name]
+
+    elif not in_db and in_payload:
+        # Case 3: Not yet but toggle on => add
+        if p_name == "gitlab":
+            platforms[p_name] = await _add_gitlab_user(user_update, platform_map["gitlab"])
+        elif p_name == "mattermost":
+            platforms[p_name] = await _add_mattermost_user(user_update, platform_map["mattermost"])
+        elif p_name == "nextcloud":
+            platforms[p_name] = await _add_nextcloud_user(user_update, platform_map["nextcloud"])
+        elif p_name == "drive":
+            platforms[p_name] = await _add_drive_user(user_update, platform_map["drive"])
+
+async def _remove_platform_account(platform_name: str, config: dict, user: User):
     """Call API/process account deletion on platform when toggle OFF"""
     if platform_name == "gitlab":
-        gitlab_service.delete_gitlab_user(config.get("user_id"))
+        await gitlab_service_async.delete_gitlab_user(config.get("user_id"))
     elif platform_name == "mattermost":
-        mattermost_service.delete_mattermost_user(config.get("user_id"))
+        await mattermost_service_async.delete_mattermost_user(config.get("user_id"))
     elif platform_name == "nextcloud":
-        nextcloud_service.delete_user(user.username)
+        await nextcloud_service_async.delete_user(user.username)
     elif platform_name == "drive":
         if config.get("permission_id"):
-            google_drive.revoke_folder_access(config["shared_folder_id"], config["permission_id"])
+            await asyncio.to_thread(
+                google_drive.revoke_folder_access, config["shared_folder_id"], config["permission_id"]
+            )
 
 # --- Helper functions ---
-def _update_gitlab(platforms, platform_map, user_update):
+async def _update_gitlab(platforms, platform_map, user_update):
     gl_conf = platforms["gitlab"]
     gl_update = platform_map["gitlab"]
 
@@ -231,17 +331,27 @@ def _update_gitlab(platforms, platform_map, user_update):
     access_level = map_role_to_access_level(gl_update.role)
     new_group_id = getattr(gl_update, "group_id", None)
 
+    results = None
     if access_level and new_group_id:
-        gitlab_service.update_user_role(
+        requested = getattr(gl_update, "repo_access", None) or []
+        granted = set(gl_conf.get("repo_access") or [])
+        results = await gitlab_service_async.update_user_role(
             user_id=gitlab_user_id,
             group_id=new_group_id,
-            repo_ids=getattr(gl_update, "repo_access", []),
+            repo_ids=[pid for pid in requested if pid in granted],
             access_level=access_level,
         )
+        # Projects not granted yet (new, or failed last time) are added instead
+        results.update(await gitlab_service_async.batch_project_membership(
+            gitlab_user_id, [pid for pid in requested if pid not in granted], access_level
+        ))
 
     platforms["gitlab"].update(gl_update.dict(exclude_unset=True))
+    if results is not None:
+        platforms["gitlab"].pop("repo_failed", None)
+        platforms["gitlab"].update(gitlab_service.membership_fields(results))
 
-def _update_mattermost(platforms, platform_map, user_update):
+async def _update_mattermost(platforms, platform_map, user_update):
     mm_conf = platforms.get("mattermost", {})
     mm_user_id = mm_conf.get("user_id")
     if not mm_user_id:
@@ -257,7 +367,7 @@ def _update_mattermost(platforms, platform_map, user_update):
         update_fields["username"] = user_update.username
 
     if update_fields:
-        mattermost_service.update_mattermost_user(mm_user_id, update_fields)
+        await mattermost_service_async.update_mattermost_user(mm_user_id, update_fields)
 
     # --- Update role ---
     new_role = getattr(mm_update, "role", None)
@@ -265,7 +375,7 @@ def _update_mattermost(platforms, platform_map, user_update):
     if new_role and team_name:
         # Capitalize role để match mapping
         role_cap = new_role.capitalize()
-        res = mattermost_service.update_user_team_role(
+        res = await mattermost_service_async.update_user_team_role(
             user_id=mm_user_id,
             team_name=team_name,
             role=role_cap
@@ -276,25 +386,25 @@ def _update_mattermost(platforms, platform_map, user_update):
     # --- Merge config ---
     platforms["mattermost"] = {**mm_conf, **mm_update.dict(exclude_unset=True)}
 
-def _update_nextcloud(platforms, platform_map, user):
+async def _update_nextcloud(platforms, platform_map, user):
     nc_conf = platforms.get("nextcloud", {})
     nc_update = platform_map["nextcloud"]
     username_nc = user.username
 
     if user.email:
-        nextcloud_service.update_user(username_nc, "email", user.email)
+        await nextcloud_service_async.update_user(username_nc, "email", user.email)
     if user.password_hash:
-        nextcloud_service.update_user(username_nc, "password", user.password_hash)
+        await nextcloud_service_async.update_user(username_nc, "password", user.password_hash)
 
     if nc_update.storage_limit is not None:
-        nextcloud_service.set_user_quota(username_nc, f"{nc_update.storage_limit} MB")
+        await nextcloud_service_async.set_user_quota(username_nc, f"{nc_update.storage_limit} MB")
 
     old_group = nc_conf.get("group_id")
     new_group = nc_update.group_id
     if new_group and old_group != new_group:
         if old_group:
-            nextcloud_service.remove_member_from_group(username_nc, old_group)
-        nextcloud_service.add_member_to_group(username_nc, new_group)
+            await nextcloud_service_async.remove_member_from_group(username_nc, old_group)
+        await nextcloud_service_async.add_member_to_group(username_nc, new_group)
 
     old_folder = nc_conf.get("shared_folder_id")
     new_folder = nc_update.shared_folder_id
@@ -302,7 +412,7 @@ def _update_nextcloud(platforms, platform_map, user):
 
     if old_folder and old_folder != new_folder:
         try:
-            nextcloud_service.unshare_folder_by_user(old_folder, username_nc)
+            await nextcloud_service_async.unshare_folder_by_user(old_folder, username_nc)
         except:
             pass
 
@@ -312,12 +422,12 @@ def _update_nextcloud(platforms, platform_map, user):
 
         if new_folder == old_folder:
             try:
-                share_id = nextcloud_service.get_share_id_by_user(new_folder, username_nc)
-                nextcloud_service.update_folder_permission_all_user(share_id, new_perm_val)
+                share_id = await nextcloud_service_async.get_share_id_by_user(new_folder, username_nc)
+                await nextcloud_service_async.update_folder_permission_all_user(share_id, new_perm_val)
             except Exception as e:
                 print("Failed to update permission:", e)
         else:
-            nextcloud_service.share_folder(
+            await nextcloud_service_async.share_folder(
                 folder_path=new_folder,
                 userid=username_nc,
                 permission=new_perm_val
@@ -325,7 +435,7 @@ def _update_nextcloud(platforms, platform_map, user):
 
     platforms["nextcloud"] = {**nc_conf, **nc_update.dict(exclude_unset=True)}
 
-def _update_drive(platforms, platform_map, user):
+async def _update_drive(platforms, platform_map, user):
     drive_conf = platforms.get("drive", {})
     drive_update = platform_map["drive"]
 
@@ -340,9 +450,10 @@ def _update_drive(platforms, platform_map, user):
 
     try:
         if permission_id:
-            google_drive.update_permission(folder_id, permission_id, role)
+            await asyncio.to_thread(google_drive.update_permission, folder_id, permission_id, role)
         else:
-            result = google_drive.grant_folder_access(
+            result = await asyncio.to_thread(
+                google_drive.grant_folder_access,
                 shared_folder_id=folder_id,
                 user_email=user_email,
                 role=role
@@ -359,60 +470,59 @@ def _update_drive(platforms, platform_map, user):
         "permission_id": permission_id,
     }
 
-def delete_mattermost_user(mm_config):
+async def delete_mattermost_user(mm_config):
     mm_user_id = mm_config.get("user_id") 
     if mm_user_id:
         try:
-            mattermost_service.delete_mattermost_user(mm_user_id)
+            await mattermost_service_async.delete_mattermost_user(mm_user_id)
         except Exception as e:
             logging.error(f"[Mattermost] Deactivation failed: {e}")
 
-def delete_nextcloud_user(username):
+async def delete_nextcloud_user(username):
     try:
-        nextcloud_service.delete_user(username)
+        await nextcloud_service_async.delete_user(username)
     except Exception as e:
         logging.error(f"[NextCloud] Delete failed: {e}")
 
-def delete_gitlab_user(username, gitlab_config):
+async def delete_gitlab_user(username, gitlab_config):
     group_id = gitlab_config.get("group_id")
     repo_ids = gitlab_config.get("repo_access", [])
     gitlab_user_id = gitlab_config.get("user_id")
 
     if not gitlab_user_id:
         try:
-            gitlab_user_id = gitlab_service.get_gitlab_user_id(username)
+            gitlab_user_id = await gitlab_service_async.get_gitlab_user_id(username)
         except Exception as e:
             logging.error(f"[GitLab] Could not find GitLab user_id for username {username}: {e}")
             return
 
     if gitlab_user_id:
         try:
-            gitlab_service.remove_user_access(
+            await gitlab_service_async.remove_user_access(
                 user_id=gitlab_user_id,
                 group_id=group_id,
                 repo_ids=repo_ids
             )
-            gitlab_service.delete_gitlab_user(gitlab_user_id)
+            await gitlab_service_async.delete_gitlab_user(gitlab_user_id)
         except Exception as e:
             logging.error(f"[GitLab] Error delete user_id {gitlab_user_id}: {e}")
     else:
         logging.warning(f"[GitLab] Cannot delete user because user_id from username is not found {username}")
 
-def delete_user_and_cleanup(db: Session, username: str):
-    user = db.query(User).filter(User.username == username).first()
+async def delete_user_and_cleanup(db: Session, username: str, on_progress=None):
+    user = await asyncio.to_thread(_find_user, db, username)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
 
     platforms = user.platforms or []
 
     if mm_conf := next((p for p in platforms if p.get("platform") == "mattermost"), None):
-        delete_mattermost_user(mm_conf)
+        await _tracked(on_progress, "mattermost", delete_mattermost_user(mm_conf))
 
     if nc_conf := next((p for p in platforms if p.get("platform") == "nextcloud"), None):
-        delete_nextcloud_user(username)
+        await _tracked(on_progress, "nextcloud", delete_nextcloud_user(username))
 
     if gl_conf := next((p for p in platforms if p.get("platform") == "gitlab"), None):
-        delete_gitlab_user(username, gl_conf)
+        await _tracked(on_progress, "gitlab", delete_gitlab_user(username, gl_conf))
 
-    db.delete(user)
-    db.commit()
\ No newline at end of file
+    await asyncio.to_thread(_delete, db, user)
\ No newline at end of file
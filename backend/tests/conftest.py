@@ -0,0 +1,107 @@
+import os
+import tempfile
+
+# Settings are read when the app is imported: point it at a scratch database
+# (never ./app.db) and cheap password hashing before importing anything.
+_scratch = tempfile.mkdtemp(prefix="user-management-tests-")
+os.environ.setdefault("GITLAB_TOKEN", "test-token")
+os.environ["DATABASE_URL"] = f"sqlite:///{_scratch}/startup.db"
+os.environ.setdefault("PASSWORD_HASH_ITERATIONS", "1000")
+os.environ.setdefault("PASSWORD_HASH_WORKERS", "2")
+os.environ.setdefault("JOB_WORKERS", "2")
+
+import httpx
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy.orm import sessionmaker
+
+import db
+from db import Base, create_db_engine, get_db
+from main import app
+from utils import http_client
+
+UPSTREAM_BASE_URLS = {
+    "gitlab": "https://gitlab.test/api/v4",
+    "mattermost": "https://mattermost.test/api/v4",
+    "nextcloud": "https://nextcloud.test",
+}
+
+
+@pytest.fixture(scope="session")
+def postgres_url():
+    """
+    PostgreSQL to run the suite against: TEST_POSTGRES_URL (e.g. the app_db
+    service from docker-compose.yml), else a throwaway pgserver instance.
+    """
+    url = os.getenv("TEST_POSTGRES_URL")
+    if url:
+        return url
+    try:
+        import pgserver
+    except ImportError:
+        pytest.skip("PostgreSQL not available: set TEST_POSTGRES_URL or install pgserver")
+    server = pgserver.get_server(os.path.join(_scratch, "pgdata"), cleanup_mode="stop")
+    return server.get_uri().replace("postgresql://", "postgresql+psycopg://", 1)
+
+
+@pytest.fixture(params=["sqlite", "postgresql"])
+def database(request, tmp_path):
+    """
+    Empty schema on SQLite and on PostgreSQL. Services that open their own
+    sessions share the rebound SessionLocal; request handlers get theirs
+    through the get_db override.
+    """
+    if request.param == "sqlite":
+        url = f"sqlite:///{tmp_path}/test.db"
+    else:
+        url = request.getfixturevalue("postgres_url")
+
+    engine = create_db_engine(url)
+    Base.metadata.drop_all(engine)
+    Base.metadata.create_all(engine)
+    db.SessionLocal.configure(bind=engine)
+    sessions = sessionmaker(bind=engine, autoflush=False, autocommit=False)
+
+    def override_get_db():
+        session = sessions()
+        try:
+            yield session
+        except Exception:
+            session.rollback()
+            raise
+        finally:
+            session.close()
+
+    app.dependency_overrides[get_db] = override_get_db
+    try:
+        yield sessions
+    finally:
+        app.dependency_overrides.pop(get_db, None)
+        db.SessionLocal.configure(bind=db.engine)
+        Base.metadata.drop_all(engine)
+        engine.dispose()
+
+
+@pytest.fixture
+def client(database):
+    """Test client with the app's lifespan (job workers) running."""
+    with TestClient(app) as client:
+        yield client
+
+
+@pytest.fixture
+def upstream(monkeypatch):
+    """
+    Route an upstream platform to an httpx.MockTransport handler:
+    `upstream("nextcloud", handler)`. Limiters and breakers start fresh.
+    """
+    for name in ("_clients", "_async_clients", "_limiters", "_breakers"):
+        monkeypatch.setattr(http_client, name, {})
+
+    def route(name: str, handler):
+        transport = httpx.MockTransport(handler)
+        base_url = UPSTREAM_BASE_URLS[name]
+        http_client._clients[name] = httpx.Client(base_url=base_url, transport=transport)
+        http_client._async_clients[name] = httpx.AsyncClient(base_url=base_url, transport=transport)
+
+    return route
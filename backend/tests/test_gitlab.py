@@ -0,0 +1,116 @@
+import asyncio
+import logging
+
+import httpx
+import pytest
+
+from schemas.user import GitLabUpdateRole
+from services import gitlab_service, gitlab_service_async, user_service
+
+
+@pytest.fixture
+def gitlab(upstream):
+    """GitLab API recording each call; project 3 already has the user (409)."""
+    calls = []
+
+    def handler(request):
+        calls.append((request.method, request.url.path))
+        if request.url.path == "/api/v4/users":
+            return httpx.Response(200, json=[{"id": 7, "username": "alice"}])
+        if request.method == "POST":
+            return httpx.Response(409 if "/projects/3/" in request.url.path else 201, json={})
+        if request.method == "DELETE":
+            return httpx.Response(404 if "/projects/" in request.url.path else 204)
+        return httpx.Response(200, json={})
+
+    upstream("gitlab", handler)
+    gitlab_service.user_id_by_email.clear()
+    gitlab_service.user_id_by_username.clear()
+    return calls
+
+
+CONFIG = {"email": "alice@example.com", "group_id": 5, "role": "Developer", "repo_access": [2, 3]}
+
+
+def test_sync_and_async_add_account_make_the_same_calls(gitlab):
+    result = gitlab_service.add_account(dict(CONFIG))
+    sync_calls = sorted(gitlab)
+    gitlab.clear()
+    gitlab_service.user_id_by_email.clear()
+
+    assert asyncio.run(gitlab_service_async.add_account(dict(CONFIG))) == result
+    assert sorted(gitlab) == sync_calls == [
+        ("GET", "/api/v4/users"),
+        ("POST", "/api/v4/groups/5/members"),
+        ("POST", "/api/v4/projects/2/members"),
+        ("POST", "/api/v4/projects/3/members"),
+    ]
+    assert result["user_id"] == 7
+
+
+def test_user_lookup_is_cached(gitlab):
+    assert gitlab_service.find_gitlab_user_by_email("alice@example.com") == 7
+    assert asyncio.run(gitlab_service_async.find_gitlab_user_by_email("alice@example.com")) == 7
+    assert gitlab_service.find_gitlab_user_by_username("alice") == 7
+
+    assert gitlab == [("GET", "/api/v4/users")]
+
+
+def test_removal_failures_are_logged_as_warnings(gitlab, caplog):
+    caplog.set_level(logging.INFO)
+
+    asyncio.run(gitlab_service_async.remove_user_access(7, "5", [2]))
+
+    logged = [(record.levelname, record.getMessage()) for record in caplog.records]
+    assert ("INFO", "[GitLab] Removed user 7 from group 5") in logged
+    assert any(level == "WARNING" and message.startswith("[GitLab] Removing user 7 from project 2 failed: 404")
+               for level, message in logged)
+
+
+@pytest.fixture
+def failing_project(upstream, gitlab):
+    """Same API, but any call on project 4 fails with a 500."""
+    def handler(request):
+        gitlab.append((request.method, request.url.path))
+        if "/projects/4/" in request.url.path:
+            return httpx.Response(500, text="boom")
+        if request.url.path == "/api/v4/users":
+            return httpx.Response(200, json=[{"id": 7, "username": "alice"}])
+        return httpx.Response(201 if request.method == "POST" else 200, json={})
+
+    upstream("gitlab", handler)
+    return gitlab
+
+
+def test_add_account_keeps_granted_projects_when_some_fail(failing_project):
+    config = {**CONFIG, "repo_access": [2, 4]}
+
+    result = gitlab_service.add_account(dict(config))
+    gitlab_service.user_id_by_email.clear()
+
+    assert asyncio.run(gitlab_service_async.add_account(dict(config))) == result
+    assert result["repo_access"] == [2]
+    assert result["repo_failed"] == {"4": "500 boom"}
+
+
+def test_add_account_raises_only_when_nothing_was_granted(failing_project):
+    config = {**CONFIG, "group_id": None, "repo_access": [4]}
+
+    with pytest.raises(Exception, match="1/1 projects: 4: 500"):
+        gitlab_service.add_account(dict(config))
+    with pytest.raises(Exception, match="1/1 projects: 4: 500"):
+        asyncio.run(gitlab_service_async.add_account(dict(config)))
+
+
+def test_update_retries_only_the_projects_that_failed(failing_project):
+    platforms = {"gitlab": {"platform": "gitlab", "user_id": 7, "group_id": "5", "role": "Developer",
+                            "repo_access": [2], "repo_failed": {"4": "500 boom"}}}
+    update = GitLabUpdateRole(platform="gitlab", group_id="5", repo_access=[2, 4], role="Maintainer")
+
+    asyncio.run(user_service._update_gitlab(platforms, {"gitlab": update}, None))
+
+    assert ("PUT", "/api/v4/projects/2/members/7") in failing_project
+    assert ("POST", "/api/v4/projects/4/members") in failing_project
+    assert platforms["gitlab"]["repo_access"] == [2]
+    assert platforms["gitlab"]["repo_failed"] == {"4": "500 boom"}
+    assert platforms["gitlab"]["role"] == "Maintainer"
@@ -0,0 +1,39 @@
+from fastapi.testclient import TestClient
+
+from main import app
+from routers import google_drive
+
+
+def _pages(*permissions, error=None):
+    def iter_permissions(folder_id, page_size=None):
+        yield from permissions
+        if error:
+            raise error
+    return iter_permissions
+
+
+def test_permissions_are_streamed_as_one_json_document(monkeypatch):
+    monkeypatch.setattr(google_drive, "iter_permissions", _pages({"id": "1"}, {"id": "2"}))
+
+    response = TestClient(app).get("/google-drive/permissions", params={"folder_id": "f"})
+
+    assert response.json() == {"permissions": [{"id": "1"}, {"id": "2"}]}
+
+
+def test_failure_after_the_first_page_ends_with_an_error_field(monkeypatch):
+    monkeypatch.setattr(google_drive, "iter_permissions",
+                        _pages({"id": "1"}, error=Exception("quota exceeded")))
+
+    response = TestClient(app).get("/google-drive/permissions", params={"folder_id": "f"})
+
+    assert response.status_code == 200
+    assert response.json() == {"permissions": [{"id": "1"}], "error": "quota exceeded"}
+
+
+def test_failure_on_the_first_page_is_a_500(monkeypatch):
+    monkeypatch.setattr(google_drive, "iter_permissions", _pages(error=Exception("no access")))
+
+    response = TestClient(app).get("/google-drive/permissions", params={"folder_id": "f"})
+
+    assert response.status_code == 500
+    assert response.json() == {"detail": "no access"}
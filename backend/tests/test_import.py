@@ -0,0 +1,77 @@
+import asyncio
+import json
+
+from models.user import User
+from services import import_service
+from services.import_service import import_users, iter_records
+
+
+async def _chunks(body: bytes, size: int = 7):
+    for start in range(0, len(body), size):
+        yield body[start:start + size]
+
+
+async def _collect(iterator):
+    return [item async for item in iterator]
+
+
+def test_csv_rows_survive_chunk_boundaries():
+    body = b'username,email,password\r\nalice,alice@example.com,pw1\r\n\r\nbob,bob@example.com,"p,w"\r\n'
+
+    records = asyncio.run(_collect(iter_records(_chunks(body), "csv")))
+
+    assert records == [
+        {"username": "alice", "email": "alice@example.com", "password": "pw1"},
+        {"username": "bob", "email": "bob@example.com", "password": "p,w"},
+    ]
+
+
+def test_import_creates_skips_and_reports_each_row(database, monkeypatch):
+    monkeypatch.setattr(import_service, "IMPORT_BATCH_SIZE", 2)
+    with database() as session:
+        session.add(User(username="taken", email="taken@example.com", password_hash="x"))
+        session.commit()
+    body = b"\n".join([
+        b'{"username": "alice", "email": "alice@example.com", "password": "pw"}',
+        b'{"username": "taken", "email": "new@example.com", "password": "pw"}',
+        b'{"username": "alice2", "email": "alice@example.com", "password": "pw"}',
+        b'{"username": "carol", "email": "not-an-email", "password": "pw"}',
+        b'{"username": "dave", "email": "dave@example.com", "password": "pw"}',
+    ])
+
+    results = asyncio.run(_collect(import_users(_chunks(body), "ndjson")))
+
+    assert [(r["row"], r["status"]) for r in results] == [
+        (1, "created"), (2, "skipped"), (3, "skipped"), (4, "failed"), (5, "created"),
+    ]
+    with database() as session:
+        assert {u.username for u in session.query(User)} == {"taken", "alice", "dave"}
+
+
+def test_existing_email_matches_case_insensitively(database):
+    with database() as session:
+        session.add(User(username="alice", email="Alice@Example.com", password_hash="x"))
+        session.commit()
+    body = b'{"username": "alice2", "email": "alice@example.com", "password": "pw"}'
+
+    results = asyncio.run(_collect(import_users(_chunks(body), "ndjson")))
+
+    assert results == [{"row": 1, "username": "alice2", "status": "skipped", "error": "User already exists"}]
+
+
+def test_unreadable_input_stops_the_stream_after_saving_earlier_rows(database):
+    body = b'{"username": "alice", "email": "alice@example.com", "password": "pw"}\n{not json\n'
+
+    results = asyncio.run(_collect(import_users(_chunks(body), "ndjson")))
+
+    assert [r["status"] for r in results] == ["created", "failed"]
+    assert results[1]["row"] == 2
+
+
+def test_import_endpoint_reads_a_fixed_length_body(client):
+    body = b"username,email,password\nalice,alice@example.com,pw\nbob,bob@example.com,pw\n"
+
+    response = client.post("/api/users/import", content=body, headers={"Content-Type": "text/csv"})
+
+    assert response.status_code == 200
+    assert [json.loads(line)["status"] for line in response.text.splitlines()] == ["created", "created"]
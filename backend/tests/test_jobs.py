@@ -0,0 +1,56 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from models.job import Job
+from services import job_service
+
+
+def _job(sessions, job_id, owner, lease_expires_at, status="queued"):
+    now = datetime.utcnow()
+    with sessions() as session:
+        session.add(Job(id=job_id, kind="create", username=job_id, status=status, payload={}, progress={},
+                        owner=owner, lease_expires_at=lease_expires_at, created_at=now, updated_at=now))
+        session.commit()
+
+
+def _owner(sessions, job_id):
+    with sessions() as session:
+        return session.get(Job, job_id).owner
+
+
+def test_recovery_only_takes_expired_leases(database):
+    now = datetime.utcnow()
+    _job(database, "dead", "other:1", now - timedelta(seconds=1), status="running")
+    _job(database, "legacy", None, None)
+    _job(database, "alive", "other:2", now + timedelta(minutes=5))
+
+    assert sorted(job_service._recover_expired_jobs()) == ["dead", "legacy"]
+    assert job_service._recover_expired_jobs() == []
+    assert _owner(database, "dead") == job_service.WORKER_ID
+    assert _owner(database, "alive") == "other:2"
+
+
+def test_claim_is_won_once(database):
+    _job(database, "expired", "other:1", datetime.utcnow() - timedelta(seconds=1))
+    _job(database, "leased", "other:2", datetime.utcnow() + timedelta(minutes=5))
+
+    assert job_service._claim("expired")
+    assert not job_service._claim("expired")
+    assert not job_service._claim("leased")
+
+
+def test_renew_extends_only_own_active_leases(database):
+    soon = datetime.utcnow() + timedelta(seconds=1)
+    _job(database, "mine", job_service.WORKER_ID, soon, status="running")
+    _job(database, "theirs", "other:1", soon, status="running")
+
+    assert job_service._renew_leases() == 1
+    with database() as session:
+        assert session.get(Job, "mine").lease_expires_at > soon
+        assert session.get(Job, "theirs").lease_expires_at == soon
+
+
+def test_withheld_secret_lost_on_restart_fails_clearly():
+    with pytest.raises(Exception, match="password was not persisted"):
+        job_service._restore_secrets("gone", {"username": "a", "withheld": ["password"]})
@@ -0,0 +1,23 @@
+import asyncio
+
+import httpx
+
+from services import mattermost_service, mattermost_service_async
+
+
+def test_mattermost_team_lookup_is_shared_by_sync_and_async_calls(upstream):
+    calls = []
+
+    def mattermost(request):
+        calls.append((request.method, request.url.path))
+        if request.url.path.endswith("/teams/name/dev"):
+            return httpx.Response(200, json={"id": "t1", "name": "dev"})
+        return httpx.Response(201, json={"team_id": "t1", "user_id": "u1"})
+
+    upstream("mattermost", mattermost)
+    mattermost_service.clear_lookup_cache()
+
+    assert mattermost_service.add_user_to_team("u1", "dev") == {"team_id": "t1", "user_id": "u1"}
+    assert asyncio.run(mattermost_service_async.add_user_to_team("u1", "dev")) == {"team_id": "t1", "user_id": "u1"}
+    assert calls == [("GET", "/api/v4/teams/name/dev"), ("POST", "/api/v4/teams/t1/members"),
+                     ("POST", "/api/v4/teams/t1/members")]
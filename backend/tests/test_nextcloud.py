@@ -0,0 +1,52 @@
+import asyncio
+
+import httpx
+import pytest
+
+from services import nextcloud_service, nextcloud_service_async, share_index
+
+FOLDER = "/Projects"
+
+
+def _shares_api(listed, create_status=403):
+    """Nextcloud sharing API whose POST fails with `create_status` and whose listing returns `listed`."""
+    calls = []
+
+    def handler(request):
+        calls.append((request.method, request.url.path, request.content))
+        if request.method == "POST":
+            text = "Path is already shared with this user" if create_status == 403 else "Internal error"
+            return httpx.Response(create_status, text=text)
+        if request.method == "GET":
+            return httpx.Response(200, json={"ocs": {"data": listed}})
+        return httpx.Response(200, json={"ocs": {"meta": {"status": "ok"}}})
+
+    return handler, calls
+
+
+def test_existing_share_with_other_permission_is_updated(database, upstream):
+    handler, calls = _shares_api([{"id": 41, "share_with": "alice", "share_type": 0, "permissions": 1}])
+    upstream("nextcloud", handler)
+
+    result = nextcloud_service.share_folder(FOLDER, "alice", 15)
+
+    assert result["share_id"] == 41
+    assert ("PUT", f"{nextcloud_service.SHARES_URL}/41", b"permissions=15") in calls
+    assert share_index.get_share_id(FOLDER, "alice") == 41
+
+
+def test_existing_share_with_same_permission_is_left_alone(database, upstream):
+    handler, calls = _shares_api([{"id": 41, "share_with": "alice", "share_type": 0, "permissions": "15"}])
+    upstream("nextcloud", handler)
+
+    assert nextcloud_service.share_folder(FOLDER, "alice", 15)["share_id"] == 41
+    assert [method for method, _, _ in calls] == ["POST", "GET"]
+
+
+def test_server_error_is_not_success_unless_the_share_is_listed(database, upstream):
+    handler, calls = _shares_api([], create_status=500)
+    upstream("nextcloud", handler)
+
+    with pytest.raises(Exception, match="Internal error"):
+        asyncio.run(nextcloud_service_async.share_folder(FOLDER, "alice", 1))
+    assert calls[-1][0] == "GET"
@@ -0,0 +1,101 @@
+import httpx
+
+from models.user import User
+from services import mattermost_service, reconcile_service
+from services.reconcile_service import diff_memberships, fetch_memberships
+
+GROUP = ("gitlab", "group", "7")
+
+
+def _expected(members):
+    return {member: {"role": role, "username": f"local-{member}", "account": None}
+            for member, role in members.items()}
+
+
+def test_diff_reports_missing_extra_and_role_mismatch():
+    expected = {GROUP: _expected({"1": 30, "2": 40, "3": None})}
+    actual = {GROUP: {"2": {"role": 30}, "3": {"role": 10}, "9": {"role": 30}}}
+
+    drift = {(item["kind"], item["member"]): item for item in diff_memberships(expected, actual)}
+
+    assert set(drift) == {("missing", "1"), ("role_mismatch", "2"), ("extra", "9")}
+    assert drift[("role_mismatch", "2")]["expected"] == 40
+    assert drift[("role_mismatch", "2")]["actual"] == 30
+    assert drift[("missing", "1")]["username"] == "local-1"
+
+
+def test_diff_keeps_protected_members_and_skips_unlisted_scopes():
+    expected = {GROUP: _expected({"1": 30}), ("gitlab", "project", "5"): _expected({"1": 30})}
+    actual = {GROUP: {"1": {"role": 30}, "99": {"role": 50, "protected": True}}}
+
+    assert diff_memberships(expected, actual) == []
+
+
+def test_reconcile_fixes_nextcloud_group_drift(database, upstream):
+    calls = []
+
+    def nextcloud(request):
+        calls.append((request.method, request.url.path, request.content))
+        if request.method == "GET":
+            return httpx.Response(200, json={"ocs": {"meta": {"status": "ok"},
+                                                     "data": {"users": ["alice", "stranger"]}}})
+        return httpx.Response(200, json={"ocs": {"meta": {"status": "ok", "statuscode": 100}, "data": []}})
+
+    upstream("nextcloud", nextcloud)
+    with database() as session:
+        for name in ("alice", "bob"):
+            session.add(User(username=name, email=f"{name}@example.com", password_hash="x",
+                             platforms=[{"platform": "nextcloud", "group_id": "staff"}]))
+        session.commit()
+
+    report = reconcile_service.reconcile(fix=True, remove_extra=True, platforms=["nextcloud"])
+
+    assert report["errors"] == []
+    assert {(item["kind"], item["member"], item.get("fixed")) for item in report["drift"]} == {
+        ("missing", "bob", True), ("extra", "stranger", True),
+    }
+    assert ("POST", "/ocs/v1.php/cloud/users/bob/groups", b"groupid=staff") in calls
+    assert ("DELETE", "/ocs/v1.php/cloud/groups/staff/users/stranger", b"") in calls
+
+
+def test_mattermost_admins_and_bots_are_never_extra(upstream):
+    def mattermost(request):
+        if request.url.path.endswith("/teams/name/dev"):
+            return httpx.Response(200, json={"id": "t1", "name": "dev"})
+        if request.url.path.endswith("/teams/t1/members"):
+            return httpx.Response(200, json=[{"user_id": uid, "roles": "team_user"}
+                                             for uid in ("u1", "admin", "bot", "gone", "stranger")])
+        assert request.url.path.endswith("/users/ids")
+        return httpx.Response(200, json=[
+            {"id": "u1", "roles": "system_user"},
+            {"id": "admin", "roles": "system_user system_admin"},
+            {"id": "bot", "roles": "system_user", "is_bot": True},
+            {"id": "stranger", "roles": "system_user"},
+        ])
+
+    upstream("mattermost", mattermost)
+    mattermost_service.clear_lookup_cache()
+    scope = ("mattermost", "team", "dev")
+
+    actual, errors = fetch_memberships([scope])
+    drift = diff_memberships({scope: _expected({"u1": "member"})}, actual)
+
+    assert errors == []
+    assert [(item["kind"], item["member"]) for item in drift] == [("extra", "stranger")]
+
+
+def test_drive_access_is_not_granted_without_a_stored_role(monkeypatch):
+    granted = []
+    monkeypatch.setattr(reconcile_service.google_drive, "grant_folder_access_batch",
+                        lambda folder_id, emails, role: granted.append((emails, role)) or
+                        {email: {"permission_id": f"p-{email}"} for email in emails})
+    items = [
+        {"kind": "missing", "member": "a@example.com", "expected": "reader"},
+        {"kind": "missing", "member": "b@example.com", "expected": None},
+    ]
+
+    reconcile_service._fix_drive_folder("folder", items, {})
+
+    assert granted == [(["a@example.com"], "reader")]
+    assert items[0]["fixed"] is True
+    assert "no drive role" in items[1]["error"].lower() and "fixed" not in items[1]
@@ -0,0 +1,137 @@
+import httpx
+import pytest
+
+from utils import rate_limit
+from utils.rate_limit import RateLimitedTransport, UpstreamLimiter
+from utils.resilience import CircuitBreaker, CircuitOpenError, IDEMPOTENT, ResilientTransport
+
+
+def _sequence(*outcomes):
+    """MockTransport returning (or raising) the given outcomes in order; records each request."""
+    calls = []
+
+    def handler(request):
+        calls.append(request)
+        outcome = outcomes[min(len(calls), len(outcomes)) - 1]
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+    return httpx.MockTransport(handler), calls
+
+
+def _resilient(transport, breaker=None, retries=3):
+    breaker = breaker or CircuitBreaker("test", failure_threshold=10, reset_timeout=60)
+    return httpx.Client(base_url="https://upstream.test",
+                        transport=ResilientTransport(breaker, transport, retries, 0, 0))
+
+
+def test_idempotent_call_is_retried_on_5xx():
+    transport, calls = _sequence(httpx.Response(503), httpx.Response(502), httpx.Response(200))
+
+    assert _resilient(transport).get("/thing").status_code == 200
+    assert len(calls) == 3
+
+
+def test_post_is_not_retried_on_5xx_unless_marked_idempotent():
+    transport, calls = _sequence(httpx.Response(503), httpx.Response(201))
+    assert _resilient(transport).post("/thing").status_code == 503
+    assert len(calls) == 1
+
+    transport, calls = _sequence(httpx.Response(503), httpx.Response(201))
+    assert _resilient(transport).post("/thing", extensions=IDEMPOTENT).status_code == 201
+    assert len(calls) == 2
+
+
+def test_post_is_retried_when_the_request_never_left():
+    transport, calls = _sequence(httpx.ConnectError("refused"), httpx.Response(201))
+
+    assert _resilient(transport).post("/thing").status_code == 201
+    assert len(calls) == 2
+
+
+def test_post_is_not_retried_after_a_read_timeout():
+    transport, calls = _sequence(httpx.ReadTimeout("slow"), httpx.Response(201))
+
+    with pytest.raises(httpx.ReadTimeout):
+        _resilient(transport).post("/thing")
+    assert len(calls) == 1
+
+
+def test_breaker_opens_fails_fast_then_probes(monkeypatch):
+    clock = [1000.0]
+    monkeypatch.setattr("utils.resilience.time.monotonic", lambda: clock[0])
+    breaker = CircuitBreaker("test", failure_threshold=2, reset_timeout=30)
+    transport, calls = _sequence(httpx.Response(500), httpx.Response(500), httpx.Response(200))
+    client = _resilient(transport, breaker, retries=0)
+
+    client.get("/thing")
+    client.get("/thing")
+    assert breaker.state == "open"
+    with pytest.raises(CircuitOpenError):
+        client.get("/thing")
+    assert len(calls) == 2
+
+    clock[0] += 30
+    assert client.get("/thing").status_code == 200
+    assert breaker.state == "closed"
+
+
+def test_failed_probe_reopens_the_breaker(monkeypatch):
+    clock = [1000.0]
+    monkeypatch.setattr("utils.resilience.time.monotonic", lambda: clock[0])
+    breaker = CircuitBreaker("test", failure_threshold=1, reset_timeout=30)
+
+    breaker.record(False)
+    clock[0] += 30
+    breaker.before_call()
+    assert breaker.state == "half_open"
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+    breaker.record(False)
+    assert breaker.state == "open"
+
+
+def _limiter(**kwargs):
+    settings = {"rate": None, "burst": 10, "initial_concurrency": 4, "max_concurrency": 8, **kwargs}
+    return UpstreamLimiter("test", **settings)
+
+
+def test_aimd_grows_on_success_and_halves_on_429():
+    limiter = _limiter()
+    for _ in range(4):
+        assert limiter.try_acquire() == 0
+        limiter.release(httpx.Response(200))
+    assert limiter.limit == pytest.approx(5, abs=0.1)
+
+    limiter.try_acquire()
+    limiter.release(httpx.Response(429, headers={"Retry-After": "2"}))
+    assert int(limiter.limit) == 2
+    assert limiter.try_acquire() == pytest.approx(2, abs=0.1)
+
+
+def test_concurrency_limit_blocks_extra_callers():
+    limiter = _limiter(initial_concurrency=1)
+
+    assert limiter.try_acquire() == 0
+    assert limiter.try_acquire() == rate_limit.SLOT_POLL_INTERVAL
+    limiter.release(None)
+    assert limiter.try_acquire() == 0
+
+
+def test_rate_limit_headers_repace_the_bucket():
+    limiter = _limiter()
+    limiter.try_acquire()
+    limiter.release(httpx.Response(200, headers={"RateLimit-Remaining": "10", "RateLimit-Reset": "5"}))
+
+    assert limiter.rate == pytest.approx(2)
+
+
+def test_throttled_request_is_sent_again(monkeypatch):
+    monkeypatch.setattr(rate_limit.time, "sleep", lambda seconds: None)
+    transport, calls = _sequence(httpx.Response(429, headers={"Retry-After": "0"}), httpx.Response(201))
+    client = httpx.Client(base_url="https://upstream.test",
+                          transport=RateLimitedTransport(_limiter(), transport, retries=2))
+
+    assert client.post("/thing").status_code == 201
+    assert len(calls) == 2
@@ -0,0 +1,69 @@
+import time
+from datetime import datetime
+
+from models.user import User
+
+
+def _add_users(sessions, count):
+    with sessions() as session:
+        session.add_all([
+            User(username=f"user{i:02d}", email=f"user{i:02d}@example.com", password_hash="x",
+                 created_at=datetime.utcnow())
+            for i in range(count)
+        ])
+        session.commit()
+
+
+def test_all_users_follows_the_cursor(client, database):
+    _add_users(database, 5)
+
+    pages, cursor = [], None
+    while True:
+        params = {"limit": 2, **({"cursor": cursor} if cursor else {})}
+        response = client.get("/api/all_users", params=params)
+        assert response.status_code == 200
+        pages.append([user["username"] for user in response.json()])
+        cursor = response.headers.get("X-Next-Cursor")
+        if cursor is None:
+            break
+
+    assert pages == [["user00", "user01"], ["user02", "user03"], ["user04"]]
+
+
+def test_all_users_filters_by_username_prefix(client, database):
+    _add_users(database, 3)
+    with database() as session:
+        session.add(User(username="user_%", email="literal@example.com", password_hash="x"))
+        session.commit()
+
+    response = client.get("/api/all_users", params={"username_prefix": "user_%"})
+
+    assert [user["username"] for user in response.json()] == ["user_%"]
+
+
+def test_create_user_without_platforms(client, database):
+    response = client.post("/api/users", json={
+        "username": "alice", "email": "alice@example.com", "password": "s3cret", "platforms": [],
+    })
+
+    assert response.status_code == 200
+    assert response.json()["username"] == "alice"
+    with database() as session:
+        user = session.query(User).filter_by(username="alice").one()
+        assert user.password_hash and user.password_hash != "s3cret"
+
+
+def test_background_create_runs_as_a_job_without_storing_the_password(client, database):
+    response = client.post("/api/users", params={"background": True}, json={
+        "username": "bob", "email": "bob@example.com", "password": "s3cret", "platforms": [],
+    })
+    assert response.status_code == 202
+    location = response.headers["Location"]
+
+    deadline = time.monotonic() + 10
+    while (job := client.get(location).json())["status"] in ("queued", "running"):
+        assert time.monotonic() < deadline, job
+        time.sleep(0.05)
+
+    assert job["status"] == "succeeded", job
+    assert job["result"]["username"] == "bob"
@@ -0,0 +1,18 @@
+import random
+
+
+def exponential_delays(initial: float, maximum: float, factor: float = 2.0):
+    """
+    Yield an endless sequence of sleep delays: initial, initial * factor, ...
+    capped at `maximum`.
+    """
+    delay = initial
+    while True:
+        yield min(delay, maximum)
+        delay *= factor
+
+
+def full_jitter(delays):
+    """Spread each delay uniformly over [0, delay] so concurrent retries don't line up."""
+    for delay in delays:
+        yield random.uniform(0, delay)
@@ -0,0 +1,100 @@
+import asyncio
+import threading
+
+from cachetools import TTLCache
+
+_MISSING = object()
+
+
+class LookupCache:
+    """
+    Bounded TTL cache for name -> object lookups against an upstream API.
+
+    Found values live for `ttl` seconds; "not found" answers are cached
+    separately for `negative_ttl` seconds. Both maps evict least recently
+    used entries once `maxsize` is reached. Concurrent misses on the same
+    key share one upstream call (`get_or_load` / `aget_or_load`).
+
+    Loaders return `(value, cacheable)`: `value` is None when the upstream
+    said "not found", and `cacheable` is False for answers that must not be
+    remembered (e.g. 5xx errors).
+    """
+
+    def __init__(self, maxsize: int, ttl: float, negative_ttl: float):
+        self._found = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._not_found = TTLCache(maxsize=maxsize, ttl=negative_ttl)
+        self._lock = threading.Lock()
+        self._key_locks = {}
+        self._inflight = {}
+
+    def get(self, key):
+        """Return the cached value, None for a cached miss, or _MISSING."""
+        with self._lock:
+            value = self._found.get(key, _MISSING)
+            if value is _MISSING and key in self._not_found:
+                return None
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            if value is None:
+                self._found.pop(key, None)
+                self._not_found[key] = True
+            else:
+                self._not_found.pop(key, None)
+                self._found[key] = value
+
+    def invalidate(self, key):
+        with self._lock:
+            self._found.pop(key, None)
+            self._not_found.pop(key, None)
+
+    def discard_value(self, value):
+        """Drop every found entry that maps to `value`."""
+        with self._lock:
+            for key in [k for k, v in self._found.items() if v == value]:
+                self._found.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._found.clear()
+            self._not_found.clear()
+
+    def get_or_load(self, key, loader):
+        value = self.get(key)
+        if value is not _MISSING:
+            return value
+
+        with self._lock:
+            key_lock = self._key_locks.setdefault(key, threading.Lock())
+        try:
+            with key_lock:
+                value = self.get(key)
+                if value is _MISSING:
+                    value, cacheable = loader()
+                    if cacheable:
+                        self.set(key, value)
+        finally:
+            with self._lock:
+                self._key_locks.pop(key, None)
+        return value
+
+    async def aget_or_load(self, key, loader):
+        value = self.get(key)
+        if value is not _MISSING:
+            return value
+
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._aload(key, loader))
+            self._inflight[key] = task
+        return await asyncio.shield(task)
+
+    async def _aload(self, key, loader):
+        try:
+            value, cacheable = await loader()
+            if cacheable:
+                self.set(key, value)
+            return value
+        finally:
+            self._inflight.pop(key, None)
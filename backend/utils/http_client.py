@@ -0,0 +1,149 @@
+import threading
+
+import httpx
+
+import config
+from utils.metrics import AsyncMeteredTransport, MeteredTransport
+from utils.rate_limit import AsyncRateLimitedTransport, RateLimitedTransport, UpstreamLimiter
+from utils.resilience import AsyncResilientTransport, CircuitBreaker, ResilientTransport
+from utils.tracing import AsyncTracedTransport, TracedTransport
+
+# Connection settings per upstream, resolved lazily so a missing variable
+# only fails the platform that needs it.
+UPSTREAMS = {
+    "gitlab": lambda: {
+        "base_url": config.GITLAB_API_BASE,
+        "headers": config.HEADERS_GITLAB,
+    },
+    "mattermost": lambda: {
+        "base_url": f"{config.MATTERMOST_URL}/api/v4",
+        "headers": config.HEADERS_MATTERMOST,
+    },
+    "nextcloud": lambda: {
+        "base_url": config.NEXTCLOUD_BASE_URL,
+        "headers": config.OCS_HEADERS,
+        "auth": (config.ADMIN_USERNAME, config.ADMIN_PASSWORD),
+    },
+}
+
+# Requests/second each upstream starts with (0 = unlimited until its headers say otherwise)
+RATE_LIMITS = {
+    "gitlab": lambda: config.GITLAB_RATE_LIMIT,
+    "mattermost": lambda: config.MATTERMOST_RATE_LIMIT,
+    "nextcloud": lambda: config.NEXTCLOUD_RATE_LIMIT,
+}
+
+_clients = {}
+_async_clients = {}
+_limiters = {}
+_breakers = {}
+_lock = threading.Lock()
+
+
+def build_timeout() -> httpx.Timeout:
+    return httpx.Timeout(config.HTTP_READ_TIMEOUT, connect=config.HTTP_CONNECT_TIMEOUT)
+
+
+def build_limits() -> httpx.Limits:
+    return httpx.Limits(
+        max_connections=config.HTTP_MAX_CONNECTIONS,
+        max_keepalive_connections=config.HTTP_MAX_KEEPALIVE_CONNECTIONS,
+        keepalive_expiry=config.HTTP_KEEPALIVE_EXPIRY,
+    )
+
+
+def get_limiter(upstream: str) -> UpstreamLimiter:
+    """Rate limiter and adaptive concurrency state shared by an upstream's sync and async clients."""
+    with _lock:
+        if upstream not in _limiters:
+            _limiters[upstream] = UpstreamLimiter(
+                upstream,
+                rate=RATE_LIMITS[upstream](),
+                burst=config.HTTP_RATE_LIMIT_BURST,
+                initial_concurrency=config.HTTP_INITIAL_CONCURRENCY,
+                max_concurrency=config.HTTP_MAX_CONNECTIONS,
+            )
+        return _limiters[upstream]
+
+
+def get_breaker(upstream: str) -> CircuitBreaker:
+    """Circuit breaker shared by every caller of an upstream (including Drive)."""
+    with _lock:
+        if upstream not in _breakers:
+            _breakers[upstream] = CircuitBreaker(
+                upstream, config.CIRCUIT_FAILURE_THRESHOLD, config.CIRCUIT_RESET_TIMEOUT
+            )
+        return _breakers[upstream]
+
+
+def get_client(upstream: str) -> httpx.Client:
+    """
+    Return the shared, pooled client for an upstream platform.
+
+    Args:
+        upstream (str): One of "gitlab", "mattermost", "nextcloud".
+
+    Returns:
+        httpx.Client: Keep-alive client with base URL, auth headers,
+        connection limits and timeouts already applied. Calls are paced
+        by the upstream's rate limiter, retried when transient, cut off by
+        its circuit breaker, and recorded in the metrics and as tracing spans.
+    """
+    client = _clients.get(upstream)
+    if client is not None:
+        return client
+
+    limiter, breaker = get_limiter(upstream), get_breaker(upstream)
+    with _lock:
+        if upstream not in _clients:
+            transport = MeteredTransport(upstream, httpx.HTTPTransport(limits=build_limits()))
+            transport = RateLimitedTransport(limiter, transport, config.HTTP_RATE_LIMIT_RETRIES)
+            transport = ResilientTransport(
+                breaker, transport, config.HTTP_RETRY_ATTEMPTS,
+                config.HTTP_RETRY_INITIAL_DELAY, config.HTTP_RETRY_MAX_DELAY,
+            )
+            _clients[upstream] = httpx.Client(
+                **UPSTREAMS[upstream](),
+                timeout=build_timeout(),
+                transport=TracedTransport(upstream, transport),
+            )
+        return _clients[upstream]
+
+
+def get_async_client(upstream: str) -> httpx.AsyncClient:
+    """
+    Return the shared async client for an upstream platform.
+
+    Same settings as `get_client`; must be called from the event loop
+    the application runs on.
+    """
+    client = _async_clients.get(upstream)
+    if client is None:
+        transport = AsyncMeteredTransport(upstream, httpx.AsyncHTTPTransport(limits=build_limits()))
+        transport = AsyncRateLimitedTransport(get_limiter(upstream), transport, config.HTTP_RATE_LIMIT_RETRIES)
+        transport = AsyncResilientTransport(
+            get_breaker(upstream), transport, config.HTTP_RETRY_ATTEMPTS,
+            config.HTTP_RETRY_INITIAL_DELAY, config.HTTP_RETRY_MAX_DELAY,
+        )
+        client = httpx.AsyncClient(
+            **UPSTREAMS[upstream](),
+            timeout=build_timeout(),
+            transport=AsyncTracedTransport(upstream, transport),
+        )
+        _async_clients[upstream] = client
+    return client
+
+
+def close_clients():
+    """Close every pooled sync client (called on application shutdown)."""
+    with _lock:
+        for client in _clients.values():
+            client.close()
+        _clients.clear()
+
+
+async def aclose_clients():
+    """Close every pooled async client (called on application shutdown)."""
+    for client in _async_clients.values():
+        await client.aclose()
+    _async_clients.clear()
@@ -0,0 +1,24 @@
+import json
+import os
+
+# JSON codec for stored JSON columns: orjson when installed, stdlib otherwise.
+# JSON_CODEC=stdlib forces the fallback (e.g. to compare the two).
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+BACKEND = "orjson" if orjson is not None and os.getenv("JSON_CODEC", "auto") != "stdlib" else "stdlib"
+
+if BACKEND == "orjson":
+    def dumps(value) -> str:
+        return orjson.dumps(value).decode("utf-8")
+
+    def loads(value):
+        return orjson.loads(value)
+else:
+    def dumps(value) -> str:
+        return json.dumps(value, separators=(",", ":"))
+
+    def loads(value):
+        return json.loads(value)
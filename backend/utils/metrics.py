@@ -0,0 +1,124 @@
+import time
+from typing import Optional
+
+import httpx
+from prometheus_client import CONTENT_TYPE_LATEST, Counter, Histogram, generate_latest
+
+# Path segments that name a collection; the segment after one is an identifier
+# and is replaced by "{id}" in operation names to keep label cardinality low.
+COLLECTIONS = {"users", "groups", "projects", "members", "teams", "channels", "shares", "name"}
+KEYWORDS = {"name"}
+
+UPSTREAM_REQUESTS = Counter(
+    "upstream_requests_total",
+    "Outbound calls to platform APIs",
+    ["upstream", "operation", "status_class"],
+)
+UPSTREAM_LATENCY = Histogram(
+    "upstream_request_duration_seconds",
+    "Latency of outbound calls to platform APIs, until response headers",
+    ["upstream", "operation", "status_class"],
+)
+DB_QUERY_LATENCY = Histogram(
+    "db_query_duration_seconds",
+    "Database statement execution time",
+    ["statement"],
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5),
+)
+NEXTCLOUD_READY_LATENCY = Histogram(
+    "nextcloud_user_ready_seconds",
+    "Time from Nextcloud user creation until the user is visible in the API",
+    ["outcome"],  # "confirmed" (no wait needed), "ready" or "timeout"
+    buckets=(0.0, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0),
+)
+HTTP_REQUEST_LATENCY = Histogram(
+    "http_request_duration_seconds",
+    "Latency of requests served by this API",
+    ["method", "route", "status_class"],
+)
+
+
+def status_class(status: Optional[int]) -> str:
+    """"2xx", "4xx", ... or "error" when no response came back."""
+    return f"{status // 100}xx" if status else "error"
+
+
+def operation_name(method: str, path: str) -> str:
+    """Turn a request into a low-cardinality name, e.g. "PUT /groups/{id}/members/{id}"."""
+    segments = []
+    previous = None
+    for segment in path.strip("/").split("/"):
+        if previous in COLLECTIONS and segment not in KEYWORDS:
+            segments.append("{id}")
+        else:
+            segments.append(segment)
+        previous = segment if segments[-1] != "{id}" else None
+    return f"{method} /{'/'.join(segments)}"
+
+
+def observe_upstream(upstream: str, operation: str, status: Optional[int], seconds: float):
+    labels = (upstream, operation, status_class(status))
+    UPSTREAM_REQUESTS.labels(*labels).inc()
+    UPSTREAM_LATENCY.labels(*labels).observe(seconds)
+
+
+def observe_query(statement: str, seconds: float):
+    verb = statement.lstrip().split(None, 1)[0].upper() if statement.strip() else "UNKNOWN"
+    DB_QUERY_LATENCY.labels(verb).observe(seconds)
+
+
+def observe_user_ready(outcome: str, seconds: float):
+    NEXTCLOUD_READY_LATENCY.labels(outcome).observe(seconds)
+
+
+def observe_request(method: str, route: str, status: Optional[int], seconds: float):
+    HTTP_REQUEST_LATENCY.labels(method, route, status_class(status)).observe(seconds)
+
+
+def render() -> tuple:
+    """Current metrics in Prometheus text format: (body, content type)."""
+    return generate_latest(), CONTENT_TYPE_LATEST
+
+
+class MeteredTransport(httpx.BaseTransport):
+    """Sync transport wrapper recording every call in the upstream metrics."""
+
+    def __init__(self, upstream: str, transport: httpx.BaseTransport):
+        self.upstream = upstream
+        self.transport = transport
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        operation = operation_name(request.method, request.url.path)
+        start = time.perf_counter()
+        status = None
+        try:
+            response = self.transport.handle_request(request)
+            status = response.status_code
+            return response
+        finally:
+            observe_upstream(self.upstream, operation, status, time.perf_counter() - start)
+
+    def close(self):
+        self.transport.close()
+
+
+class AsyncMeteredTransport(httpx.AsyncBaseTransport):
+    """Async counterpart of `MeteredTransport`."""
+
+    def __init__(self, upstream: str, transport: httpx.AsyncBaseTransport):
+        self.upstream = upstream
+        self.transport = transport
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        operation = operation_name(request.method, request.url.path)
+        start = time.perf_counter()
+        status = None
+        try:
+            response = await self.transport.handle_async_request(request)
+            status = response.status_code
+            return response
+        finally:
+            observe_upstream(self.upstream, operation, status, time.perf_counter() - start)
+
+    async def aclose(self):
+        await self.transport.aclose()
@@ -0,0 +1,184 @@
+import asyncio
+import email.utils
+import logging
+import threading
+import time
+from typing import Optional
+
+import httpx
+
+# How often a caller re-checks for a free concurrency slot (seconds)
+SLOT_POLL_INTERVAL = 0.01
+# Multiplicative decrease factor and the minimum gap between two decreases (seconds)
+AIMD_DECREASE = 0.5
+AIMD_DECREASE_COOLDOWN = 1.0
+# Fallback pause after a 429 without Retry-After / RateLimit-Reset (seconds)
+DEFAULT_RETRY_AFTER = 1.0
+
+
+def _header_float(response: httpx.Response, *names) -> Optional[float]:
+    for name in names:
+        value = response.headers.get(name)
+        if value is not None:
+            try:
+                return float(value.split(",")[0].split(";")[0])
+            except ValueError:
+                pass
+    return None
+
+
+def _reset_delay(value: float) -> float:
+    """RateLimit-Reset is either seconds from now or a Unix timestamp (GitLab)."""
+    return value - time.time() if value > 1e9 else value
+
+
+def retry_after_seconds(response: httpx.Response) -> Optional[float]:
+    """Parse Retry-After (seconds or HTTP date) into a delay in seconds."""
+    value = response.headers.get("Retry-After")
+    if value is None:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, email.utils.parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class UpstreamLimiter:
+    """
+    Token bucket plus AIMD concurrency limit for one upstream.
+
+    The bucket refills at `rate` requests/second (None = unlimited until the
+    upstream advertises a budget). RateLimit-* / X-RateLimit-* headers
+    re-pace it so the remaining budget is spread over the rest of the
+    window; 429s and Retry-After pause the upstream entirely. Concurrency
+    grows by one slot per window of successful calls and halves on
+    throttling. Shared by the sync and async clients of the upstream.
+    """
+
+    def __init__(self, upstream: str, rate: Optional[float], burst: int, initial_concurrency: int,
+                 max_concurrency: int):
+        self.upstream = upstream
+        self.rate = rate or None
+        self.capacity = float(burst)
+        self.tokens = float(burst)
+        self.refilled_at = time.monotonic()
+        self.blocked_until = 0.0
+        self.max_concurrency = max_concurrency
+        self.limit = float(min(initial_concurrency, max_concurrency))
+        self.inflight = 0
+        self.last_decrease = 0.0
+        self._lock = threading.Lock()
+
+    def try_acquire(self) -> float:
+        """Take a token and a concurrency slot; returns 0, or seconds to wait before retrying."""
+        with self._lock:
+            now = time.monotonic()
+            if now < self.blocked_until:
+                return self.blocked_until - now
+            if self.inflight >= int(self.limit):
+                return SLOT_POLL_INTERVAL
+            if self.rate:
+                self.tokens = min(self.capacity, self.tokens + (now - self.refilled_at) * self.rate)
+                self.refilled_at = now
+                if self.tokens < 1:
+                    return (1 - self.tokens) / self.rate
+                self.tokens -= 1
+            self.inflight += 1
+            return 0.0
+
+    def release(self, response: Optional[httpx.Response]):
+        """Give back the slot and learn from the response (None when the call failed)."""
+        with self._lock:
+            self.inflight -= 1
+            if response is None:
+                return
+            now = time.monotonic()
+            if response.status_code == 429:
+                delay = retry_after_seconds(response)
+                if delay is None:
+                    reset = _header_float(response, "RateLimit-Reset", "X-RateLimit-Reset")
+                    delay = _reset_delay(reset) if reset is not None else DEFAULT_RETRY_AFTER
+                self.blocked_until = max(self.blocked_until, now + delay)
+                self.tokens = 0.0
+                if now - self.last_decrease >= AIMD_DECREASE_COOLDOWN:
+                    self.limit = max(1.0, self.limit * AIMD_DECREASE)
+                    self.last_decrease = now
+                    logging.info(f"[RateLimit] {self.upstream} throttled; concurrency -> {int(self.limit)}, "
+                                 f"pausing {delay:.2f}s")
+                return
+
+            if response.status_code == 503 and (delay := retry_after_seconds(response)) is not None:
+                self.blocked_until = max(self.blocked_until, now + delay)
+            elif response.status_code < 500:
+                self.limit = min(float(self.max_concurrency), self.limit + 1 / self.limit)
+            self._pace(response, now)
+
+    def _pace(self, response: httpx.Response, now: float):
+        remaining = _header_float(response, "RateLimit-Remaining", "X-RateLimit-Remaining")
+        reset = _header_float(response, "RateLimit-Reset", "X-RateLimit-Reset")
+        if remaining is None or reset is None:
+            return
+        window = max(_reset_delay(reset), 0.0)
+        if remaining < 1:
+            self.blocked_until = max(self.blocked_until, now + window)
+            self.tokens = 0.0
+        elif window > 0:
+            self.rate = remaining / window
+            self.tokens = min(self.tokens, remaining)
+
+
+class RateLimitedTransport(httpx.BaseTransport):
+    """Sync transport wrapper: waits for the upstream's limiter and re-sends 429s."""
+
+    def __init__(self, limiter: UpstreamLimiter, transport: httpx.BaseTransport, retries: int):
+        self.limiter = limiter
+        self.transport = transport
+        self.retries = retries
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        for attempt in range(self.retries + 1):
+            while (delay := self.limiter.try_acquire()) > 0:
+                time.sleep(delay)
+            response = None
+            try:
+                response = self.transport.handle_request(request)
+            finally:
+                self.limiter.release(response)
+            # A throttled request was not processed, so it is safe to send again
+            if response.status_code != 429 or attempt == self.retries:
+                return response
+            response.close()
+        return response
+
+    def close(self):
+        self.transport.close()
+
+
+class AsyncRateLimitedTransport(httpx.AsyncBaseTransport):
+    """Async counterpart of `RateLimitedTransport`."""
+
+    def __init__(self, limiter: UpstreamLimiter, transport: httpx.AsyncBaseTransport, retries: int):
+        self.limiter = limiter
+        self.transport = transport
+        self.retries = retries
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        for attempt in range(self.retries + 1):
+            while (delay := self.limiter.try_acquire()) > 0:
+                await asyncio.sleep(delay)
+            response = None
+            try:
+                response = await self.transport.handle_async_request(request)
+            finally:
+                self.limiter.release(response)
+            if response.status_code != 429 or attempt == self.retries:
+                return response
+            await response.aclose()
+        return response
+
+    async def aclose(self):
+        await self.transport.aclose()
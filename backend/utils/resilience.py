@@ -0,0 +1,172 @@
+import asyncio
+import logging
+import threading
+import time
+from typing import Optional
+
+import httpx
+
+from utils.backoff import exponential_delays, full_jitter
+
+# Pass as `extensions=IDEMPOTENT` on calls that are safe to repeat even though
+# their method (POST) is not, e.g. adding a member who may already be added.
+IDEMPOTENT = {"idempotent": True}
+
+IDEMPOTENT_METHODS = {"GET", "HEAD", "OPTIONS", "PUT", "DELETE"}
+RETRY_STATUSES = {502, 503, 504}
+
+# The request never reached the upstream: safe to retry whatever the method
+NOT_SENT_ERRORS = (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout)
+# The upstream may have acted on the request: retry only idempotent calls
+MAYBE_SENT_ERRORS = (httpx.ReadTimeout, httpx.WriteTimeout, httpx.ReadError, httpx.RemoteProtocolError)
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling an upstream whose circuit is open."""
+
+
+class CircuitBreaker:
+    """
+    Per-upstream circuit breaker.
+
+    After `failure_threshold` consecutive failures (transport errors or 5xx)
+    the circuit opens and calls fail fast for `reset_timeout` seconds. Then
+    one probe call is let through (half-open): success closes the circuit,
+    failure opens it again.
+    """
+
+    def __init__(self, name: str, failure_threshold: int, reset_timeout: float):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = "closed"
+        self.failures = 0
+        self.opened_at = 0.0
+        self.probing = False
+        self.probe_started = 0.0
+        self._lock = threading.Lock()
+
+    def before_call(self):
+        """Raise CircuitOpenError unless a call may go through now."""
+        with self._lock:
+            if self.state == "open":
+                if time.monotonic() - self.opened_at < self.reset_timeout:
+                    raise CircuitOpenError(f"{self.name} is unavailable (circuit open); failing fast")
+                self.state = "half_open"
+                self.probing = False
+            if self.state == "half_open":
+                # A probe that never reported back (e.g. cancelled) stops blocking after reset_timeout
+                if self.probing and time.monotonic() - self.probe_started < self.reset_timeout:
+                    raise CircuitOpenError(f"{self.name} is unavailable (circuit half-open); failing fast")
+                self.probing = True
+                self.probe_started = time.monotonic()
+
+    def record(self, ok: bool):
+        with self._lock:
+            if ok:
+                if self.state != "closed":
+                    logging.info(f"[Circuit] {self.name} recovered; circuit closed")
+                self.state = "closed"
+                self.failures = 0
+                self.probing = False
+                return
+
+            self.failures += 1
+            if self.state == "half_open" or self.failures >= self.failure_threshold:
+                if self.state != "open":
+                    logging.warning(f"[Circuit] {self.name} failing ({self.failures} in a row); circuit open "
+                                    f"for {self.reset_timeout}s")
+                self.state = "open"
+                self.opened_at = time.monotonic()
+                self.probing = False
+
+
+def is_idempotent(request: httpx.Request) -> bool:
+    return request.extensions.get("idempotent", request.method in IDEMPOTENT_METHODS)
+
+
+def should_retry(request: httpx.Request, response: Optional[httpx.Response] = None,
+                 error: Optional[Exception] = None) -> bool:
+    """Classify one attempt: transient failure that is safe to send again?"""
+    if isinstance(error, NOT_SENT_ERRORS):
+        return True
+    if isinstance(error, MAYBE_SENT_ERRORS):
+        return is_idempotent(request)
+    if response is not None and response.status_code in RETRY_STATUSES:
+        return is_idempotent(request)
+    return False
+
+
+def _failed(response: Optional[httpx.Response], error: Optional[Exception]) -> bool:
+    return error is not None or response.status_code >= 500
+
+
+class ResilientTransport(httpx.BaseTransport):
+    """
+    Sync transport wrapper: fails fast through the upstream's circuit
+    breaker and retries transient failures with jittered exponential backoff.
+    """
+
+    def __init__(self, breaker: CircuitBreaker, transport: httpx.BaseTransport, retries: int,
+                 initial_delay: float, max_delay: float):
+        self.breaker = breaker
+        self.transport = transport
+        self.retries = retries
+        self.initial_delay = initial_delay
+        self.max_delay = max_delay
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        delays = full_jitter(exponential_delays(self.initial_delay, self.max_delay))
+        for attempt in range(self.retries + 1):
+            self.breaker.before_call()
+            response, error = None, None
+            try:
+                response = self.transport.handle_request(request)
+            except httpx.TransportError as e:
+                error = e
+            self.breaker.record(not _failed(response, error))
+
+            if attempt == self.retries or not should_retry(request, response, error):
+                if error is not None:
+                    raise error
+                return response
+            if response is not None:
+                response.close()
+            time.sleep(next(delays))
+
+    def close(self):
+        self.transport.close()
+
+
+class AsyncResilientTransport(httpx.AsyncBaseTransport):
+    """Async counterpart of `ResilientTransport`."""
+
+    def __init__(self, breaker: CircuitBreaker, transport: httpx.AsyncBaseTransport, retries: int,
+                 initial_delay: float, max_delay: float):
+        self.breaker = breaker
+        self.transport = transport
+        self.retries = retries
+        self.initial_delay = initial_delay
+        self.max_delay = max_delay
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        delays = full_jitter(exponential_delays(self.initial_delay, self.max_delay))
+        for attempt in range(self.retries + 1):
+            self.breaker.before_call()
+            response, error = None, None
+            try:
+                response = await self.transport.handle_async_request(request)
+            except httpx.TransportError as e:
+                error = e
+            self.breaker.record(not _failed(response, error))
+
+            if attempt == self.retries or not should_retry(request, response, error):
+                if error is not None:
+                    raise error
+                return response
+            if response is not None:
+                await response.aclose()
+            await asyncio.sleep(next(delays))
+
+    async def aclose(self):
+        await self.transport.aclose()
@@ -1,7 +1,64 @@
+import asyncio
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Optional
+
 from werkzeug.security import generate_password_hash, check_password_hash
 
+from utils.tracing import span
+
+# PBKDF2 cost and the size of the process pool hashing runs in
+PASSWORD_HASH_ITERATIONS = int(os.getenv("PASSWORD_HASH_ITERATIONS", "600000"))
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", str(os.cpu_count() or 1)))
+
+_executor: Optional[ProcessPoolExecutor] = None
+_executor_lock = threading.Lock()
+
 def hash_password(password):
-    return generate_password_hash(password, method='pbkdf2:sha256')
+    """Hash in the current process; prefer the pooled variants from request code."""
+    return generate_password_hash(password, method=f"pbkdf2:sha256:{PASSWORD_HASH_ITERATIONS}")
 
 def verify_password(password, hashed):
     return check_password_hash(hashed, password)
+
+def _get_executor() -> ProcessPoolExecutor:
+    """Create the hashing pool on first use (spawned, so workers don't inherit the app's threads)."""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ProcessPoolExecutor(
+                max_workers=PASSWORD_HASH_WORKERS,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return _executor
+
+def hash_password_pooled(password: str) -> str:
+    """Hash in the process pool, blocking the calling thread (but not the GIL) until done."""
+    return _get_executor().submit(hash_password, password).result()
+
+async def hash_password_async(password: str) -> str:
+    """Hash in the process pool without blocking the event loop."""
+    loop = asyncio.get_running_loop()
+    with span("password.hash"):
+        return await loop.run_in_executor(_get_executor(), hash_password, password)
+
+async def hash_passwords(passwords: List[str]) -> List[str]:
+    """Hash many passwords in parallel across the pool's processes, keeping their order."""
+    if not passwords:
+        return []
+    loop = asyncio.get_running_loop()
+    executor = _get_executor()
+    return list(await asyncio.gather(*(loop.run_in_executor(executor, hash_password, p) for p in passwords)))
+
+async def verify_password_async(password: str, hashed: str) -> bool:
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_get_executor(), verify_password, password, hashed)
+
+def shutdown_hash_pool():
+    global _executor
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown(wait=True, cancel_futures=True)
+            _executor = None
@@ -0,0 +1,103 @@
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from utils.http_client import get_async_client, get_client
+
+# Upstream operations are written once, as generators of I/O steps that
+# receive each step's result (a step's error is thrown back into them).
+# `run` performs the steps with the upstream's sync client; `arun` performs
+# them with its async client and runs blocking calls in a worker thread, so
+# the sync and async services share one control flow.
+
+def http(method: str, url: str, **kwargs):
+    """Send a request with the upstream's client; the result is the response."""
+    return ("http", method, url, kwargs)
+
+def call(func, *args):
+    """Call a blocking function (e.g. a DB write); `arun` runs it in a worker thread."""
+    return ("call", func, args)
+
+def pause(seconds: float):
+    return ("pause", seconds)
+
+def lookup(cache, key, load):
+    """
+    Read `key` through a LookupCache. On a miss, `load()` returns an
+    operation whose result is (value, cacheable).
+    """
+    return ("lookup", cache, key, load)
+
+def gather(operations, concurrency: int):
+    """Run several operations with at most `concurrency` in flight; the result is their results in order."""
+    return ("gather", list(operations), concurrency)
+
+
+def run(upstream: str, operation):
+    """Drive an operation to completion with the upstream's sync client."""
+    result, error = None, None
+    while True:
+        try:
+            step = operation.throw(error) if error is not None else operation.send(result)
+        except StopIteration as done:
+            return done.value
+        result, error = None, None
+        try:
+            result = _perform(upstream, step)
+        except Exception as e:
+            error = e
+
+def _perform(upstream: str, step):
+    kind = step[0]
+    if kind == "http":
+        _, method, url, kwargs = step
+        return get_client(upstream).request(method, url, **kwargs)
+    if kind == "call":
+        _, func, args = step
+        return func(*args)
+    if kind == "lookup":
+        _, cache, key, load = step
+        return cache.get_or_load(key, lambda: run(upstream, load()))
+    if kind == "gather":
+        _, operations, concurrency = step
+        if not operations:
+            return []
+        with ThreadPoolExecutor(max_workers=min(concurrency, len(operations))) as executor:
+            return list(executor.map(lambda op: run(upstream, op), operations))
+    time.sleep(step[1])
+
+async def arun(upstream: str, operation):
+    """Async counterpart of `run`, using the upstream's async client."""
+    result, error = None, None
+    while True:
+        try:
+            step = operation.throw(error) if error is not None else operation.send(result)
+        except StopIteration as done:
+            return done.value
+        result, error = None, None
+        try:
+            result = await _aperform(upstream, step)
+        except Exception as e:
+            error = e
+
+async def _aperform(upstream: str, step):
+    kind = step[0]
+    if kind == "http":
+        _, method, url, kwargs = step
+        return await get_async_client(upstream).request(method, url, **kwargs)
+    if kind == "call":
+        _, func, args = step
+        return await asyncio.to_thread(func, *args)
+    if kind == "lookup":
+        _, cache, key, load = step
+        return await cache.aget_or_load(key, lambda: arun(upstream, load()))
+    if kind == "gather":
+        _, operations, concurrency = step
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def limited(op):
+            async with semaphore:
+                return await arun(upstream, op)
+
+        return list(await asyncio.gather(*(limited(op) for op in operations)))
+    await asyncio.sleep(step[1])
@@ -0,0 +1,220 @@
+import json
+import os
+import secrets
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import List, Optional
+
+import httpx
+
+# Where finished traces go: "" (off), "stdout", or a file path (one OTLP/JSON document per line)
+TRACING_EXPORT = os.getenv("TRACING_EXPORT", "")
+# Add a Server-Timing header summarizing each request's spans
+TRACING_SERVER_TIMING = os.getenv("TRACING_SERVER_TIMING", "false").lower() in ("1", "true", "yes")
+TRACING_SERVICE_NAME = os.getenv("TRACING_SERVICE_NAME", "user-management")
+
+ENABLED = bool(TRACING_EXPORT) or TRACING_SERVER_TIMING
+
+# OTLP status codes
+STATUS_UNSET, STATUS_OK, STATUS_ERROR = 0, 1, 2
+
+_current_span: ContextVar[Optional["Span"]] = ContextVar("current_span", default=None)
+_export_lock = threading.Lock()
+
+
+class Span:
+    """One timed operation; spans started while it is current become its children."""
+
+    def __init__(self, name: str, parent: Optional["Span"] = None, attributes: Optional[dict] = None):
+        self.name = name
+        self.parent = parent
+        self.trace_id = parent.trace_id if parent else secrets.token_hex(16)
+        self.span_id = secrets.token_hex(8)
+        self.attributes = dict(attributes or {})
+        self.status = STATUS_UNSET
+        self.error = None
+        self.start_ns = time.time_ns()
+        self.end_ns = None
+        # Finished spans of the whole trace, kept on the root
+        self.finished: List["Span"] = [] if parent is None else parent.finished
+        self._token = None
+
+    @property
+    def duration_ms(self) -> float:
+        return ((self.end_ns or time.time_ns()) - self.start_ns) / 1e6
+
+    def set_attribute(self, key: str, value):
+        self.attributes[key] = value
+
+    def end(self, error: Optional[BaseException] = None):
+        if self.end_ns is not None:
+            return
+        self.end_ns = time.time_ns()
+        if error is not None:
+            self.status, self.error = STATUS_ERROR, str(error)
+        elif self.status == STATUS_UNSET:
+            self.status = STATUS_OK
+        self.finished.append(self)
+        if self._token is not None:
+            try:
+                _current_span.reset(self._token)
+            except ValueError:
+                # Ended from another context (e.g. a different task); nothing to restore here
+                pass
+            self._token = None
+        if self.parent is None:
+            export(self)
+
+
+def current_span() -> Optional[Span]:
+    return _current_span.get()
+
+
+def start_span(name: str, **attributes) -> Optional[Span]:
+    """Start a span as a child of the current one and make it current. None when tracing is off."""
+    if not ENABLED:
+        return None
+    span = Span(name, _current_span.get(), attributes)
+    span._token = _current_span.set(span)
+    return span
+
+
+@contextmanager
+def span(name: str, **attributes):
+    """Time the enclosed block as a span (a no-op when tracing is off)."""
+    current = start_span(name, **attributes)
+    if current is None:
+        yield None
+        return
+    try:
+        yield current
+    except BaseException as e:
+        current.end(e)
+        raise
+    current.end()
+
+
+def server_timing(root: Span) -> str:
+    """
+    Server-Timing header value for a request: time per direct child span
+    name (summed) plus the total.
+    """
+    totals = {}
+    for child in root.finished:
+        if child.parent is root:
+            key = "".join(c if c.isalnum() or c in "._-" else "_" for c in child.name)
+            totals[key] = totals.get(key, 0.0) + child.duration_ms
+    parts = [f"{name};dur={ms:.1f}" for name, ms in totals.items()]
+    parts.append(f"total;dur={root.duration_ms:.1f}")
+    return ", ".join(parts)
+
+
+def _attribute(key: str, value) -> dict:
+    if isinstance(value, bool):
+        typed = {"boolValue": value}
+    elif isinstance(value, int):
+        typed = {"intValue": str(value)}
+    elif isinstance(value, float):
+        typed = {"doubleValue": value}
+    else:
+        typed = {"stringValue": str(value)}
+    return {"key": key, "value": typed}
+
+
+def to_otlp(root: Span) -> dict:
+    """A finished trace as an OTLP/JSON ExportTraceServiceRequest."""
+    spans = []
+    for item in root.finished:
+        data = {
+            "traceId": item.trace_id,
+            "spanId": item.span_id,
+            "name": item.name,
+            "kind": 2 if item.parent is None else 1,  # SERVER for the root, INTERNAL otherwise
+            "startTimeUnixNano": str(item.start_ns),
+            "endTimeUnixNano": str(item.end_ns),
+            "attributes": [_attribute(k, v) for k, v in item.attributes.items()],
+            "status": {"code": item.status, **({"message": item.error} if item.error else {})},
+        }
+        if item.parent is not None:
+            data["parentSpanId"] = item.parent.span_id
+        spans.append(data)
+    return {
+        "resourceSpans": [{
+            "resource": {"attributes": [_attribute("service.name", TRACING_SERVICE_NAME)]},
+            "scopeSpans": [{"scope": {"name": "user_management"}, "spans": spans}],
+        }]
+    }
+
+
+def export(root: Span):
+    if not TRACING_EXPORT:
+        return
+    line = json.dumps(to_otlp(root), separators=(",", ":"))
+    with _export_lock:
+        if TRACING_EXPORT == "stdout":
+            sys.stdout.write(line + "\n")
+            sys.stdout.flush()
+        else:
+            with open(TRACING_EXPORT, "a", encoding="utf-8") as f:
+                f.write(line + "\n")
+
+
+def trace_session_commits(session_factory):
+    """Record every commit made through `session_factory` as a "db.commit" span."""
+    from sqlalchemy import event
+
+    def before_commit(session):
+        session.info["commit_span"] = start_span("db.commit")
+
+    def after_commit(session):
+        commit_span = session.info.pop("commit_span", None)
+        if commit_span is not None:
+            commit_span.end()
+
+    def after_rollback(session):
+        commit_span = session.info.pop("commit_span", None)
+        if commit_span is not None:
+            commit_span.end(Exception("rolled back"))
+
+    event.listen(session_factory, "before_commit", before_commit)
+    event.listen(session_factory, "after_commit", after_commit)
+    event.listen(session_factory, "after_rollback", after_rollback)
+
+
+class TracedTransport(httpx.BaseTransport):
+    """Sync transport wrapper recording each call as an "http <upstream>" span."""
+
+    def __init__(self, upstream: str, transport: httpx.BaseTransport):
+        self.upstream = upstream
+        self.transport = transport
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        with span(f"http.{self.upstream}", **{"http.method": request.method, "url.path": request.url.path}) as s:
+            response = self.transport.handle_request(request)
+            if s is not None:
+                s.set_attribute("http.status_code", response.status_code)
+            return response
+
+    def close(self):
+        self.transport.close()
+
+
+class AsyncTracedTransport(httpx.AsyncBaseTransport):
+    """Async counterpart of `TracedTransport`."""
+
+    def __init__(self, upstream: str, transport: httpx.AsyncBaseTransport):
+        self.upstream = upstream
+        self.transport = transport
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        with span(f"http.{self.upstream}", **{"http.method": request.method, "url.path": request.url.path}) as s:
+            response = await self.transport.handle_async_request(request)
+            if s is not None:
+                s.set_attribute("http.status_code", response.status_code)
+            return response
+
+    async def aclose(self):
+        await self.transport.aclose()
@@ -24,7 +24,15 @@ import {
 import axios from 'axios';
 
 export default function UserTable() {
-  const { data: users = [], isLoading, isError, refetch } = useUserQuery();
+  const {
+    data: users = [],
+    isLoading,
+    isError,
+    refetch,
+    hasNextPage,
+    fetchNextPage,
+    isFetchingNextPage,
+  } = useUserQuery();
 
   const [editOpen, setEditOpen] = useState(false);
 
@@ -87,7 +95,8 @@ export default function UserTable() {
       <Input placeholder="Search users by username or email..." className="p-5 bg-white" />
       <div className="text-sm mb-4 rounded-xl border shadow-sm bg-white py-5 text-muted-foreground flex items-center gap-2 pl-3">
         <Users className="w-4 h-4" />
-        Total Users: <span className="font-semibold">{users.length}</span>
+        Loaded Users: <span className="font-semibold">{users.length}</span>
+        {hasNextPage && <span>(more available)</span>}
       </div>
 
       <Card>
@@ -175,6 +184,13 @@ export default function UserTable() {
               </tbody>
             </table>
           </div>
+          {hasNextPage && (
+            <div className="flex justify-center pt-4">
+              <Button variant="outline" onClick={() => fetchNextPage()} disabled={isFetchingNextPage}>
+                {isFetchingNextPage ? 'Loading...' : 'Load more'}
+              </Button>
+            </div>
+          )}
         </CardContent>
       </Card>
 
@@ -1,18 +1,31 @@
-import { useQuery } from '@tanstack/react-query';
+import { useInfiniteQuery } from '@tanstack/react-query';
 import axios from 'axios';
-import { User } from '@/types/user';
+import { User, UserFilters } from '@/types/user';
 
-export const useUserQuery = () => {
-  return useQuery<User[]>({
-    queryKey: ['users'],
-    queryFn: async () => {
+const PAGE_SIZE = 100;
+
+type UserPage = {
+  users: User[];
+  nextCursor: number | null;
+};
+
+export const useUserQuery = (filters: UserFilters = {}) => {
+  return useInfiniteQuery({
+    queryKey: ['users', filters],
+    initialPageParam: null as number | null,
+    queryFn: async ({ pageParam }): Promise<UserPage> => {
       try {
-        const res = await axios.get<User[]>('http://localhost:8000/api/all_users');
-        return [...res.data];
+        const res = await axios.get<User[]>('http://localhost:8000/api/all_users', {
+          params: { ...filters, limit: PAGE_SIZE, cursor: pageParam ?? undefined },
+        });
+        const next = res.headers['x-next-cursor'];
+        return { users: res.data, nextCursor: next ? Number(next) : null };
       } catch (err) {
         console.warn('API failed, showing only mock data');
-        return [];
+        return { users: [], nextCursor: null };
       }
     },
+    getNextPageParam: (lastPage) => lastPage.nextCursor,
+    select: (data) => data.pages.flatMap((page) => page.users),
   });
 };
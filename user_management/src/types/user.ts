@@ -10,6 +10,13 @@ export interface User {
   platforms: PlatformConfig[];
 }
 
+export interface UserFilters {
+  platform?: Platform;
+  username_prefix?: string;
+  created_after?: string;
+  created_before?: string;
+}
+
 export type PlatformConfig = GitLabConfig | MattermostConfig | NextCloudConfig |DriveConfig;
 
 export interface GitLabConfig {